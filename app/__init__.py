@@ -413,6 +413,153 @@ def create_app(config_class=None):
         except Exception as e:
             app.logger.error(f"Scheduler failed to start: {e}", exc_info=True)
     
+    # Configure single-flight caching of expensive admin aggregates
+    try:
+        from .extensions import single_flight_cache
+        single_flight_cache.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize single-flight cache: {e}", exc_info=True)
+    
+    # Bind the buffered audit writer (drained at interpreter exit)
+    try:
+        from .services.audit_pipeline import audit_pipeline
+        audit_pipeline.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize audit pipeline: {e}", exc_info=True)
+    
+    # Configure the verified API key cache
+    try:
+        from .services.api_key_auth import api_key_auth
+        api_key_auth.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize API key auth: {e}", exc_info=True)
+    
+    # Keep client balance ledger rows in step with payments and withdrawals
+    try:
+        from .services.balance_ledger import balance_ledger
+        balance_ledger.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize balance ledger: {e}", exc_info=True)
+    
+    # Keep hourly transaction buckets in step with transactions
+    try:
+        from .services.transaction_rollup import transaction_rollup
+        transaction_rollup.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize transaction rollup: {e}", exc_info=True)
+    
+    # Schedule the client dashboard rollup job
+    try:
+        from .services.dashboard_rollup import dashboard_rollup
+        dashboard_rollup.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize dashboard rollup: {e}", exc_info=True)
+    
+    # Configure the fraud feature cache
+    try:
+        from .services.fraud_features import fraud_features
+        fraud_features.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize fraud feature store: {e}", exc_info=True)
+    
+    # Configure Idempotency-Key handling for write endpoints
+    try:
+        from .services.idempotency import idempotency_store
+        idempotency_store.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize idempotency store: {e}", exc_info=True)
+    
+    # Configure the per-client webhook config cache
+    try:
+        from .services.webhook_config import webhook_config_cache
+        webhook_config_cache.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize webhook config cache: {e}", exc_info=True)
+    
+    # Size the inbound webhook replay filters
+    try:
+        from .services.replay_cache import webhook_replay_cache
+        webhook_replay_cache.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize webhook replay cache: {e}", exc_info=True)
+    
+    # Start the merchant webhook outbox dispatcher
+    try:
+        from .services.webhook_dispatcher import webhook_dispatcher
+        webhook_dispatcher.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize webhook dispatcher: {e}", exc_info=True)
+    
+    # Configure the subdomain tenant registry
+    try:
+        from .services.tenant_registry import tenant_registry
+        tenant_registry.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize tenant registry: {e}", exc_info=True)
+    
+    # Configure the in-memory coin catalog
+    try:
+        from .services.coin_catalog import coin_catalog
+        coin_catalog.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize coin catalog: {e}", exc_info=True)
+    
+    # Configure the compiled feature entitlements
+    try:
+        from .services.entitlements import entitlements
+        entitlements.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize entitlements: {e}", exc_info=True)
+    
+    # Configure the admin audit trail browser
+    try:
+        from .services.audit_browser import audit_browser
+        audit_browser.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize audit trail browser: {e}", exc_info=True)
+    
+    # Configure the streaming data export engine
+    try:
+        from .services.data_export import data_exporter
+        data_exporter.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize data exporter: {e}", exc_info=True)
+    
+    # Start the background report engine
+    try:
+        from .services.report_engine import report_engine
+        report_engine.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize report engine: {e}", exc_info=True)
+    
+    # Configure the payment status event broker
+    try:
+        from .services.payment_events import payment_events
+        payment_events.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize payment events: {e}", exc_info=True)
+    
+    # Schedule payment address pool refill and recycling
+    try:
+        from .services.address_pool import address_pool
+        address_pool.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize address pool: {e}", exc_info=True)
+    
+    # Configure the payment QR code cache and render pool
+    try:
+        from .services.qr_renderer import qr_renderer
+        qr_renderer.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize QR renderer: {e}", exc_info=True)
+    
+    # Start the background exchange-rate engine
+    try:
+        from .services.rate_engine import rate_engine
+        rate_engine.init_app(app)
+    except Exception as e:
+        app.logger.error(f"Failed to initialize rate engine: {e}", exc_info=True)
+    
     # Register CLI commands
     try:
         # Register usage alert commands
@@ -423,6 +570,18 @@ def create_app(config_class=None):
         from .commands.admin_cli import register_admin_commands
         register_admin_commands(app)
         
+        # Register balance ledger commands
+        from .commands.ledger_cli import register_ledger_commands
+        register_ledger_commands(app)
+        
+        # Register dashboard rollup commands
+        from .commands.rollup_cli import register_rollup_commands
+        register_rollup_commands(app)
+        
+        # Register payment address pool commands
+        from .commands.address_pool_cli import register_address_pool_commands
+        register_address_pool_commands(app)
+        
         # Add project root to Python path
         import sys
         from pathlib import Path
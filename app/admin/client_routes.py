@@ -6,6 +6,7 @@ from app.models.withdrawal import WithdrawalStatus
 from app.forms import ClientForm
 from app.decorators import admin_required, admin_login_required
 from app.utils.finance import FinanceCalculator, calculator
+from app.services.commission_service import commission_service
 from app.utils.security import rate_limit, AbuseProtection
 from app.utils.audit import log_admin_action, log_security_event, log_client_setting_change
 from datetime import datetime, timedelta
@@ -64,7 +65,10 @@ def list_clients():
                   .paginate(page=page, per_page=per_page, error_out=False)
     
     # Calculate commission stats
-    total_30d = sum(c.get_30d_commission() if hasattr(c, 'get_30d_commission') else 0 for c in clients.items)
+    commissions_30d = commission_service.aggregate(
+        [c.id for c in clients.items], since=datetime.utcnow() - timedelta(days=30)
+    )
+    total_30d = float(sum(entry.total_commission for entry in commissions_30d.values()))
     total_volume_30d = sum(c.get_30d_volume() if hasattr(c, 'get_30d_volume') else 0 for c in clients.items)
     avg_rate = sum((c.deposit_commission_rate or 0) + (c.withdrawal_commission_rate or 0) for c in clients.items) / (len(clients.items) * 2) if clients.items else 0
     
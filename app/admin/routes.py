@@ -17,7 +17,7 @@ from app.models import Payment, PaymentStatus, Client, User, AuditTrail, AdminUs
 from app.models.client_wallet import ClientPricingPlan
 from app.models.wallet_provider import WalletProvider, WalletProviderCurrency, WalletBalance, WalletProviderTransaction
 from app.admin.forms.wallet_forms import WalletProviderForm, WalletProviderCurrencyForm
-from app.extensions import db
+from app.extensions import db, single_flight
 from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
 from sqlalchemy.exc import SQLAlchemyError
 import json
@@ -26,6 +26,7 @@ import requests
 from decimal import Decimal
 from app.models.withdrawal import WithdrawalStatus
 from app.models.report import Report, ReportType, ReportStatus
+from app.services.report_engine import report_engine
 from app.models.audit import AuditActionType, AuditTrail
 from app.models.notification import NotificationPreference
 from app.models.enums import SettingType, SettingKey
@@ -283,23 +284,19 @@ def clients():
 @admin_bp.route('/clients/export', methods=['POST'])
 @secure_admin_required
 def export_clients():
-    """Export clients to CSV"""
+    """Export clients to CSV (filters: search, status, start_date, end_date; format=csv|jsonl; gzip=1)"""
     try:
-        import csv
-        import io
-        from datetime import datetime
+        from app.services.data_export import client_export_spec, data_exporter, date_range
         
         # Get filter parameters from request
         search = request.args.get('search', '')
         status = request.args.get('status', 'all')
         
-        # Build query
-        query = Client.query
-        
         # Apply filters
+        criteria = []
         if search:
             search_term = f"%{search}%"
-            query = query.filter(
+            criteria.append(
                 db.or_(
                     Client.name.ilike(search_term),
                     Client.email.ilike(search_term),
@@ -308,75 +305,123 @@ def export_clients():
             )
             
         if status != 'all':
-            query = query.filter(Client.is_active == (status == 'active'))
+            criteria.append(Client.is_active == (status == 'active'))
         
-        # Get clients
-        clients = query.order_by(Client.name.asc()).all()
+        try:
+            start_date, end_date = date_range(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if start_date:
+            criteria.append(Client.created_at >= start_date)
+        if end_date:
+            criteria.append(Client.created_at < end_date)
         
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
+        # Stream rows straight from the cursor
+        return data_exporter.response(
+            client_export_spec(),
+            criteria,
+            fmt=request.args.get('format', 'csv'),
+            compress=request.args.get('gzip', type=int) == 1
+        )
         
-        # Write header
-        writer.writerow([
-            'ID', 'Name', 'Email', 'Company', 'Contact Person', 
-            'Phone', 'Status', 'Created At', 'Last Login'
-        ])
+    except Exception as e:
+        current_app.logger.error(f'Error exporting clients: {str(e)}')
+        return jsonify({
+            'success': False,
+            'error': 'Failed to export clients. Please try again.'
+        }), 500
+
+@admin_bp.route('/payments/export')
+@secure_admin_required
+def export_payments():
+    """Export payments (filters: status, client_id, start_date, end_date; format=csv|jsonl; gzip=1)"""
+    try:
+        from app.services.data_export import payment_export_spec, data_exporter, date_range
         
-        # Write data
-        for client in clients:
-            writer.writerow([
-                client.id,
-                client.name or '',
-                client.email or '',
-                client.company_name or '',
-                client.contact_person or '',
-                client.phone or '',
-                'Active' if client.is_active else 'Inactive',
-                client.created_at.strftime('%Y-%m-%d %H:%M:%S') if client.created_at else '',
-                client.last_login_at.strftime('%Y-%m-%d %H:%M:%S') if client.last_login_at else ''
-            ])
+        criteria = []
+        status = request.args.get('status')
+        if status:
+            try:
+                criteria.append(Payment.__table__.c.status == PaymentStatus(status.lower()))
+            except ValueError:
+                return jsonify({'success': False, 'error': f'Unknown payment status: {status}'}), 400
+        client_id = request.args.get('client_id', type=int)
+        if client_id:
+            criteria.append(Payment.client_id == client_id)
+        try:
+            start_date, end_date = date_range(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if start_date:
+            criteria.append(Payment.created_at >= start_date)
+        if end_date:
+            criteria.append(Payment.created_at < end_date)
         
-        # Create response with CSV
-        output.seek(0)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=clients_export_{timestamp}.csv',
-                'Content-type': 'text/csv; charset=utf-8'
-            }
+        return data_exporter.response(
+            payment_export_spec(),
+            criteria,
+            fmt=request.args.get('format', 'csv'),
+            compress=request.args.get('gzip', type=int) == 1
         )
         
     except Exception as e:
-        current_app.logger.error(f'Error exporting clients: {str(e)}')
+        current_app.logger.error(f'Error exporting payments: {str(e)}')
         return jsonify({
             'success': False,
-            'error': 'Failed to export clients. Please try again.'
+            'error': 'Failed to export payments. Please try again.'
         }), 500
 
-@admin_bp.route('/commissions/refresh', methods=['POST'])
+@admin_bp.route('/withdrawals/export')
 @secure_admin_required
-def refresh_commissions():
-    """Refresh commission data for all clients"""
+def export_withdrawals():
+    """Export withdrawal requests (filters: status, client_id, start_date, end_date; format=csv|jsonl; gzip=1)"""
     try:
-        # Get all active clients
-        clients = Client.query.filter_by(is_active=True).all()
-        updated_count = 0
+        from app.services.data_export import withdrawal_export_spec, data_exporter, date_range
         
-        # Update commission data for each client
-        for client in clients:
+        criteria = []
+        status = request.args.get('status')
+        if status:
             try:
-                # Calculate and update commissions
-                # This is a placeholder - replace with your actual commission calculation logic
-                client.total_commissions = calculate_client_commissions(client.id)
-                updated_count += 1
-            except Exception as e:
-                current_app.logger.error(f"Error updating commissions for client {client.id}: {str(e)}")
+                criteria.append(WithdrawalRequest.status == WithdrawalStatus(status.lower()))
+            except ValueError:
+                return jsonify({'success': False, 'error': f'Unknown withdrawal status: {status}'}), 400
+        client_id = request.args.get('client_id', type=int)
+        if client_id:
+            criteria.append(WithdrawalRequest.client_id == client_id)
+        try:
+            start_date, end_date = date_range(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if start_date:
+            criteria.append(WithdrawalRequest.created_at >= start_date)
+        if end_date:
+            criteria.append(WithdrawalRequest.created_at < end_date)
         
-        # Commit changes to the database
-        db.session.commit()
+        return data_exporter.response(
+            withdrawal_export_spec(),
+            criteria,
+            fmt=request.args.get('format', 'csv'),
+            compress=request.args.get('gzip', type=int) == 1
+        )
+        
+    except Exception as e:
+        current_app.logger.error(f'Error exporting withdrawals: {str(e)}')
+        return jsonify({
+            'success': False,
+            'error': 'Failed to export withdrawals. Please try again.'
+        }), 500
+
+@admin_bp.route('/commissions/refresh', methods=['POST'])
+@secure_admin_required
+def refresh_commissions():
+    """Refresh month-to-date commission snapshots for all active clients"""
+    try:
+        from app.services.commission_service import commission_service
+        
+        # One grouped aggregate over all active clients, written as a bulk upsert
+        now = datetime.utcnow()
+        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        updated_count = commission_service.write_snapshots(start_of_month, now, active_only=True)
         
         return jsonify({
             'success': True,
@@ -392,12 +437,6 @@ def refresh_commissions():
             'error': 'Failed to refresh commissions. Please try again.'
         }), 500
 
-def calculate_client_commissions(client_id):
-    """Helper function to calculate commissions for a client"""
-    # This is a placeholder - implement your actual commission calculation logic here
-    # For example, you might query the database for transactions and calculate commissions
-    return 0.0
-
 @admin_bp.route('/clients/new', methods=['GET', 'POST'])
 @secure_admin_required
 def new_client():
@@ -535,6 +574,67 @@ def delete_pricing_plan(plan_id):
     
     return redirect(url_for('admin.pricing_plans'))
 
+@single_flight('admin_dashboard_aggregates')
+def _dashboard_aggregates():
+    """Counts and top clients for the admin dashboard, as plain data"""
+    from app.models.client import Client
+    from app.models.withdrawal import WithdrawalRequest
+    from app.services.transaction_rollup import transaction_rollup
+    
+    pending = WithdrawalRequest.query.filter_by(status='pending')
+    total_transactions, _ = transaction_rollup.totals()
+    return {
+        'stats': {
+            'total_clients': Client.query.count(),
+            'total_transactions': total_transactions,
+            'pending_withdrawals': pending.count(),
+            'pending_user_withdrawals': pending.filter_by(withdrawal_type='user').count(),
+            'pending_client_withdrawals': pending.filter_by(withdrawal_type='client').count(),
+            'custom_wallets': Client.query.filter(Client.wallet_address.isnot(None)).count()
+        },
+        'top_clients': [
+            {
+                'id': client_id,
+                'company_name': company_name,
+                'email': email,
+                'transaction_count': int(tx_count or 0),
+                'total_volume': float(volume or 0)
+            }
+            for client_id, company_name, email, tx_count, volume in transaction_rollup.top_clients(limit=5)
+        ]
+    }
+
+@single_flight('admin_analytics_aggregates')
+def _analytics_aggregates(time_period):
+    """Totals, chart series, status counts and top clients for the analytics page"""
+    from app.models.client import Client
+    from app.models.withdrawal import WithdrawalRequest
+    from app.services.transaction_rollup import transaction_rollup, GRANULARITY_DAY, GRANULARITY_MONTH
+    
+    now = datetime.utcnow()
+    if time_period == '7d':
+        time_series = transaction_rollup.series(now - timedelta(days=7), granularity=GRANULARITY_DAY)
+    elif time_period == '30d':
+        time_series = transaction_rollup.series(now - timedelta(days=30), granularity=GRANULARITY_DAY)
+    else:  # 12m
+        time_series = transaction_rollup.series(now - timedelta(days=365), granularity=GRANULARITY_MONTH)
+    
+    total_transactions, total_volume = transaction_rollup.totals()
+    return {
+        'total_transactions': total_transactions,
+        'total_volume': float(total_volume),
+        'total_clients': Client.query.count(),
+        'pending_withdrawals': WithdrawalRequest.query.filter_by(status='pending').count(),
+        # Format data for Chart.js
+        'chart_labels': [point.period.strftime('%Y-%m-%d') for point in time_series],
+        'chart_data': {
+            'count': [float(point.count) for point in time_series],
+            'volume': [float(point.amount) for point in time_series]
+        },
+        'status_counts': transaction_rollup.status_counts(),
+        'top_clients': [tuple(row) for row in transaction_rollup.top_clients(limit=5)]
+    }
+
 @admin_bp.route('/dashboard')
 @rate_limit('admin_dashboard', limit=60, window=300)  # 60 requests per 5 minutes
 @admin_login_required
@@ -570,34 +670,14 @@ def admin_dashboard():
         ).order_by(
             Transaction.created_at.desc()
         ).limit(10).all()
-        
-        # Get top 5 clients by transaction volume
-        top_clients = db.session.query(
-            Client,
-            db.func.count(Transaction.id).label('transaction_count'),
-            db.func.sum(Transaction.amount).label('total_volume')
-        ).join(
-            Transaction, Client.id == Transaction.client_id
-        ).group_by(
-            Client.id
-        ).order_by(
-            db.desc('total_volume')
-        ).limit(5).all()
     except Exception as e:
         current_app.logger.error(f"Error fetching dashboard data: {str(e)}")
     
-    # Prepare system stats with error handling
-    pending_withdrawals_count = 0
-    try:
-        pending_withdrawals_count = WithdrawalRequest.query.filter_by(status='pending').count()
-    except Exception as e:
-        current_app.logger.error(f"Error counting pending withdrawals: {str(e)}")
-    
     # Initialize stats dictionary with default values
     stats = {
         'total_clients': 0,
         'total_transactions': 0,
-        'pending_withdrawals': pending_withdrawals_count,
+        'pending_withdrawals': 0,
         'pending_user_withdrawals': 0,
         'pending_client_withdrawals': 0,
         'custom_wallets': 0,
@@ -605,20 +685,10 @@ def admin_dashboard():
     }
     
     try:
-        # Update stats with actual values
-        stats.update({
-            'total_clients': Client.query.count(),
-            'total_transactions': Transaction.query.count(),
-            'pending_user_withdrawals': WithdrawalRequest.query.filter_by(
-                status='pending',
-                withdrawal_type='user'
-            ).count(),
-            'pending_client_withdrawals': WithdrawalRequest.query.filter_by(
-                status='pending',
-                withdrawal_type='client'
-            ).count(),
-            'custom_wallets': Client.query.filter(Client.wallet_address.isnot(None)).count()
-        })
+        # Shared between concurrent admins; recomputed by one worker at a time
+        aggregates = _dashboard_aggregates()
+        stats.update(aggregates['stats'])
+        top_clients = aggregates['top_clients']
     except Exception as e:
         current_app.logger.error(f"Error calculating system stats: {str(e)}")
     
@@ -646,12 +716,7 @@ def admin_dashboard():
 @secure_admin_required
 def analytics():
     """Analytics dashboard"""
-    from app.models.transaction import Transaction
-    from app.models.client import Client
-    from app.models.payment import Payment
-    from app.models.withdrawal import WithdrawalRequest
     from datetime import datetime, timedelta
-    from sqlalchemy import func, extract, and_
     
     # Default to 30 days if not specified
     time_period_days = request.args.get('days', default=30, type=int)
@@ -664,90 +729,11 @@ def analytics():
         # If time_period_days is 0, show all time
         start_date = datetime.min
     
-    # Get total transactions count
-    total_transactions = Transaction.query.count()
-    
-    # Get total clients count
-    total_clients = Client.query.count()
-    
-    # Get total payment volume
-    total_volume = db.session.query(func.sum(Transaction.amount)).scalar() or 0
-    
-    # Get pending withdrawals count
-    pending_withdrawals = WithdrawalRequest.query.filter_by(status='pending').count()
-    
-    # Get transaction volume over time
+    # Bucket reads shared between concurrent admins; recomputed by one worker at a time
     time_period = request.args.get('period', '7d')
-    if time_period == '7d':
-        days = 7
-        time_series = db.session.query(
-            func.date(Transaction.created_at).label('date'),
-            func.count(Transaction.id).label('count'),
-            func.sum(Transaction.amount).label('total_amount')
-        ).join(
-            Payment, Transaction.payment_id == Payment.id
-        ).filter(
-            Transaction.created_at >= datetime.utcnow() - timedelta(days=days)
-        ).group_by(
-            func.date(Transaction.created_at)
-        ).order_by('date').all()
-    elif time_period == '30d':
-        days = 30
-        time_series = db.session.query(
-            func.date_trunc('day', Transaction.created_at).label('date'),
-            func.count(Transaction.id).label('count'),
-            func.sum(Transaction.amount).label('total_amount')
-        ).join(
-            Payment, Transaction.payment_id == Payment.id
-        ).filter(
-            Transaction.created_at >= datetime.utcnow() - timedelta(days=days)
-        ).group_by(
-            func.date_trunc('day', Transaction.created_at)
-        ).order_by('date').all()
-    else:  # 12m
-        time_series = db.session.query(
-            func.date_trunc('month', Transaction.created_at).label('date'),
-            func.count(Transaction.id).label('count'),
-            func.sum(Transaction.amount).label('total_amount')
-        ).join(
-            Payment, Transaction.payment_id == Payment.id
-        ).filter(
-            Transaction.created_at >= datetime.utcnow() - timedelta(days=365)
-        ).group_by(
-            func.date_trunc('month', Transaction.created_at)
-        ).order_by('date').all()
-
-    # Get status counts
-    status_counts = db.session.query(
-        Transaction.status,
-        func.count(Transaction.id).label('count')
-    ).join(
-        Payment, Transaction.payment_id == Payment.id
-    ).group_by(Transaction.status).all()
-
-    # Get top 5 clients by transaction volume
-    top_clients = db.session.query(
-        Client.id,
-        Client.company_name,
-        func.count(Transaction.id).label('tx_count'),
-        func.sum(Transaction.amount).label('total_volume')
-    ).join(
-        Payment, Transaction.payment_id == Payment.id
-    ).join(
-        Client, Payment.client_id == Client.id
-    ).group_by(
-        Client.id, Client.company_name
-    ).order_by(
-        db.desc('total_volume')
-    ).limit(5).all()
-    
-    # Format data for Chart.js
-    chart_labels = [d[0].strftime('%Y-%m-%d') for d in time_series]
-    # Format chart data as a dictionary with count and volume
-    chart_data = {
-        'count': [float(d[1]) if d[1] is not None else 0 for d in time_series],  # d[1] is count
-        'volume': [float(d[2]) if d[2] is not None else 0 for d in time_series]  # d[2] is total_amount
-    }
+    if time_period not in ('7d', '30d'):
+        time_period = '12m'
+    aggregates = _analytics_aggregates(time_period)
     
     # Ensure all dates are timezone-aware and properly formatted for the template
     try:
@@ -768,14 +754,14 @@ def analytics():
     return render_template('admin/analytics.html',
                          time_period=time_period,
                          time_period_days=time_period_days,
-                         total_transactions=total_transactions,
-                         total_clients=total_clients,
-                         total_volume=float(total_volume) if total_volume is not None else 0,
-                         pending_withdrawals=pending_withdrawals,
-                         chart_labels=chart_labels,
-                         chart_data=chart_data,
-                         status_counts=dict(status_counts),
-                         top_clients=top_clients,
+                         total_transactions=aggregates['total_transactions'],
+                         total_clients=aggregates['total_clients'],
+                         total_volume=aggregates['total_volume'],
+                         pending_withdrawals=aggregates['pending_withdrawals'],
+                         chart_labels=aggregates['chart_labels'],
+                         chart_data=aggregates['chart_data'],
+                         status_counts=aggregates['status_counts'],
+                         top_clients=aggregates['top_clients'],
                          start_date=start_date,
                          end_date=end_date,
                          start_date_str=start_date_str,
@@ -787,46 +773,60 @@ def analytics():
 @rate_limit('admin_audit_trail', limit=100, window=300)  # 100 requests per 5 minutes
 @secure_admin_required
 def audit_trail():
-    """Show audit trail entries with filtering"""
-    from app.models.audit import AuditTrail
+    """Show audit trail entries with filtering (keyset-paginated, newest first)"""
     from app.models.user import User
     from app.constants.audit import AuditActionType
+    from app.services.audit_browser import AuditFilters, audit_browser
     
     # Get filter parameters
-    action_type = request.args.get('action_type')
-    entity_type = request.args.get('entity_type')
-    entity_id = request.args.get('entity_id', type=int)
-    user_id = request.args.get('user_id', type=int)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # Build query
-    query = AuditTrail.query
-    
-    if action_type:
-        query = query.filter_by(action_type=action_type)
-    if entity_type:
-        query = query.filter_by(entity_type=entity_type)
-    if entity_id:
-        query = query.filter_by(entity_id=entity_id)
-    if user_id:
-        query = query.filter_by(user_id=user_id)
-    if start_date:
-        query = query.filter(AuditTrail.created_at >= start_date)
-    if end_date:
-        query = query.filter(AuditTrail.created_at <= end_date)
-    
-    # Get users for dropdown
-    users = User.query.all()
-    
-    # Get audit entries with pagination
-    audit_entries = query.order_by(AuditTrail.created_at.desc()).all()
+    filters = AuditFilters.from_args(request.args)
+    
+    # Get one page of audit entries after/before the cursor
+    page = audit_browser.page(
+        filters,
+        cursor=request.args.get('cursor'),
+        direction=request.args.get('direction', 'next'),
+        per_page=request.args.get('per_page', type=int)
+    )
+    
+    # Only the selected user is needed to label the typeahead
+    selected_user = db.session.get(User, filters.user_id) if filters.user_id else None
+    
+    # Pagination links keep every filter except the cursor
+    link_args = {k: v for k, v in request.args.items() if k not in ('cursor', 'direction')}
     
     return render_template('admin/audit_trail.html',
-                         audit_entries=audit_entries,
-                         users=users,
+                         audit_entries=page.entries,
+                         page=page,
+                         link_args=link_args,
+                         selected_user=selected_user,
                          AuditActionType=AuditActionType)
 
+@admin_bp.route('/audit-trail/export')
+@rate_limit('admin_audit_export', limit=10, window=300)
+@secure_admin_required
+def export_audit_trail():
+    """Export audit entries matching the audit trail filters (format=csv|jsonl; gzip=1)"""
+    from app.services.audit_browser import AuditFilters
+    from app.services.data_export import audit_export_spec, data_exporter
+    
+    return data_exporter.response(
+        audit_export_spec(),
+        AuditFilters.from_args(request.args).criteria(),
+        fmt=request.args.get('format', 'csv'),
+        compress=request.args.get('gzip', type=int) == 1
+    )
+
+@admin_bp.route('/audit-trail/users')
+@rate_limit('admin_audit_user_search', limit=300, window=300)
+@secure_admin_required
+def audit_trail_user_search():
+    """Typeahead for the audit trail user filter"""
+    from app.services.audit_browser import audit_browser
+    
+    users = audit_browser.search_users(request.args.get('q', ''), limit=20)
+    return jsonify({'users': users})
+
 # Payment Routes
 @admin_bp.route('/payments/view/<int:payment_id>')
 @secure_admin_required
@@ -1133,7 +1133,10 @@ def create_report():
                 request=request
             )
             
-            flash('Report created successfully', 'success')
+            # Generated in the background; view/export serve the stored result
+            report_engine.submit(report)
+            
+            flash('Report created; it will be ready shortly', 'success')
             return redirect(url_for('admin.reports'))
         except Exception as e:
             db.session.rollback()
@@ -1148,8 +1151,8 @@ def view_report(report_id):
     """View a specific report"""
     report = Report.query.get_or_404(report_id)
     
-    # Generate report data
-    report_data = report.generate_report()
+    # Served from the stored result; generation happens in the background
+    report_data = report_engine.stored_result(report)
     
     # Format data for display
     if report_data:
@@ -1170,9 +1173,28 @@ def view_report(report_id):
             data=report_data
         )
     
-    flash('Error generating report', 'error')
+    _flash_report_status(report)
+    return redirect(url_for('admin.reports'))
+
+@admin_bp.route('/report/<int:report_id>/regenerate', methods=['POST'])
+@login_required
+@admin_required
+def regenerate_report(report_id):
+    """Recompute a report from current data"""
+    report = Report.query.get_or_404(report_id)
+    if report.status == ReportStatus.PROCESSING.value:
+        flash('Report is already being generated', 'info')
+    else:
+        report_engine.submit(report, refresh=True)
+        flash('Report queued for regeneration', 'success')
     return redirect(url_for('admin.reports'))
 
+def _flash_report_status(report):
+    if report.status == ReportStatus.FAILED.value:
+        flash(f'Error generating report: {report.error or "unknown error"}', 'error')
+    else:
+        flash('Report is still being generated, please check back shortly', 'info')
+
 @admin_bp.route('/report/<int:report_id>/delete', methods=['POST'])
 @login_required
 @admin_required
@@ -1210,19 +1232,19 @@ def delete_report(report_id):
 def export_report(report_id):
     """Export report data"""
     report = Report.query.get_or_404(report_id)
-    report_data = report.generate_report()
+    report_data = report_engine.stored_result(report)
     
     if report_data:
+        from app.services.data_export import data_exporter
+        
         # Format filename
-        filename = f"report_{report.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"report_{report.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        # Create response
-        response = make_response(json.dumps(report_data, indent=2))
-        response.headers['Content-Type'] = 'application/json'
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        # Encode incrementally instead of building the whole JSON string
+        return data_exporter.json_response(report_data, filename,
+                                           compress=request.args.get('gzip', type=int) == 1)
     
-    flash('Error exporting report', 'error')
+    _flash_report_status(report)
     return redirect(url_for('admin.reports'))
 
 
@@ -5,8 +5,12 @@ from app.extensions import db
 from app.models.audit import AuditTrail, AuditActionType
 from app.utils.security import rate_limit, abuse_protection
 from app.utils.audit import log_api_usage, log_security_event, log_client_setting_change
+from app.services.webhook_config import webhook_config_cache
+from app.services.tenant_registry import tenant_registry
 import secrets
 
+BRANDING_KEYS = ('logo_url', 'primary_color', 'secondary_color')
+
 client_settings_api = Blueprint('client_settings_api', __name__, url_prefix='/api/client/settings')
 
 @client_settings_api.route('/api-keys', methods=['GET', 'POST'])
@@ -110,8 +114,9 @@ def manage_webhook():
         )
         
         # Get current webhook settings
-        webhook_url = ClientSetting.get_setting(client.id, ClientSettingKey.WEBHOOK_URL)
-        webhook_secret = ClientSetting.get_setting(client.id, ClientSettingKey.WEBHOOK_SECRET)
+        settings = client.settings or {}
+        webhook_url = settings.get('webhook_url')
+        webhook_secret = settings.get('webhook_secret')
         
         return jsonify({
             'success': True,
@@ -131,11 +136,15 @@ def manage_webhook():
             ip_address=request.remote_addr
         )
         
-        old_webhook_url = ClientSetting.get_setting(client.id, ClientSettingKey.WEBHOOK_URL)
+        settings = dict(client.settings or {})
+        old_webhook_url = settings.get('webhook_url')
         
-        # Update webhook settings
-        ClientSetting.update_setting(client.id, ClientSettingKey.WEBHOOK_URL, data.get('webhook_url'))
-        ClientSetting.update_setting(client.id, ClientSettingKey.WEBHOOK_SECRET, secrets.token_hex(32))
+        # Update webhook settings (client.settings is what webhook verification reads)
+        settings['webhook_url'] = data.get('webhook_url')
+        settings['webhook_secret'] = secrets.token_hex(32)
+        client.settings = settings
+        webhook_config_cache.invalidate_after_commit(client.id)
+        db.session.commit()
         
         # Log audit trail
         AuditTrail.log_action(
@@ -190,15 +199,13 @@ def manage_branding():
         )
         
         # Get current branding settings
-        logo_url = ClientSetting.get_setting(client.id, ClientSettingKey.LOGO_URL)
-        primary_color = ClientSetting.get_setting(client.id, ClientSettingKey.PRIMARY_COLOR)
-        secondary_color = ClientSetting.get_setting(client.id, ClientSettingKey.SECONDARY_COLOR)
+        settings = client.settings or {}
         
         return jsonify({
             'success': True,
-            'logo_url': logo_url,
-            'primary_color': primary_color,
-            'secondary_color': secondary_color
+            'logo_url': settings.get('logo_url'),
+            'primary_color': settings.get('primary_color'),
+            'secondary_color': settings.get('secondary_color')
         })
     
     if request.method == 'POST':
@@ -213,17 +220,17 @@ def manage_branding():
             ip_address=request.remote_addr
         )
         
+        settings = dict(client.settings or {})
+        
         # Get old values for audit
-        old_values = {
-            'logo_url': ClientSetting.get_setting(client.id, ClientSettingKey.LOGO_URL),
-            'primary_color': ClientSetting.get_setting(client.id, ClientSettingKey.PRIMARY_COLOR),
-            'secondary_color': ClientSetting.get_setting(client.id, ClientSettingKey.SECONDARY_COLOR)
-        }
-        
-        # Update branding settings
-        ClientSetting.update_setting(client.id, ClientSettingKey.LOGO_URL, data.get('logo_url'))
-        ClientSetting.update_setting(client.id, ClientSettingKey.PRIMARY_COLOR, data.get('primary_color'))
-        ClientSetting.update_setting(client.id, ClientSettingKey.SECONDARY_COLOR, data.get('secondary_color'))
+        old_values = {key: settings.get(key) for key in BRANDING_KEYS}
+        
+        # Update branding settings (client.settings is what the tenant registry serves)
+        for key in BRANDING_KEYS:
+            settings[key] = data.get(key)
+        client.settings = settings
+        tenant_registry.bump_after_commit()
+        db.session.commit()
         
         # Log audit trail
         AuditTrail.log_action(
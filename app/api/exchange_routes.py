@@ -2,12 +2,18 @@ from flask import Blueprint, request, jsonify, current_app
 from decimal import Decimal, InvalidOperation
 from datetime import datetime, timedelta
 from functools import wraps
-from app.utils.exchange import get_exchange_rate, convert_fiat_to_crypto
+from app.utils.exchange import get_exchange_rate, convert_fiat_to_crypto, convert_many
+from app.utils.crypto_config import SUPPORTED_CRYPTOCURRENCIES
+from app.services.rate_engine import rate_engine, SUPPORTED_FIAT_CURRENCIES
+from app.extensions import csrf
 from app.utils.security import rate_limit, abuse_protection
 from app.utils.audit import log_api_usage
 
 bp = Blueprint('exchange', __name__, url_prefix='/api/exchange')
 
+# Upper bound on quotes per batch request (e.g. 500 catalog items x 12 coins)
+MAX_BATCH_QUOTES = 10000
+
 def validate_currency(f):
     """Decorator to validate currency parameters"""
     @wraps(f)
@@ -62,21 +68,21 @@ def get_rate(fiat_currency, crypto_currency):
             ip_address=request.remote_addr
         )
         
-        rate = get_exchange_rate(fiat_currency, crypto_currency)
+        # Read rate and staleness metadata from the same snapshot
+        snapshot = rate_engine.get_snapshot()
+        rate = snapshot.get(crypto_currency, fiat_currency)
         if not rate:
             return jsonify({
                 'success': False,
                 'error': 'Could not fetch exchange rate. Please try again later.'
             }), 503
-            
-        expiry = (datetime.utcnow() + timedelta(minutes=15)).isoformat()
         
         return jsonify({
             'success': True,
             'fiat_currency': fiat_currency,
             'crypto_currency': crypto_currency,
             'rate': str(rate),
-            'rate_expiry': expiry,
+            **snapshot.metadata(),
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -135,7 +141,7 @@ def convert(fiat_currency, crypto_currency):
         )
             
         # Get the exchange rate
-        rate = get_exchange_rate(fiat_currency, crypto_currency)
+        rate = get_exchange_rate(crypto_currency, fiat_currency)
         if not rate:
             return jsonify({
                 'success': False,
@@ -163,3 +169,105 @@ def convert(fiat_currency, crypto_currency):
             'success': False,
             'error': 'An unexpected error occurred during conversion.'
         }), 500
+
+@bp.route('/convert/batch', methods=['POST'])
+@csrf.exempt
+@rate_limit('exchange_convert_batch', limit=30)
+@abuse_protection('exchange_convert_batch', threshold=100)
+def convert_batch():
+    """
+    Convert many fiat amounts to crypto from a single rate snapshot
+    
+    JSON Body (either form):
+        items: [{"amount": "19.99", "fiat_currency": "USD", "crypto_currency": "BTC"}, ...]
+        or
+        amounts: ["19.99", "5.00", ...], fiat_currency: "USD",
+        crypto_currencies: ["BTC", "ETH", ...]  (every amount priced in every coin)
+        
+    Returns:
+        JSON with one quote per item, in request order, plus snapshot metadata
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if 'items' in data:
+            raw_items = data.get('items') or []
+            if not isinstance(raw_items, list):
+                return jsonify({'success': False, 'error': 'items must be a list'}), 400
+            try:
+                pairs = [
+                    (item.get('amount'),
+                     str(item.get('fiat_currency', 'USD')).upper(),
+                     str(item.get('crypto_currency', '')).upper())
+                    for item in raw_items
+                ]
+            except AttributeError:
+                return jsonify({'success': False, 'error': 'Each item must be an object'}), 400
+        else:
+            amounts = data.get('amounts') or []
+            cryptos = data.get('crypto_currencies') or []
+            fiat = str(data.get('fiat_currency', 'USD')).upper()
+            if not isinstance(amounts, list) or not isinstance(cryptos, list):
+                return jsonify({
+                    'success': False,
+                    'error': 'amounts and crypto_currencies must be lists'
+                }), 400
+            pairs = [(amount, fiat, str(crypto).upper()) for amount in amounts for crypto in cryptos]
+        
+        if not pairs:
+            return jsonify({'success': False, 'error': 'No amounts to convert'}), 400
+        if len(pairs) > MAX_BATCH_QUOTES:
+            return jsonify({
+                'success': False,
+                'error': f'Too many quotes requested. Maximum: {MAX_BATCH_QUOTES}'
+            }), 400
+        
+        # Validate everything up front so one bad item rejects the batch
+        items = []
+        for index, (amount, fiat, crypto) in enumerate(pairs):
+            if fiat not in SUPPORTED_FIAT_CURRENCIES:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unsupported fiat currency at index {index}. Supported: {sorted(SUPPORTED_FIAT_CURRENCIES)}'
+                }), 400
+            if crypto not in SUPPORTED_CRYPTOCURRENCIES:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unsupported cryptocurrency at index {index}'
+                }), 400
+            try:
+                amount = Decimal(str(amount))
+                if not amount.is_finite() or amount <= 0:
+                    raise ValueError("Amount must be positive")
+            except (ValueError, InvalidOperation):
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid amount at index {index}. Please provide a positive number.'
+                }), 400
+            items.append((amount, fiat, crypto))
+        
+        snapshot = rate_engine.get_snapshot()
+        quotes = []
+        for (amount, fiat, crypto), (crypto_amount, rate) in zip(items, convert_many(items, snapshot)):
+            quotes.append({
+                'fiat_amount': str(amount),
+                'fiat_currency': fiat,
+                'crypto_currency': crypto,
+                'crypto_amount': str(crypto_amount) if crypto_amount is not None else None,
+                'exchange_rate': str(rate) if rate is not None else None
+            })
+        
+        return jsonify({
+            'success': True,
+            'count': len(quotes),
+            'quotes': quotes,
+            **snapshot.metadata(),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error in convert_batch: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred during batch conversion.'
+        }), 500
@@ -11,6 +11,8 @@ from app.utils.security import rate_limit, abuse_protection
 from app.utils.audit import log_api_usage, log_security_event
 from app.utils.fraud_detection import FraudDetectionService
 from app.utils.webhook_security import WebhookHandler
+from app.services.webhook_dispatcher import webhook_dispatcher, payment_payload
+from app.services.idempotency import idempotent
 import hashlib
 import hmac
 import json
@@ -108,6 +110,7 @@ def register_platform():
 @jwt_required()
 @rate_limit('payment_initiate', limit=30)
 @abuse_protection('payment_initiate', threshold=100)
+@idempotent('payment_initiate')
 def initiate_payment():
     """Initiate a new payment for a platform"""
     data = request.get_json()
@@ -163,6 +166,17 @@ def initiate_payment():
         )
         
         db.session.add(payment)
+        db.session.flush()
+        
+        # Queue the webhook in the same transaction as the payment (outbox)
+        if platform.webhook_url:
+            webhook_dispatcher.enqueue(
+                payment.client_id,
+                'payment_created',
+                {'payment': payment_payload(payment)},
+                url=platform.webhook_url
+            )
+        
         db.session.commit()
         
         # Log audit trail
@@ -176,17 +190,6 @@ def initiate_payment():
             request=request
         )
         
-        # Send webhook notification
-        if platform.webhook_url:
-            webhook_data = {
-                'event': 'payment_created',
-                'payment': payment.to_dict()
-            }
-            
-            # Send to platform's webhook URL
-            # Implementation for webhook sending
-            pass
-        
         return jsonify({
             'success': True,
             'payment_id': payment.id,
@@ -244,6 +247,18 @@ def payment_webhook():
         
         # Update payment status
         payment.status = status
+        
+        # Notify the merchant in the same transaction as the status change
+        if payment.status != old_status:
+            webhook_dispatcher.enqueue(
+                payment.client_id,
+                'payment_status_changed',
+                {
+                    'payment': payment_payload(payment),
+                    'previous_status': old_status.value if hasattr(old_status, 'value') else old_status
+                },
+                url=payment.platform.webhook_url if payment.platform else None
+            )
         db.session.commit()
         
         # Log audit trail
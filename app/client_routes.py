@@ -31,6 +31,9 @@ from app.forms.client_forms import (
 from app.models.audit import AuditTrail, AuditActionType
 from app.models.notification import NotificationType, NotificationEvent
 from app.utils.finance import FinanceCalculator
+from app.services.balance_ledger import balance_ledger
+from app.services.dashboard_rollup import dashboard_rollup
+from app.services.idempotency import idempotent
 from app.models.client_wallet import WalletType
 import os
 
@@ -350,9 +353,10 @@ def dashboard(client=None):  # Accept client from decorator
         # Get recent payments - handle case-insensitive status
         try:
             # First try with SQLAlchemy ORM
+            # count=False: the dashboard only lists recent items, skip the COUNT(*)
             payments = Payment.query.filter(Payment.client_id == client.id)\
                 .order_by(Payment.created_at.desc())\
-                .paginate(page=page, per_page=per_page)
+                .paginate(page=page, per_page=per_page, count=False)
         except Exception as e:
             current_app.logger.error(f"Error querying payments with ORM: {str(e)}")
             
@@ -407,7 +411,7 @@ def dashboard(client=None):  # Accept client from decorator
         try:
             withdrawals = WithdrawalRequest.query.filter_by(client_id=client.id)\
                 .order_by(WithdrawalRequest.created_at.desc())\
-                .paginate(page=page, per_page=per_page)
+                .paginate(page=page, per_page=per_page, count=False)
         except Exception as e:
             current_app.logger.error(f"Error querying withdrawals with ORM: {str(e)}")
             # Fallback to raw SQL with proper type conversion
@@ -456,30 +460,16 @@ def dashboard(client=None):  # Accept client from decorator
             # Use the same SimplePagination class
             withdrawals = SimplePagination(withdrawals_data, page, per_page, count)
         
-        # Calculate balance and commissions
-        balance = FinanceCalculator.calculate_client_balance(client.id)
-        deposit_commission, withdrawal_commission, total_commission = FinanceCalculator.calculate_commission(client.id)
+        # Balance and commissions: one primary-key lookup on the balance ledger
+        ledger_totals = balance_ledger.get_totals(client.id)
+        balance, deposit_commission, withdrawal_commission, total_commission = \
+            FinanceCalculator.summarize_totals(client, ledger_totals)
+        total_deposits = ledger_totals.deposit_total
+        total_withdrawals = ledger_totals.withdrawal_total
         
-        # Get total deposits and withdrawals
-        total_deposits = db.session.query(func.sum(Payment.amount))\
-            .filter_by(client_id=client.id, status='completed')\
-            .scalar() or Decimal('0')
-            
-        total_withdrawals = db.session.query(func.sum(WithdrawalRequest.amount))\
-            .filter_by(client_id=client.id, status='approved')\
-            .scalar() or Decimal('0')
-        
-        # Calculate monthly transactions for the stats card
-        from sqlalchemy import extract
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        monthly_transactions = db.session.query(func.count(Payment.id))\
-            .filter(
-                Payment.client_id == client.id,
-                extract('month', Payment.created_at) == current_month,
-                extract('year', Payment.created_at) == current_year
-            ).scalar() or 0
+        # Activity counters: one query over the client's daily rollup rows
+        activity = dashboard_rollup.summary(client.id)
+        monthly_transactions = activity.monthly_transactions
         
         # Get available features based on client package
         available_features = []
@@ -489,12 +479,11 @@ def dashboard(client=None):  # Accept client from decorator
         # Get API usage stats if client has API feature
         api_stats = None
         if client.has_feature('api_basic'):
-            # Calculate API usage stats for this month
-            from app.models.api_usage import ApiUsage
+            # API usage for this month comes from the same rollup rows
             api_stats = {
-                'calls_this_month': ApiUsage.get_usage_count(client.id, current_month, current_year),
+                'calls_this_month': activity.monthly_api_calls,
                 'limit': package.max_api_calls_per_month if package else 1000,
-                'last_call': ApiUsage.get_last_call(client.id)
+                'last_call': activity.last_api_call_at
             }
         
         return render_template('client/dashboard.html',
@@ -510,6 +499,8 @@ def dashboard(client=None):  # Accept client from decorator
                              total_deposits=total_deposits,
                              total_withdrawals=total_withdrawals,
                              monthly_transactions=monthly_transactions,
+                             volume_30d=activity.volume_30d,
+                             stats_as_of=activity.as_of,
                              available_features=available_features,
                              api_stats=api_stats)
     except Exception as e:
@@ -943,24 +934,17 @@ def dashboard_stats():
                 'error': 'Real-time dashboard stats are available only for Professional plans.'
             }), 403
         
-        # Calculate current balance
-        balance = FinanceCalculator.calculate_client_balance(client.id)
-        
-        # Get monthly transaction count
-        current_month = datetime.now().replace(day=1)
-        monthly_transactions = Payment.query.filter(
-            Payment.client_id == client.id,
-            Payment.created_at >= current_month
-        ).count()
-        
-        # Get recent transactions count
-        recent_count = Payment.query.filter_by(client_id=client.id).count()
+        # Current balance from the ledger, activity from the daily rollups
+        balance = FinanceCalculator.summarize_totals(client, balance_ledger.get_totals(client.id))[0]
+        activity = dashboard_rollup.summary(client.id)
         
         return jsonify({
             'success': True,
             'balance': float(balance),
-            'monthly_transactions': monthly_transactions,
-            'total_transactions': recent_count,
+            'monthly_transactions': activity.monthly_transactions,
+            'total_transactions': activity.total_transactions,
+            'volume_30d': float(activity.volume_30d),
+            'stats_as_of': activity.as_of.isoformat() if activity.as_of else None,
             'last_updated': datetime.utcnow().isoformat()
         })
     except Exception as e:
@@ -1276,11 +1260,9 @@ def regenerate_api_key(key_id):
     try:
         # Generate new key
         new_key = ClientApiKey.generate_key()
-        new_hash = ClientApiKey.hash_key(new_key)
         
-        api_key.key = new_key
-        api_key.key_hash = new_hash
-        api_key.key_prefix = new_key[:8] + '...'
+        # Replaces hash, prefix and digest; the old key's cache entry is dropped on commit
+        api_key.set_key(new_key)
         api_key.updated_at = datetime.utcnow()
         
         db.session.commit()
@@ -1565,6 +1547,7 @@ def withdrawal_requests():
 
 @client_bp.route('/withdrawal-requests/create', methods=['GET', 'POST'])
 @login_required
+@idempotent('withdrawal_request_create')
 def create_withdrawal_request():
     """Create a new withdrawal request for flat-rate clients"""
     client = current_user.client
@@ -0,0 +1,40 @@
+"""
+Payment address pool CLI commands.
+"""
+import click
+from flask.cli import with_appcontext
+from app.services.address_pool import address_pool
+
+
+def register_address_pool_commands(app):
+    """Register payment address pool CLI commands with the Flask application."""
+    @app.cli.group('address-pool')
+    def address_pool_group():
+        """Pre-derived payment address pool commands."""
+        pass
+
+    @address_pool_group.command('refill')
+    @click.option('--coin', 'coins', multiple=True, help='Refill only this coin (repeatable)')
+    @with_appcontext
+    def refill(coins):
+        """Top every pooled coin up to the target size."""
+        written = address_pool.refill(coins=coins or None, force=True)
+        click.echo(f'{written} address(es) derived.')
+
+    @address_pool_group.command('recycle')
+    @with_appcontext
+    def recycle():
+        """Release expired unpaid leases and reopen cooled addresses."""
+        result = address_pool.recycle()
+        click.echo(f"{result['released']} released to cooling, {result['reopened']} reopened, "
+                   f"{result['retired']} retired.")
+
+    @address_pool_group.command('stats')
+    @with_appcontext
+    def stats():
+        """Show address counts per coin and status."""
+        for coin, counts in sorted(address_pool.stats().items()):
+            summary = ', '.join(f'{status} {count}' for status, count in sorted(counts.items()))
+            click.echo(f'{coin}: {summary}')
+
+    return address_pool_group
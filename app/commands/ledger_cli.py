@@ -0,0 +1,38 @@
+"""
+Balance ledger CLI commands.
+"""
+import click
+from flask.cli import with_appcontext
+from app.services.balance_ledger import balance_ledger
+
+
+def register_ledger_commands(app):
+    """Register balance ledger CLI commands with the Flask application."""
+    @app.cli.group()
+    def ledger():
+        """Client balance ledger commands."""
+        pass
+
+    @ledger.command('reconcile')
+    @click.option('--client-id', type=int, help='Reconcile a single client only')
+    @click.option('--dry-run', is_flag=True, help='Report drift without changing the ledger')
+    @with_appcontext
+    def reconcile(client_id, dry_run):
+        """Rebuild ledger rows from payment and withdrawal history."""
+        drift = balance_ledger.reconcile(client_id=client_id, dry_run=dry_run)
+
+        for entry in drift:
+            stored = entry['stored']
+            expected = entry['expected']
+            if stored is None:
+                click.echo(f"Client {entry['client_id']}: missing row -> "
+                           f"deposits {expected['deposit_total']}, withdrawals {expected['withdrawal_total']}")
+            else:
+                click.echo(f"Client {entry['client_id']}: "
+                           f"deposits {stored['deposit_total']} -> {expected['deposit_total']}, "
+                           f"withdrawals {stored['withdrawal_total']} -> {expected['withdrawal_total']}")
+
+        action = 'would be corrected' if dry_run else 'corrected'
+        click.echo(f'{len(drift)} ledger row(s) {action}.')
+
+    return ledger
@@ -11,6 +11,7 @@ from sqlalchemy import and_
 from app.extensions import db
 from app.models.client import Client
 from app.models.client_package import ClientType
+from app.services.usage_reset import usage_reset_engine
 
 
 @click.command()
@@ -61,16 +62,30 @@ def reset_monthly_usage(dry_run, client_id, force):
         click.echo(f"📅 Only resetting clients not yet reset since {current_month_start.date()}")
     else:
         click.echo("⚠️  FORCE mode: resetting all clients regardless of last reset date")
-    
+
+    if not dry_run:
+        # Live resets run through the chunked, checkpointed engine
+        result = usage_reset_engine.run(client_id=client_id, force=force)
+
+        click.echo(f"\n{'=' * 50}")
+        click.echo(f"📋 SUMMARY (run {result['run_key']})")
+        click.echo(f"{'=' * 50}")
+        if result['already_completed']:
+            click.echo("ℹ️  This reset run had already completed; nothing was changed")
+        click.echo(f"✅ Successfully reset {result['clients_reset']} client(s) in {result['batches']} batch(es)")
+        click.echo(f"💰 Total volume reset: ${result['total_volume_reset']:,.2f}")
+        click.echo(f"📈 Total transactions reset: {result['total_transactions_reset']:,}")
+        click.echo(f"\n🏁 Reset operation completed at {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}")
+        return
+
     clients = query.all()
-    
+
     if not clients:
         click.echo("✅ No clients found matching criteria")
         return
-    
+
     click.echo(f"📊 Found {len(clients)} client(s) to process:")
-    
-    reset_count = 0
+
     total_volume_reset = 0
     total_transactions_reset = 0
     
@@ -86,40 +101,20 @@ def reset_monthly_usage(dry_run, client_id, force):
         click.echo(f"   📈 Current Transactions: {current_transactions:,}")
         click.echo(f"   🕒 Last Reset: {last_reset}")
         
-        if not dry_run:
-            # Perform the reset
-            old_volume = client.current_month_volume
-            old_transactions = client.current_month_transactions
-            
-            client.reset_monthly_usage()
-            
-            click.echo(f"   ✅ Reset completed")
-            reset_count += 1
-            total_volume_reset += current_volume
-            total_transactions_reset += current_transactions
-        else:
-            click.echo(f"   🔍 Would reset volume and transactions")
-            total_volume_reset += current_volume
-            total_transactions_reset += current_transactions
-    
+        click.echo(f"   🔍 Would reset volume and transactions")
+        total_volume_reset += current_volume
+        total_transactions_reset += current_transactions
+
     # Summary
     click.echo(f"\n{'=' * 50}")
     click.echo(f"📋 SUMMARY")
     click.echo(f"{'=' * 50}")
-    
-    if dry_run:
-        click.echo(f"📊 Would reset {len(clients)} client(s)")
-        click.echo(f"💰 Total volume to reset: ${total_volume_reset:,.2f}")
-        click.echo(f"📈 Total transactions to reset: {total_transactions_reset:,}")
-        click.echo(f"\n💡 Run without --dry-run to execute the reset")
-    else:
-        click.echo(f"✅ Successfully reset {reset_count} client(s)")
-        click.echo(f"💰 Total volume reset: ${total_volume_reset:,.2f}")
-        click.echo(f"📈 Total transactions reset: {total_transactions_reset:,}")
-        
-        if reset_count != len(clients):
-            click.echo(f"⚠️  Warning: {len(clients) - reset_count} client(s) had issues during reset")
-    
+
+    click.echo(f"📊 Would reset {len(clients)} client(s)")
+    click.echo(f"💰 Total volume to reset: ${total_volume_reset:,.2f}")
+    click.echo(f"📈 Total transactions to reset: {total_transactions_reset:,}")
+    click.echo(f"\n💡 Run without --dry-run to execute the reset")
+
     click.echo(f"\n🏁 Reset operation completed at {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}")
 
 
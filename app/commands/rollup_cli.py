@@ -0,0 +1,44 @@
+"""
+Dashboard rollup CLI commands.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from app.services.dashboard_rollup import dashboard_rollup
+from app.services.transaction_rollup import transaction_rollup
+
+
+def register_rollup_commands(app):
+    """Register dashboard rollup CLI commands with the Flask application."""
+    @app.cli.group()
+    def rollup():
+        """Client dashboard and transaction rollup commands."""
+        pass
+
+    @rollup.command('refresh')
+    @click.option('--days', type=int, default=None, help='Number of days to rebuild, ending today (default: configured lookback)')
+    @click.option('--client-id', type=int, help='Rebuild a single client only')
+    @with_appcontext
+    def refresh(days, client_id):
+        """Rebuild daily rollup rows from payments, withdrawals and API usage."""
+        written = dashboard_rollup.refresh(days=days, client_id=client_id)
+        click.echo(f'{written} rollup row(s) written.')
+
+    @rollup.command('transactions')
+    @click.option('--days', type=int, default=None, help='Number of days to rebuild, ending today')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), help='Rebuild from this day (YYYY-MM-DD) to today')
+    @with_appcontext
+    def transactions(days, since):
+        """Rebuild hourly transaction buckets from the transactions table."""
+        today = datetime.utcnow().date()
+        if since is not None:
+            start = since.date()
+        elif days:
+            start = today - timedelta(days=days - 1)
+        else:
+            raise click.UsageError('Pass --days or --since')
+        written = transaction_rollup.backfill(start, today)
+        click.echo(f'{written} transaction bucket(s) written.')
+
+    return rollup
@@ -2,6 +2,10 @@ class Config:
     # Safe default cache config for Flask-Caching
     CACHE_TYPE = 'SimpleCache'
     CACHE_DEFAULT_TIMEOUT = 300
+    SINGLE_FLIGHT_SOFT_TTL = 30  # seconds a single-flight value is fresh
+    SINGLE_FLIGHT_HARD_TTL = 300  # seconds a stale value may still be served while refreshing
+    SINGLE_FLIGHT_LOCK_TTL = 30  # seconds a worker holds the recompute lock
+    SINGLE_FLIGHT_WAIT_TIMEOUT = 10.0  # seconds callers wait on another worker's computation
     SECRET_KEY = 'your-secret-key'
     # SQLALCHEMY_DATABASE_URI is set in the app factory to ensure correct path
     SQLALCHEMY_DATABASE_URI = None
@@ -26,6 +30,104 @@ class Config:
     BABEL_DEFAULT_LOCALE = 'en'
     BABEL_DEFAULT_TIMEZONE = 'UTC'
 
+    # Exchange Rate Engine
+    EXCHANGE_RATE_API_URL = 'https://api.coingecko.com/api/v3/simple/price'
+    RATE_ENGINE_LIVE_FETCH = True
+    RATE_ENGINE_REFRESH_INTERVAL = 60  # seconds between batched upstream fetches
+    RATE_ENGINE_L1_TTL = 5  # seconds a worker trusts its in-process snapshot
+    RATE_ENGINE_STALE_AFTER = 300  # seconds before a snapshot is reported stale
+
+    # Audit Pipeline
+    AUDIT_ASYNC = True
+    AUDIT_QUEUE_MAXSIZE = 10000
+    AUDIT_BATCH_SIZE = 200
+    AUDIT_FLUSH_INTERVAL = 1.0  # seconds between flushes of a partial batch
+    AUDIT_ENQUEUE_TIMEOUT = 0.0  # seconds to wait on a full queue before dropping
+    AUDIT_TRAIL_PER_PAGE = 50  # admin audit trail rows per keyset page
+    AUDIT_TRAIL_COUNT_CAP = 10000  # exact counts up to this many rows, estimates beyond
+    AUDIT_TRAIL_COUNT_CACHE_TTL = 60  # seconds a filter's count is reused
+
+    # Data Export Configuration
+    EXPORT_BATCH_SIZE = 2000  # rows fetched per server-side cursor batch
+    EXPORT_CHUNK_BYTES = 64 * 1024  # bytes buffered before each response chunk
+    EXPORT_GZIP_LEVEL = 6
+
+    # Report Engine
+    REPORT_ASYNC = True  # generate reports on background workers
+    REPORT_WORKERS = 2  # concurrent report generations per process
+    REPORT_RESULT_TTL = 900  # seconds a (type, filters) result is shared between reports
+    REPORT_LEASE_SECONDS = 600  # seconds before a stuck generation is reclaimed
+    REPORT_SWEEP_INTERVAL = 60  # seconds between sweeps for pending or stranded reports
+
+    # API Key Authentication
+    API_KEY_DIGEST_SECRET = os.environ.get('API_KEY_DIGEST_SECRET')  # falls back to SECRET_KEY
+    API_KEY_CACHE_TTL = 60  # seconds a verified key stays in the shared cache
+    API_KEY_LOCAL_CACHE_TTL = 5  # seconds a worker trusts its own copy
+
+    # Client Dashboard Rollups
+    DASHBOARD_ROLLUP_ENABLED = True
+    DASHBOARD_ROLLUP_INTERVAL = 300  # seconds between rebuilds of recent days
+    DASHBOARD_ROLLUP_LOOKBACK_DAYS = 2  # days rebuilt per run (covers midnight rollover)
+    TRANSACTION_ROLLUP_BACKFILL_BATCH = 5000  # rows streamed per batch by `flask rollup transactions`
+
+    # Fraud Feature Store
+    FRAUD_FEATURE_CACHE_TTL = 30  # seconds computed withdrawal features are reused
+    FRAUD_FEATURE_RECENT_LIMIT = 100  # recent withdrawals sampled for pattern checks
+
+    # Merchant Webhook Delivery
+    WEBHOOK_DISPATCH_ENABLED = True
+    WEBHOOK_WORKERS = 8  # concurrent deliveries per process
+    WEBHOOK_MAX_PER_ENDPOINT = 2  # concurrent deliveries per merchant endpoint
+    WEBHOOK_POLL_INTERVAL = 2.0  # seconds between outbox polls (commits wake it sooner)
+    WEBHOOK_REQUEST_TIMEOUT = 10.0
+    WEBHOOK_LEASE_SECONDS = 60  # claimed rows not finished by then are reclaimed
+    WEBHOOK_MAX_ATTEMPTS = 8
+    WEBHOOK_BACKOFF_BASE = 10.0  # seconds before the first retry, doubled per attempt
+    WEBHOOK_BACKOFF_MAX = 3600.0
+    WEBHOOK_BREAKER_THRESHOLD = 5  # consecutive failures that open an endpoint's circuit
+    WEBHOOK_BREAKER_COOLDOWN = 60.0  # seconds before a half-open probe
+
+    # Idempotency Keys
+    IDEMPOTENCY_TTL = 86400  # seconds a completed response can be replayed
+    IDEMPOTENCY_LOCK_TTL = 60  # seconds an in-flight request holds its key
+    IDEMPOTENCY_WAIT_TIMEOUT = 10.0  # seconds a duplicate waits for the first request
+
+    # Payment Status Streams
+    PAYMENT_EVENTS_REDIS = True  # fan out through Redis pub/sub when available
+    PAYMENT_STREAM_HEARTBEAT = 15.0  # seconds between keepalive comments
+    PAYMENT_STREAM_MAX_DURATION = 120.0  # seconds before a stream closes and the browser reconnects
+    PAYMENT_STREAM_MAX_PER_PROCESS = 2  # streams per worker process (each holds a gthread thread)
+
+    # Payment Address Pool
+    ADDRESS_POOL_ENABLED = True  # background refill/recycle; checkout falls back to inline derivation when empty
+    ADDRESS_POOL_COINS = None  # coins kept pooled (default: COIN_LIST)
+    ADDRESS_POOL_TARGET_SIZE = 50  # available addresses per coin after a refill
+    ADDRESS_POOL_LOW_WATERMARK = 20  # refill a coin once its available addresses drop below this
+    ADDRESS_POOL_REFILL_BATCH = 100  # addresses derived per insert/commit
+    ADDRESS_POOL_COOLDOWN = 7 * 86400  # seconds an unpaid payment's address rests before reuse
+    ADDRESS_POOL_MAINTENANCE_INTERVAL = 60  # seconds between refill/recycle passes
+
+    # Payment QR Codes
+    QR_CACHE_DIR = None  # rendered PNGs shared by all workers (default: instance/qr_cache)
+    QR_CACHE_MAX_FILES = 10000  # prune keeps at most this many PNGs
+    QR_CACHE_MAX_AGE = 30 * 86400  # seconds before a cached PNG is pruned
+    QR_CACHE_PRUNE_INTERVAL = 3600  # seconds between prunes; 0 disables
+    QR_MEMORY_CACHE_SIZE = 256  # PNGs kept in each worker's LRU
+    QR_RENDER_PROCESSES = 2  # render pool size per worker; 0 renders on the request thread
+    QR_RENDER_TIMEOUT = 10.0  # seconds a request waits for a render
+    QR_DEFAULT_SCALE = 6
+    QR_MAX_DATA_LENGTH = 512  # longest payload a QR URL may carry
+
+    # Inbound Webhook Replay Cache
+    WEBHOOK_REPLAY_BUCKET_SECONDS = 60  # one Bloom filter per bucket
+    WEBHOOK_REPLAY_BLOOM_BITS = 1 << 24  # 2 MB per bucket
+    WEBHOOK_REPLAY_BLOOM_HASHES = 7
+    WEBHOOK_CONFIG_CACHE_TTL = 300  # seconds a client's webhook config stays in the shared cache
+    WEBHOOK_CONFIG_LOCAL_CACHE_TTL = 30  # seconds a worker trusts its own copy
+
+    # Multi-tenant Configuration
+    TENANT_REGISTRY_CHECK_INTERVAL = 5  # seconds between version-stamp checks per worker
+
     # Coin Configuration
     COIN_LIST = [
         'BTC', 'ETH', 'USDT', 'USDC', 'BNB', 'XRP', 'SOL', 'DOGE', 'TRX',
@@ -40,6 +142,9 @@ class Config:
         'enterprise_flat_rate': 25
     }
 
+    COIN_CATALOG_CHECK_INTERVAL = 10  # seconds between coin catalog version checks per worker
+    ENTITLEMENTS_CHECK_INTERVAL = 10  # seconds between package entitlement version checks per worker
+
     COIN_DISPLAY_NAMES = {
         'BTC': 'Bitcoin',
         'ETH': 'Ethereum',
@@ -73,6 +178,15 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    RATE_ENGINE_LIVE_FETCH = False
+    AUDIT_ASYNC = False
+    REPORT_ASYNC = False
+    DASHBOARD_ROLLUP_ENABLED = False
+    WEBHOOK_DISPATCH_ENABLED = False
+    PAYMENT_EVENTS_REDIS = False
+    ADDRESS_POOL_ENABLED = False
+    QR_RENDER_PROCESSES = 0
+    QR_CACHE_PRUNE_INTERVAL = 0
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -202,8 +202,8 @@ def client_has_feature(client, feature_name):
     if not client or not client.package:
         return False
     
-    package_features = get_client_features(client.package.slug)
-    return feature_name in package_features
+    from app.services.entitlements import entitlements
+    return entitlements.for_client(client).has(feature_name)
 
 def get_package_display_name(package_slug):
     """
@@ -253,19 +253,10 @@ class FeatureAccessMixin:
         if not hasattr(self, 'package') or not self.package:
             return False
             
-        # Check package features
-        package_features = get_client_features(self.package.slug)
-        
-        # Check for direct feature match
-        if feature_name in package_features:
-            return True
-            
-        # Check for parameterized features (e.g., 'max_coins:15')
-        for feature in package_features:
-            if ':' in feature and feature.startswith(feature_name + ':'):
-                return True
-                
-        return False
+        # Direct and parameterized matches (e.g., 'max_coins:15') are
+        # precompiled per package and override
+        from app.services.entitlements import entitlements
+        return entitlements.for_client(self).has(feature_name)
     
     def get_feature_value(self, feature_name, default=None):
         """
@@ -281,16 +272,8 @@ class FeatureAccessMixin:
         if not hasattr(self, 'package') or not self.package:
             return default
             
-        package_features = get_client_features(self.package.slug)
-        
-        for feature in package_features:
-            if ':' in feature and feature.startswith(feature_name + ':'):
-                try:
-                    return feature.split(':', 1)[1]
-                except (IndexError, AttributeError):
-                    continue
-                    
-        return default
+        from app.services.entitlements import entitlements
+        return entitlements.for_client(self).value(feature_name, default)
     
     def get_package_limits(self):
         """
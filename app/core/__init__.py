@@ -31,8 +31,12 @@ def register_core_components(app):
     @app.route('/health')
     def health_check():
         """Health check endpoint for load balancers and monitoring."""
+        from app.services.audit_pipeline import audit_pipeline
+        from app.services.webhook_dispatcher import webhook_dispatcher
         return jsonify({
             'status': 'ok',
             'timestamp': datetime.utcnow().isoformat(),
-            'environment': app.config.get('ENV', 'development')
+            'environment': app.config.get('ENV', 'development'),
+            'audit_pipeline': audit_pipeline.stats(),
+            'webhooks': webhook_dispatcher.stats()
         })
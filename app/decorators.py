@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import request, jsonify, redirect, url_for, current_app, flash, abort
+from flask import request, jsonify, redirect, url_for, current_app, flash, abort, g
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request, get_jwt
 from app.extensions.extensions import db
 import jwt # This is python-jwt, not Flask-JWT-Extended's internal jwt object
@@ -25,11 +25,33 @@ def require_api_key(f):
             return f(*args, **kwargs)
             
         from app.models.client import Client  # Corrected absolute import
+        from app.services.api_key_auth import api_key_auth
+        from app.utils.security import sliding_window_limiter
         
         api_key = request.headers.get('X-API-KEY')
         if not api_key:
             return jsonify({'error': 'API key missing'}), 401
 
+        # Scoped client API keys: prefix lookup + HMAC check, served from cache
+        identity = api_key_auth.authenticate(api_key)
+        if identity:
+            if not identity.is_ip_allowed(request.remote_addr):
+                return jsonify({'error': 'IP address not allowed for this API key'}), 403
+            
+            count, reset_after = sliding_window_limiter.hit(f"api_key:{identity.api_key_id}", 60)
+            if count > identity.rate_limit:
+                return jsonify({
+                    'error': 'Rate limit exceeded',
+                    'limit': identity.rate_limit,
+                    'message': 'You have exceeded your per-minute request limit',
+                    'retry_after': int(reset_after) + 1
+                }), 429
+            
+            g.api_key_identity = identity
+            g.client_id = identity.client_id
+            return f(*args, **kwargs)
+
+        # Legacy per-client key stored on the client row
         client = Client.query.filter_by(api_key=api_key).first()
         if not client:
             return jsonify({'error': 'Invalid API key'}), 403
@@ -59,7 +81,7 @@ def track_activity(action=None):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            from app.models.audit import AuditTrail # Corrected absolute import
+            from app.services.audit_pipeline import audit_pipeline
             from flask import current_app
 
             # Get the action from the decorator or use the function name
@@ -104,9 +126,9 @@ def track_activity(action=None):
             ip_address = request.remote_addr
             user_agent = request.headers.get('User-Agent', '')
             
-            # Record the activity
+            # Record the activity (written in the background by the audit pipeline)
             if user_id:
-                audit = AuditTrail(
+                audit_pipeline.submit(
                     user_id=user_id,
                     action_type=action_name,
                     entity_type='activity',
@@ -122,12 +144,6 @@ def track_activity(action=None):
                         'user_type': user_type  # Add user_type to details instead
                     }
                 )
-                db.session.add(audit)
-                try:
-                    db.session.commit()
-                except Exception as e:
-                    current_app.logger.error(f"Failed to log activity: {str(e)}")
-                    db.session.rollback()
             
             # Call the original function
             return f(*args, **kwargs)
@@ -148,7 +164,7 @@ def audit_log(action=None, details=None):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            from app.models.audit import AuditTrail, AuditActionType # Corrected absolute import
+            from app.services.audit_pipeline import audit_pipeline
             from flask import current_app
 
             # Get the action from the decorator or use the function name
@@ -210,9 +226,9 @@ def audit_log(action=None, details=None):
             if details and isinstance(details, dict):
                 audit_details.update(details)
             
-            # Record the audit trail
+            # Record the audit trail (written in the background by the audit pipeline)
             if user_id:
-                audit = AuditTrail(
+                audit_pipeline.submit(
                     user_id=user_id,
                     action_type=action_name,
                     entity_type=entity_type,
@@ -221,12 +237,6 @@ def audit_log(action=None, details=None):
                     user_agent=user_agent,
                     new_value=audit_details
                 )
-                db.session.add(audit)
-                try:
-                    db.session.commit()
-                except Exception as e:
-                    current_app.logger.error(f"Failed to log audit trail: {str(e)}")
-                    db.session.rollback()
             
             # Call the original function
             return f(*args, **kwargs)
@@ -8,12 +8,14 @@ from .extensions import (
     db, jwt, mail, migrate, cache, scheduler, login_manager, csrf, babel,
     init_app as _init_extensions, get_extension
 )
+from .single_flight import single_flight, single_flight_cache
 
 # Re-export extensions for easier access
 __all__ = [
     'db', 'jwt', 'mail', 'migrate', 'cache', 
     'scheduler', 'login_manager', 'csrf', 'babel',
-    'init_extensions', 'get_extension'
+    'init_extensions', 'get_extension',
+    'single_flight', 'single_flight_cache'
 ]
 
 def init_extensions(app):
@@ -0,0 +1,278 @@
+"""
+Single-flight caching.
+
+Coalesces concurrent identical calls of an expensive function onto one
+computation and serves its result from the shared Flask-Caching `cache`
+with a soft and a hard TTL.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app, has_app_context
+
+from .extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lock only if it still holds our token (it may have expired and been re-taken)
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Flight:
+    """One in-progress computation that other threads of this process wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    """
+    Request coalescing on top of the shared cache.
+
+    Values are stored with a soft TTL (fresh until then) inside a cache
+    entry that lives for the hard TTL. A fresh hit is returned directly. A
+    stale hit is returned too, while one background thread, holding the
+    key's lock, recomputes it; so expiry never makes readers wait. On a
+    miss, threads of one process share a single in-flight computation, and
+    processes coordinate through a Redis SET NX lock: the holder computes
+    and stores, the others poll the cache for its result (computing
+    themselves only if it does not appear within wait_timeout). Without
+    Redis, coalescing is per process only.
+
+    Decorated functions run outside the request that triggered a refresh,
+    so they must depend only on their arguments and the app context, and
+    return picklable values (plain data, not ORM instances).
+    """
+
+    KEY_PREFIX = 'single_flight:'
+    LOCK_PREFIX = 'single_flight_lock:'
+
+    def __init__(self, redis_conn=None, soft_ttl: int = 30, hard_ttl: int = 300,
+                 lock_ttl: int = 30, wait_timeout: float = 10.0):
+        self.redis = redis_conn
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self._flights: Dict[str, _Flight] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.soft_ttl = app.config.get('SINGLE_FLIGHT_SOFT_TTL', self.soft_ttl)
+        self.hard_ttl = app.config.get('SINGLE_FLIGHT_HARD_TTL', self.hard_ttl)
+        self.lock_ttl = app.config.get('SINGLE_FLIGHT_LOCK_TTL', self.lock_ttl)
+        self.wait_timeout = app.config.get('SINGLE_FLIGHT_WAIT_TIMEOUT', self.wait_timeout)
+        if self.redis is None:
+            self.redis = _redis_connection()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       soft_ttl: Optional[int] = None, hard_ttl: Optional[int] = None):
+        """Cached value of key, computing it at most once at a time across threads and workers"""
+        soft_ttl = soft_ttl or self.soft_ttl
+        hard_ttl = max(hard_ttl or self.hard_ttl, soft_ttl)
+
+        entry = self._read(key)
+        if entry is not None:
+            if time.time() >= entry['soft_expires']:
+                self._refresh_in_background(key, compute, soft_ttl, hard_ttl)
+            return entry['value']
+        return self._coalesced(key, compute, soft_ttl, hard_ttl)
+
+    def invalidate(self, key: str):
+        try:
+            cache.delete(self.KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate single-flight entry {key}: {e}")
+
+    # ------------------------------------------------------------------
+    # Misses
+    # ------------------------------------------------------------------
+
+    def _coalesced(self, key: str, compute: Callable[[], Any], soft_ttl: int, hard_ttl: int):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                logger.warning(f"Single-flight leader for {key} timed out; computing directly")
+                return compute()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._compute_across_workers(key, compute, soft_ttl, hard_ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _compute_across_workers(self, key: str, compute: Callable[[], Any], soft_ttl: int, hard_ttl: int):
+        token = self._acquire(key)
+        if token is None:
+            # Another worker holds the lock: wait for its result to land in the cache
+            deadline = time.monotonic() + self.wait_timeout
+            delay = 0.02
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.25)
+                entry = self._read(key)
+                if entry is not None:
+                    return entry['value']
+            logger.warning(f"Single-flight result for {key} did not appear; computing directly")
+
+        try:
+            value = compute()
+            self._write(key, value, soft_ttl, hard_ttl)
+            return value
+        finally:
+            if token is not None:
+                self._release(key, token)
+
+    # ------------------------------------------------------------------
+    # Stale hits
+    # ------------------------------------------------------------------
+
+    def _refresh_in_background(self, key: str, compute: Callable[[], Any], soft_ttl: int, hard_ttl: int):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        token = self._acquire(key)
+        if token is None or not has_app_context():
+            # Another worker is already refreshing (or there is no app to run in)
+            with self._lock:
+                self._refreshing.discard(key)
+            if token is not None:
+                self._release(key, token)
+            return
+
+        app = current_app._get_current_object()
+
+        def refresh():
+            try:
+                with app.app_context():
+                    self._write(key, compute(), soft_ttl, hard_ttl)
+            except Exception as e:
+                # Readers keep getting the stale value until the hard TTL
+                logger.warning(f"Background refresh of {key} failed: {e}", exc_info=True)
+            finally:
+                self._release(key, token)
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='single-flight-refresh', daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Storage and locks
+    # ------------------------------------------------------------------
+
+    def _read(self, key: str) -> Optional[Dict]:
+        try:
+            entry = cache.get(self.KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Failed to read single-flight entry {key}: {e}")
+            return None
+        if isinstance(entry, dict) and 'soft_expires' in entry:
+            return entry
+        return None
+
+    def _write(self, key: str, value, soft_ttl: int, hard_ttl: int):
+        entry = {'value': value, 'soft_expires': time.time() + soft_ttl}
+        try:
+            cache.set(self.KEY_PREFIX + key, entry, timeout=hard_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write single-flight entry {key}: {e}")
+
+    def _acquire(self, key: str) -> Optional[str]:
+        """Cross-worker lock token, or None if another worker holds the lock"""
+        token = uuid.uuid4().hex
+        if self.redis is None:
+            return token  # No shared lock available; the in-process flight is all we have
+        try:
+            if self.redis.set(self.LOCK_PREFIX + key, token, nx=True, ex=self.lock_ttl):
+                return token
+            return None
+        except Exception as e:
+            logger.warning(f"Single-flight lock unavailable, coalescing per process only: {e}")
+            return token
+
+    def _release(self, key: str, token: str):
+        if self.redis is None:
+            return
+        try:
+            self.redis.eval(RELEASE_SCRIPT, 1, self.LOCK_PREFIX + key, token)
+        except Exception as e:
+            logger.warning(f"Failed to release single-flight lock {key}: {e}")
+
+
+def _redis_connection():
+    try:
+        from app.utils.security import REDIS_AVAILABLE, redis_client
+    except ImportError:
+        return None
+    return redis_client if REDIS_AVAILABLE else None
+
+
+def _call_key(args, kwargs) -> str:
+    raw = repr((args, sorted(kwargs.items())))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+# Global single-flight cache
+single_flight_cache = SingleFlightCache()
+
+
+def single_flight(name: str, soft_ttl: Optional[int] = None, hard_ttl: Optional[int] = None,
+                  key_func: Optional[Callable[..., str]] = None):
+    """
+    Decorator caching a function's result with single-flight recomputation
+
+    Calls with equal arguments share one cache entry (key_func can build
+    the key instead). The result is fresh for soft_ttl seconds, then served
+    stale while one worker recomputes it, and dropped after hard_ttl.
+    Defaults come from SINGLE_FLIGHT_SOFT_TTL / SINGLE_FLIGHT_HARD_TTL.
+
+    Usage:
+        @single_flight('admin_dashboard_stats', soft_ttl=30, hard_ttl=300)
+        def dashboard_stats():
+            pass
+
+        dashboard_stats.invalidate()
+    """
+    def decorator(f):
+        def key_for(args, kwargs) -> str:
+            suffix = key_func(*args, **kwargs) if key_func else _call_key(args, kwargs)
+            return f"{name}:{suffix}"
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return single_flight_cache.get_or_compute(
+                key_for(args, kwargs), lambda: f(*args, **kwargs), soft_ttl, hard_ttl
+            )
+
+        decorated_function.invalidate = lambda *args, **kwargs: single_flight_cache.invalidate(key_for(args, kwargs))
+        decorated_function.uncached = f
+        return decorated_function
+    return decorator
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, session, flash, send_from_directory
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, session, flash, send_from_directory, abort, Response
 from app import db
 from app.models import Payment
 from app.models.client_package import ClientPackage, ClientType, PackageStatus, REVISED_FLAT_RATE_PACKAGES
@@ -6,6 +6,7 @@ from app.models.client import Client
 from app.models.user import User
 from app.forms.client_forms import ClientRegistrationForm
 from app.utils import generate_address, generate_order_id, create_qr
+from app.services.qr_renderer import qr_renderer
 import logging
 import os
 
@@ -23,6 +24,24 @@ def favicon():
         mimetype='image/vnd.microsoft.icon'
     )
 
+@main.route('/qr/<key>.png')
+def qr_code(key):
+    """Payment QR code image; the URL is content-addressed, so it never changes"""
+    data = request.args.get('d', '')
+    scale = request.args.get('s', type=int)
+    if not qr_renderer.verify(key, data, scale):
+        abort(404)
+    try:
+        png = qr_renderer.png(data, scale)
+    except Exception as e:
+        logger.error(f'Error rendering QR code: {e}')
+        abort(503)
+
+    response = Response(png, mimetype='image/png')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(key)
+    return response.make_conditional(request)
+
 @main.route('/')
 def landing():
     """Landing page with single package model"""
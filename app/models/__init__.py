@@ -46,6 +46,14 @@ from .withdrawal import Withdrawal, WithdrawalRequest, WithdrawalStatus
 # Finally import Payment which has the relationship to RecurringPayment
 from .payment import Payment
 
+# Running balance ledger maintained from Payment/WithdrawalRequest changes
+from .client_ledger import ClientLedgerBalance
+from .client_rollup import ClientDailyRollup
+from .transaction_rollup import TransactionHourlyRollup
+from .usage_reset import ClientUsageHistory, UsageResetRun
+from .webhook_delivery import WebhookDelivery
+from .payment_address import PaymentAddress
+
 # Import wallet provider models
 from .wallet_provider import WalletProvider, WalletProviderCurrency, WalletProviderTransaction, WalletBalance, WalletProviderType
 
@@ -96,6 +104,8 @@ __all__ = [
     'CommissionSnapshot', 'CommissionSnapshottingType',
     'Setting',
     'Currency', 'ClientBalance', 'ClientCommission', 'CurrencyRate',
+    'ClientLedgerBalance', 'ClientDailyRollup', 'TransactionHourlyRollup', 'ClientUsageHistory', 'UsageResetRun',
+    'WebhookDelivery', 'PaymentAddress',
     
     # Enums
     'PaymentStatus',
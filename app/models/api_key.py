@@ -5,6 +5,7 @@ Enhanced for Commission-Based vs Flat-Rate Client Models
 from datetime import datetime, timedelta
 from app.extensions import db
 from .base import BaseModel
+from sqlalchemy import event
 import secrets
 import string
 from enum import Enum
@@ -44,8 +45,9 @@ class ClientApiKey(BaseModel):
     # Key details
     name = db.Column(db.String(100), nullable=False)  # User-friendly name
     key = db.Column(db.String(64), unique=True, nullable=False)  # The actual API key
-    key_prefix = db.Column(db.String(12), nullable=False)  # First 8 chars for display
+    key_prefix = db.Column(db.String(12), nullable=False, index=True)  # First 8 chars for display and lookup
     key_hash = db.Column(db.String(128), nullable=False)  # Hashed version for security
+    key_digest = db.Column(db.String(64), unique=True, nullable=True)  # Keyed HMAC for fast verification
     
     # Enhanced permissions with client type awareness
     permissions = db.Column(db.JSON, default=list)
@@ -98,6 +100,25 @@ class ClientApiKey(BaseModel):
         from werkzeug.security import check_password_hash
         return check_password_hash(key_hash, key)
     
+    @staticmethod
+    def digest_key(key):
+        """Keyed HMAC digest of the API key for per-request verification"""
+        from app.services.api_key_auth import compute_key_digest
+        return compute_key_digest(key)
+    
+    def set_key(self, key):
+        """Set a new raw key and every value derived from it"""
+        self.key = key
+        self.key_prefix = self.generate_key_prefix(key)
+        self.key_hash = self.hash_key(key)
+        self.key_digest = self.digest_key(key)
+    
+    def revoke(self):
+        """Deactivate this key; cached authentications are invalidated on commit"""
+        self.is_active = False
+        self.updated_at = datetime.utcnow()
+        db.session.commit()
+    
     @classmethod
     def create_key(cls, client_id, name, permissions=None, rate_limit=60, expires_days=None, created_by_admin_id=None):
         """Create a new API key for a client"""
@@ -115,6 +136,7 @@ class ClientApiKey(BaseModel):
             key=key,  # We store the key temporarily for returning to admin
             key_prefix=key_prefix,
             key_hash=key_hash,
+            key_digest=cls.digest_key(key),
             permissions=permissions or [],
             rate_limit=rate_limit,
             expires_at=expires_at,
@@ -145,6 +167,7 @@ class ClientApiKey(BaseModel):
             key=key,  # We store the key temporarily for returning to admin
             key_prefix=key_prefix,
             key_hash=key_hash,
+            key_digest=cls.digest_key(key),
             permissions=permissions or [],
             rate_limit=rate_limit,
             expires_at=expires_at,
@@ -170,6 +193,7 @@ class ClientApiKey(BaseModel):
             key=key,  # Store the full key temporarily for returning to user
             key_prefix=key_prefix,
             key_hash=key_hash,
+            key_digest=cls.digest_key(key),
             permissions=permissions or [],
             rate_limit=rate_limit,
             expires_at=expires_at
@@ -205,6 +229,7 @@ class ClientApiKey(BaseModel):
             key=key,  # Store the full key temporarily for returning to user
             key_prefix=key_prefix,
             key_hash=key_hash,
+            key_digest=cls.digest_key(key),
             permissions=filtered_permissions,
             rate_limit=rate_limit,
             expires_at=expires_at,
@@ -304,6 +329,13 @@ class ClientApiKey(BaseModel):
     def __repr__(self):
         return f'<ClientApiKey {self.name} for {self.client_id}>'
 
+# Invalidate cached authentications whenever a key changes or is removed
+@event.listens_for(ClientApiKey, 'after_update')
+@event.listens_for(ClientApiKey, 'after_delete')
+def invalidate_api_key_cache(mapper, connection, target):
+    from app.services.api_key_auth import api_key_auth
+    api_key_auth.invalidate_after_commit(target)
+
 class ApiKeyUsageLog(BaseModel):
     """Log API key usage for monitoring and security"""
     __tablename__ = 'api_key_usage_logs'
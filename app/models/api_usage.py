@@ -3,13 +3,16 @@ from ..extensions import db
 
 class ApiUsage(db.Model):
     __tablename__ = 'api_usage'
+    __table_args__ = (
+        db.Index('ix_api_usage_client_timestamp', 'client_id', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False)
     endpoint = db.Column(db.String(255), nullable=False)
     method = db.Column(db.String(10), nullable=False)  # GET, POST, PUT, DELETE
     status_code = db.Column(db.Integer, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     response_time = db.Column(db.Float, nullable=False)  # in milliseconds
     request_size = db.Column(db.Integer, nullable=False)  # in bytes
     response_size = db.Column(db.Integer, nullable=False)  # in bytes
@@ -19,6 +19,15 @@ class AuditActionType(Enum):
     API_KEY_REGENERATED = 'api_key_regenerated'
 
 class AuditTrail(db.Model):
+    # One index per filter the admin audit trail page supports, each ending
+    # in (created_at, id) so keyset pages come straight off the index
+    __table_args__ = (
+        db.Index('ix_audit_trail_created_id', 'created_at', 'id'),
+        db.Index('ix_audit_trail_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_audit_trail_action_created', 'action_type', 'created_at', 'id'),
+        db.Index('ix_audit_trail_entity_created', 'entity_type', 'entity_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     action_type = db.Column(db.String(20), nullable=False)
@@ -32,6 +32,7 @@ class Client(BaseModel, FeatureAccessMixin):
     registration_number = db.Column(db.String(50))
     website = db.Column(db.String(255))
     logo_url = db.Column(db.String(255))
+    subdomain = db.Column(db.String(63), unique=True, nullable=True, index=True)  # Tenant host prefix
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
     verification_token = db.Column(db.String(100))
@@ -171,16 +172,11 @@ class Client(BaseModel, FeatureAccessMixin):
             return self.withdrawal_commission_rate or 0.015
     
     def get_balance(self):
-        from .payment import Payment  # Local import to avoid circular imports
+        from app.services.balance_ledger import balance_ledger  # Local import to avoid circular imports
         
-        total_deposits = db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0)).\
-            filter(Payment.client_id == self.id, 
-                  Payment.status == PaymentStatus.APPROVED).scalar() or 0
-            
-        # Note: Withdrawal calculations would need proper withdrawal model
-        total_withdrawals = 0  # Placeholder until proper withdrawal model is available
-            
-        return float(total_deposits - total_withdrawals)
+        # Single-row lookup on the client's balance ledger
+        totals = balance_ledger.get_totals(self.id)
+        return float(totals.deposit_total - totals.withdrawal_total)
     
     def get_payment_history(self):
         from .payment import Payment  # Local import to avoid circular imports
@@ -209,15 +205,15 @@ class Client(BaseModel, FeatureAccessMixin):
         if not hasattr(self, 'package') or not self.package:
             return []
             
-        from .coin import Coin
-        coins = Coin.get_allowed_coins(self.package.slug)
-        return [coin.symbol for coin in coins]
+        from ..services.coin_catalog import coin_catalog
+        return [coin.symbol for coin in coin_catalog.allowed_coins(self.package.slug)]
         
     def is_coin_allowed(self, coin_symbol):
         """Check if a coin is allowed for this client's package."""
-        if not coin_symbol:
+        if not coin_symbol or not hasattr(self, 'package') or not self.package:
             return False
-        return coin_symbol.upper() in self.allowed_coins
+        from ..services.coin_catalog import coin_catalog
+        return coin_catalog.is_allowed(self.package.slug, coin_symbol, active_only=True)
         
     def get_coin_limit(self):
         """Get the maximum number of coins allowed for this client's package."""
@@ -266,51 +262,17 @@ class Client(BaseModel, FeatureAccessMixin):
     
     def get_30d_commission(self):
         """Calculate total commission for the last 30 days"""
-        from .payment import Payment
+        from app.services.commission_service import commission_service
         from datetime import datetime, timedelta
         
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        # Get all approved payments in the last 30 days
-        payments = Payment.query.filter(
-            Payment.client_id == self.id,
-            Payment.status == PaymentStatus.APPROVED,
-            Payment.created_at >= thirty_days_ago
-        ).all()
-        
-        # Calculate commission for each payment and sum them up
-        total_commission = 0
-        for payment in payments:
-            if payment.type == 'deposit':
-                commission_rate = self.deposit_commission_rate or 0
-            else:
-                commission_rate = self.withdrawal_commission_rate or 0
-                
-            total_commission += float(payment.amount) * (commission_rate / 100)
-            
-        return total_commission
+        return float(commission_service.for_client(self.id, since=thirty_days_ago).total_commission)
     
     def get_lifetime_commission(self):
         """Calculate total lifetime commission"""
-        from .payment import Payment
-        
-        # Get all approved payments
-        payments = Payment.query.filter(
-            Payment.client_id == self.id,
-            Payment.status == PaymentStatus.APPROVED
-        ).all()
+        from app.services.commission_service import commission_service
         
-        # Calculate commission for each payment and sum them up
-        total_commission = 0
-        for payment in payments:
-            if payment.type == 'deposit':
-                commission_rate = self.deposit_commission_rate or 0
-            else:
-                commission_rate = self.withdrawal_commission_rate or 0
-                
-            total_commission += float(payment.amount) * (commission_rate / 100)
-            
-        return total_commission
+        return float(commission_service.for_client(self.id).total_commission)
     
     def get_all_features(self):
         """Return all available features in the system (for dashboard display)"""
@@ -524,6 +486,37 @@ def log_client_update(mapper, connection, target):
             'volume_limit': float(self.package.max_volume_per_month or 0)
         }
 
+# Drop cached webhook configuration when a client appears, disappears or changes its webhook fields
+@event.listens_for(Client, 'after_update')
+def invalidate_webhook_config(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    from app.services.webhook_config import webhook_config_cache, webhook_config_fields_changed
+    if webhook_config_fields_changed(target):
+        webhook_config_cache.invalidate_after_commit(target.id, object_session(target))
+
+@event.listens_for(Client, 'after_insert')
+@event.listens_for(Client, 'after_delete')
+def invalidate_webhook_config_on_insert_or_delete(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    from app.services.webhook_config import webhook_config_cache
+    # Unknown ids are cached as exists=False, so a new client must clear that too
+    webhook_config_cache.invalidate_after_commit(target.id, object_session(target))
+
+@event.listens_for(Client, 'after_insert')
+@event.listens_for(Client, 'after_update')
+def invalidate_tenant_registry(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    from app.services.tenant_registry import tenant_fields_changed, tenant_registry
+    if tenant_fields_changed(target):
+        tenant_registry.bump_after_commit(object_session(target))
+
+@event.listens_for(Client, 'after_delete')
+def invalidate_tenant_registry_on_delete(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    from app.services.tenant_registry import tenant_registry
+    if target.subdomain:
+        tenant_registry.bump_after_commit(object_session(target))
+
 # Package synchronization event listener
 @event.listens_for(Client.package_id, 'set')
 def sync_status_on_package_change(target, value, oldvalue, initiator):
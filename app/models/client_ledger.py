@@ -0,0 +1,26 @@
+from datetime import datetime
+from decimal import Decimal
+from ..extensions import db
+
+
+class ClientLedgerBalance(db.Model):
+    """
+    Running per-client totals of approved deposits and withdrawals.
+
+    Maintained incrementally by app.services.balance_ledger in the same
+    transaction as the Payment/WithdrawalRequest change, so balance reads
+    are a single primary-key lookup. `flask ledger reconcile` rebuilds it
+    from history.
+    """
+    __tablename__ = 'client_ledger_balances'
+
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), primary_key=True)
+    deposit_total = db.Column(db.Numeric(28, 8), nullable=False, default=Decimal('0'))
+    withdrawal_total = db.Column(db.Numeric(28, 8), nullable=False, default=Decimal('0'))
+    deposit_count = db.Column(db.Integer, nullable=False, default=0)
+    withdrawal_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ClientLedgerBalance client={self.client_id} deposits={self.deposit_total} withdrawals={self.withdrawal_total}>'
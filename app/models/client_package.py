@@ -6,7 +6,8 @@ Defines available packages, features, and pricing for different client types
 from datetime import datetime
 from app.extensions import db
 from enum import Enum
-from sqlalchemy import Numeric
+from sqlalchemy import Numeric, event
+from sqlalchemy.orm import object_session
 
 
 class ClientType(Enum):
@@ -133,8 +134,12 @@ class ClientPackage(db.Model):
     
     def has_feature(self, feature_key):
         """Check if package includes a specific feature"""
-        return any(pf.feature.feature_key == feature_key and pf.is_included 
-                  for pf in self.package_features)
+        if self.id is None:
+            # Not flushed yet, so not in the compiled map
+            return any(pf.feature.feature_key == feature_key and pf.is_included 
+                      for pf in self.package_features)
+        from app.services.entitlements import entitlements
+        return entitlements.package_has_feature(self.id, feature_key)
     
     def calculate_margin_percent(self):
         """Calculate the margin percentage for flat-rate packages"""
@@ -427,3 +432,14 @@ def get_margin_protection_info():
             'critical': 1.20   # Below 1.2% = critical
         }
     }
+
+
+@event.listens_for(PackageFeature, 'after_insert')
+@event.listens_for(PackageFeature, 'after_update')
+@event.listens_for(PackageFeature, 'after_delete')
+@event.listens_for(Feature, 'after_update')
+@event.listens_for(Feature, 'after_delete')
+def invalidate_entitlements(mapper, connection, target):
+    """Recompile package entitlements once feature assignments are committed"""
+    from app.services.entitlements import entitlements
+    entitlements.invalidate_after_commit(object_session(target))
@@ -0,0 +1,27 @@
+from datetime import datetime
+from decimal import Decimal
+from ..extensions import db
+
+
+class ClientDailyRollup(db.Model):
+    """
+    Per-client, per-day activity counters for the client dashboard.
+
+    Rebuilt for the most recent days by app.services.dashboard_rollup on a
+    schedule; monthly and 30-day figures are sums over at most a few dozen
+    rows of the (client_id, day) primary key.
+    """
+    __tablename__ = 'client_daily_rollups'
+
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    deposit_volume = db.Column(db.Numeric(28, 8), nullable=False, default=Decimal('0'))
+    withdrawal_count = db.Column(db.Integer, nullable=False, default=0)
+    withdrawal_volume = db.Column(db.Numeric(28, 8), nullable=False, default=Decimal('0'))
+    api_call_count = db.Column(db.Integer, nullable=False, default=0)
+    last_api_call_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ClientDailyRollup client={self.client_id} day={self.day} payments={self.payment_count}>'
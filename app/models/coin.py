@@ -2,6 +2,8 @@
 Coin model for storing cryptocurrency metadata and configurations.
 """
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
 from ..extensions.extensions import db
 
 class Coin(db.Model):
@@ -42,10 +44,14 @@ class Coin(db.Model):
     
     @classmethod
     def get_by_symbol(cls, symbol):
-        """Get a coin by its symbol (case-insensitive)."""
-        return cls.query.filter(
-            db.func.lower(cls.symbol) == symbol.lower()
-        ).first()
+        """
+        Get a coin by its symbol (case-insensitive).
+        
+        Served from the in-memory coin catalog; returns a read-only
+        CoinInfo, or None for unknown symbols.
+        """
+        from ..services.coin_catalog import coin_catalog
+        return coin_catalog.get_by_symbol(symbol)
     
     @classmethod
     def get_allowed_coins(cls, package_slug):
@@ -56,23 +62,20 @@ class Coin(db.Model):
             package_slug (str): The package slug (e.g., 'starter_flat_rate')
             
         Returns:
-            list: List of Coin objects allowed for the package
+            list: Read-only CoinInfo entries for active coins allowed for
+            the package, in COIN_LIST order (served from the coin catalog)
         """
-        from ..config.config import Config
-        
-        # Get the coin limit for the package
-        limit = Config.PACKAGE_COIN_LIMITS.get(package_slug, 15)
-        
-        # Get the allowed coin symbols
-        allowed_symbols = Config.COIN_LIST[:min(limit, len(Config.COIN_LIST))]
-        
-        # Query the coins in the same order as COIN_LIST
-        return cls.query.filter(
-            cls.symbol.in_(allowed_symbols),
-            cls.is_active == True
-        ).order_by(
-            db.func.array_position(Config.COIN_LIST, cls.symbol)
-        ).all()
+        from ..services.coin_catalog import coin_catalog
+        return list(coin_catalog.allowed_coins(package_slug))
     
     def __repr__(self):
         return f'<Coin {self.symbol} - {self.name}>'
+
+
+@event.listens_for(Coin, 'after_insert')
+@event.listens_for(Coin, 'after_update')
+@event.listens_for(Coin, 'after_delete')
+def reload_coin_catalog(mapper, connection, target):
+    """Rebuild the coin catalog once coin metadata changes are committed."""
+    from ..services.coin_catalog import coin_catalog
+    coin_catalog.reload_after_commit(object_session(target))
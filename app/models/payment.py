@@ -9,6 +9,10 @@ from app.utils.exchange import get_exchange_rate as fetch_exchange_rate
 
 class Payment(BaseModel):
     __tablename__ = 'payments'
+    __table_args__ = (
+        # Recent payments per client (dashboard, payment lists)
+        db.Index('ix_payments_client_created', 'client_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False, index=True)
@@ -50,7 +54,7 @@ class Payment(BaseModel):
     description = db.Column(db.String(255))
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=True)  # When the payment expires
 
@@ -87,7 +91,7 @@ class Payment(BaseModel):
             return self.exchange_rate
             
         # Get new rate
-        rate = fetch_exchange_rate(self.fiat_currency, self.crypto_currency or 'BTC')
+        rate = fetch_exchange_rate(self.crypto_currency or 'BTC', self.fiat_currency)
         if not rate:
             return None
             
@@ -0,0 +1,61 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class PaymentAddress(db.Model):
+    """
+    One pre-derived deposit address in the per-coin address pool.
+
+    app.services.address_pool keeps AVAILABLE rows topped up in the
+    background and leases them to package payments at checkout. Addresses
+    of expired, unpaid payments cool down before they are handed out
+    again; addresses that received a payment are never reused.
+    """
+    __tablename__ = 'payment_addresses'
+
+    STATUS_AVAILABLE = 'available'
+    STATUS_LEASED = 'leased'
+    STATUS_COOLING = 'cooling'  # Released from an unpaid payment; late deposits may still arrive
+    STATUS_USED = 'used'  # Received a payment; retired from the pool
+
+    OWNER_PACKAGE_ACTIVATION = 'package_activation'
+    OWNER_FLAT_RATE_SUBSCRIPTION = 'flat_rate_subscription'
+
+    id = db.Column(db.Integer, primary_key=True)
+    coin = db.Column(db.String(10), nullable=False)
+    address = db.Column(db.String(255), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_AVAILABLE)
+
+    # Current (or last) lease
+    owner_type = db.Column(db.String(30), nullable=True)
+    owner_id = db.Column(db.Integer, nullable=True)
+    leased_at = db.Column(db.DateTime, nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)  # The owning payment's expires_at
+    released_at = db.Column(db.DateTime, nullable=True)
+    lease_count = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Lease picks the lowest available id per coin; refill counts available per coin
+        db.Index('ix_payment_addresses_coin_status', 'coin', 'status', 'id'),
+        # Recycle scans expired leases and finished cool-downs
+        db.Index('ix_payment_addresses_status_lease', 'status', 'lease_expires_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'coin': self.coin,
+            'address': self.address,
+            'status': self.status,
+            'owner_type': self.owner_type,
+            'owner_id': self.owner_id,
+            'leased_at': self.leased_at.isoformat() if self.leased_at else None,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'released_at': self.released_at.isoformat() if self.released_at else None,
+            'lease_count': self.lease_count,
+        }
+
+    def __repr__(self):
+        return f'<PaymentAddress {self.coin} {self.address} {self.status}>'
@@ -1,7 +1,8 @@
 from ..extensions import db
-from datetime import datetime, timedelta
+from .enums import PaymentStatus
+from datetime import date, datetime, timedelta
 from enum import Enum
-import json
+from sqlalchemy import case, func, select
 
 class ReportType(Enum):
     PAYMENT_SUMMARY = 'payment_summary'
@@ -31,12 +32,25 @@ class Report(db.Model):
     filters = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Background generation (see app.services.report_engine)
+    status = db.Column(db.String(20), nullable=False, default=ReportStatus.PENDING.value, index=True)
+    result = db.Column(db.JSON)
+    result_key = db.Column(db.String(64), index=True)  # Hash of (report_type, filters)
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime)
+    generated_at = db.Column(db.DateTime)
     
     def __init__(self, name, description, report_type, filters=None):
         self.name = name
         self.description = description
         self.report_type = report_type
-        self.filters = filters or {}
+        self.filters = normalize_filters(filters)
+        self.status = ReportStatus.PENDING.value
+
+    @property
+    def is_ready(self):
+        return self.status == ReportStatus.COMPLETED.value and self.result is not None
 
     def generate_report(self):
         """Generate the report based on type and filters"""
@@ -52,199 +66,250 @@ class Report(db.Model):
             return self._generate_overdue_payments()
         return None
 
+    def _date_range(self):
+        """(start, end) datetimes from the filters; end is exclusive (day after end_date)"""
+        filters = self.filters or {}
+        start = _parse_day(filters.get('start_date'))
+        end = _parse_day(filters.get('end_date'))
+        return start, end + timedelta(days=1) if end else None
+
+    def _payment_criteria(self):
+        from .payment import Payment
+
+        start, end = self._date_range()
+        criteria = []
+        if start:
+            criteria.append(Payment.created_at >= start)
+        if end:
+            criteria.append(Payment.created_at < end)
+        return criteria
+
     def _generate_payment_summary(self):
         from .payment import Payment
         """Generate payment summary report"""
-        start_date = self.filters.get('start_date')
-        end_date = self.filters.get('end_date')
-        
-        query = Payment.query
-        if start_date:
-            query = query.filter(Payment.created_at >= start_date)
-        if end_date:
-            query = query.filter(Payment.created_at <= end_date)
-        
-        payments = query.all()
-        
-        summary = {
-            'total_payments': len(payments),
-            'total_amount': sum(p.amount for p in payments),
-            'by_status': {},
-            'by_currency': {},
-            'by_method': {}
+        criteria = self._payment_criteria()
+
+        def grouped(*columns, measure):
+            return db.session.execute(
+                select(*columns, measure).where(*criteria).group_by(*columns)
+            ).all()
+
+        by_status = grouped(Payment._status, measure=func.count(Payment.id))
+        by_currency = grouped(Payment.currency, measure=func.coalesce(func.sum(Payment.amount), 0))
+        by_method = grouped(Payment.payment_method, measure=func.count(Payment.id))
+        total_count, total_amount = db.session.execute(
+            select(func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0)).where(*criteria)
+        ).one()
+
+        return {
+            'total_payments': total_count,
+            'total_amount': _number(total_amount),
+            'by_status': {_label(status): count for status, count in by_status},
+            'by_currency': {currency: _number(amount) for currency, amount in by_currency},
+            'by_method': {method: count for method, count in by_method},
         }
-        
-        for payment in payments:
-            # Status breakdown
-            summary['by_status'][payment.status] = summary['by_status'].get(payment.status, 0) + 1
-            
-            # Currency breakdown
-            summary['by_currency'][payment.currency] = summary['by_currency'].get(payment.currency, 0) + payment.amount
-            
-            # Payment method breakdown
-            key = f"{payment.payment_method} ({payment.payment_provider or 'N/A'})"
-            summary['by_method'][key] = summary['by_method'].get(key, 0) + 1
-        
-        return summary
 
     def _generate_client_analysis(self):
         from .client import Client
         from .payment import Payment
+        from .recurring_payment import RecurringPayment
         """Generate client analysis report"""
-        start_date = self.filters.get('start_date')
-        end_date = self.filters.get('end_date')
-        
-        query = Client.query
-        if start_date:
-            query = query.filter(Client.created_at >= start_date)
-        if end_date:
-            query = query.filter(Client.created_at <= end_date)
-        
-        clients = query.all()
-        
-        analysis = {
-            'total_clients': len(clients),
-            'active_clients': len([c for c in clients if c.is_active]),
-            'payment_history': {},
-            'recurring_payments': 0
+        start, end = self._date_range()
+        group = (self.filters or {}).get('client_group')
+
+        criteria = []
+        if start:
+            criteria.append(Client.created_at >= start)
+        if end:
+            criteria.append(Client.created_at < end)
+        if group == 'active':
+            criteria.append(Client.is_active.is_(True))
+        elif group == 'inactive':
+            criteria.append(Client.is_active.is_(False))
+        clients = select(Client.id).where(*criteria).scalar_subquery()
+
+        total_clients, active_clients = db.session.execute(
+            select(func.count(Client.id), func.count(case((Client.is_active.is_(True), Client.id))))
+            .where(*criteria)
+        ).one()
+
+        # One pass over payments for every client in the range (clients without payments get zeros)
+        history = db.session.execute(
+            select(Client.id, func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0))
+            .select_from(Client)
+            .outerjoin(Payment, Payment.client_id == Client.id)
+            .where(*criteria)
+            .group_by(Client.id)
+        ).all()
+
+        recurring = db.session.execute(
+            select(func.count(RecurringPayment.id)).where(RecurringPayment.client_id.in_(clients))
+        ).scalar() or 0
+
+        return {
+            'total_clients': total_clients,
+            'active_clients': active_clients,
+            'payment_history': {
+                str(client_id): {'total_payments': count, 'total_amount': _number(amount)}
+                for client_id, count, amount in history
+            },
+            'recurring_payments': recurring,
         }
-        
-        for client in clients:
-            payments = Payment.query.filter_by(client_id=client.id).all()
-            analysis['payment_history'][client.id] = {
-                'total_payments': len(payments),
-                'total_amount': sum(p.amount for p in payments)
-            }
-            
-            recurring = RecurringPayment.query.filter_by(client_id=client.id).count()
-            analysis['recurring_payments'] += recurring
-        
-        return analysis
 
     def _generate_revenue_trends(self):
         from .payment import Payment
         """Generate revenue trends report"""
-        start_date = self.filters.get('start_date')
-        end_date = self.filters.get('end_date')
-        
-        if not start_date or not end_date:
+        start, end = self._date_range()
+        if not start or not end:
             return None
-            
-        # Calculate date range
-        date_range = (datetime.strptime(end_date, '%Y-%m-%d') - 
-                     datetime.strptime(start_date, '%Y-%m-%d')).days + 1
-        
-        # Initialize trends data
+
+        day = func.date(Payment.created_at)
+        rows = db.session.execute(
+            select(day, func.coalesce(func.sum(Payment.amount), 0))
+            .where(Payment.created_at >= start, Payment.created_at < end)
+            .group_by(day)
+        ).all()
+        # func.date() comes back as a date or an ISO string depending on the dialect
+        amounts = {str(value)[:10]: _number(amount) for value, amount in rows}
+
         trends = {
             'daily': [],
             'weekly': [],
             'monthly': []
         }
-        
-        # Get payments within date range
-        payments = Payment.query.filter(
-            Payment.created_at >= start_date,
-            Payment.created_at <= end_date
-        ).all()
-        
-        # Calculate trends
-        current_date = datetime.strptime(start_date, '%Y-%m-%d')
-        while current_date <= datetime.strptime(end_date, '%Y-%m-%d'):
-            # Daily trend
-            daily_payments = [p for p in payments 
-                            if p.created_at.date() == current_date.date()]
-            trends['daily'].append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'amount': sum(p.amount for p in daily_payments)
-            })
-            
+
+        # The per-day series is tiny, so the rolling windows are built from it in Python
+        current_date = start
+        while current_date < end:
+            key = current_date.strftime('%Y-%m-%d')
+            trends['daily'].append({'date': key, 'amount': amounts.get(key, 0.0)})
+
             # Weekly trend (if enough days)
             if len(trends['daily']) >= 7:
-                weekly_amount = sum(d['amount'] for d in trends['daily'][-7:])
                 trends['weekly'].append({
                     'week': f"{trends['daily'][-7]['date']} - {trends['daily'][-1]['date']}",
-                    'amount': weekly_amount
+                    'amount': sum(d['amount'] for d in trends['daily'][-7:])
                 })
-            
+
             # Monthly trend (if enough weeks)
             if len(trends['weekly']) >= 4:
-                monthly_amount = sum(w['amount'] for w in trends['weekly'][-4:])
                 trends['monthly'].append({
-                    'month': f"{trends['weekly'][-4]['week'].split(' - ')[0][:7]}",
-                    'amount': monthly_amount
+                    'month': trends['weekly'][-4]['week'].split(' - ')[0][:7],
+                    'amount': sum(w['amount'] for w in trends['weekly'][-4:])
                 })
-            
+
             current_date += timedelta(days=1)
-        
+
         return trends
 
     def _generate_payment_methods(self):
         from .payment import Payment
         """Generate payment methods report"""
-        start_date = self.filters.get('start_date')
-        end_date = self.filters.get('end_date')
-        
-        query = Payment.query
-        if start_date:
-            query = query.filter(Payment.created_at >= start_date)
-        if end_date:
-            query = query.filter(Payment.created_at <= end_date)
-        
-        payments = query.all()
-        
+        criteria = self._payment_criteria()
+        currency = (self.filters or {}).get('currency')
+        if currency and currency != 'all':
+            criteria.append(Payment.currency == currency)
+
+        rows = db.session.execute(
+            select(Payment.payment_method, Payment.currency,
+                   func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0))
+            .where(*criteria)
+            .group_by(Payment.payment_method, Payment.currency)
+        ).all()
+
         methods = {}
-        for payment in payments:
-            key = f"{payment.payment_method} ({payment.payment_provider or 'N/A'})"
-            if key not in methods:
-                methods[key] = {
-                    'count': 0,
-                    'total_amount': 0,
-                    'by_currency': {}
-                }
-            
-            methods[key]['count'] += 1
-            methods[key]['total_amount'] += payment.amount
-            methods[key]['by_currency'][payment.currency] = (
-                methods[key]['by_currency'].get(payment.currency, 0) + payment.amount
-            )
-        
+        for method, currency, count, amount in rows:
+            entry = methods.setdefault(method, {'count': 0, 'total_amount': 0.0, 'by_currency': {}})
+            entry['count'] += count
+            entry['total_amount'] += _number(amount)
+            entry['by_currency'][currency] = _number(amount)
+
         return methods
 
     def _generate_overdue_payments(self):
+        from .client import Client
         from .payment import Payment
-        """Generate overdue payments report"""
+        """Generate overdue payments report (pending payments past expires_at)"""
+        filters = self.filters or {}
         current_time = datetime.utcnow()
-        
-        overdue_payments = Payment.query.filter(
-            Payment.status == 'pending',
-            Payment.due_date < current_time
-        ).all()
-        
+
+        criteria = [
+            Payment._status == PaymentStatus.PENDING,
+            Payment.expires_at < current_time,
+        ]
+        if filters.get('max_age'):
+            criteria.append(Payment.expires_at >= current_time - timedelta(days=int(filters['max_age'])))
+
+        total_count, total_amount = db.session.execute(
+            select(func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0)).where(*criteria)
+        ).one()
+
         report = {
-            'total_overdue': len(overdue_payments),
-            'total_amount': sum(p.amount for p in overdue_payments),
+            'total_overdue': total_count,
+            'total_amount': _number(total_amount),
             'by_age': {
                 '1-7 days': [],
                 '8-30 days': [],
                 '31+ days': []
             }
         }
-        
-        for payment in overdue_payments:
-            days_overdue = (current_time - payment.due_date).days
+        if filters.get('include_details') is False:
+            return report
+
+        # Detail rows come from one join instead of a client lookup per payment
+        rows = db.session.execute(
+            select(Client.name, Payment.amount, Payment.currency, Payment.expires_at)
+            .join(Client, Client.id == Payment.client_id)
+            .where(*criteria)
+            .order_by(Payment.expires_at.asc())
+        ).all()
+        for client_name, amount, currency, expires_at in rows:
+            days_overdue = (current_time - expires_at).days
             if days_overdue <= 7:
                 key = '1-7 days'
             elif days_overdue <= 30:
                 key = '8-30 days'
             else:
                 key = '31+ days'
-            
+
             report['by_age'][key].append({
-                'client': payment.client.name,
-                'amount': payment.amount,
-                'currency': payment.currency,
+                'client': client_name,
+                'amount': _number(amount),
+                'currency': currency,
                 'days_overdue': days_overdue,
-                'due_date': payment.due_date.strftime('%Y-%m-%d')
+                'due_date': expires_at.strftime('%Y-%m-%d')
             })
-        
+
         return report
+
+
+def normalize_filters(filters):
+    """JSON-safe copy of report filters (form dates become YYYY-MM-DD strings)"""
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if isinstance(value, (date, datetime)):
+            value = value.strftime('%Y-%m-%d')
+        normalized[key] = value
+    return normalized
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _number(value):
+    """Aggregates come back as Decimal; results are stored as JSON"""
+    return float(value) if value is not None else 0.0
+
+
+def _label(value):
+    return value.value if isinstance(value, Enum) else value
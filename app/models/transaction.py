@@ -11,7 +11,7 @@ class Transaction(db.Model):
     currency = db.Column(db.String(10), nullable=False)  # 'BTC', 'ETH', etc.
     btc_value = db.Column(db.Float)  # Optional: value in BTC for reporting
     status = db.Column(db.Enum(PaymentStatus), default=PaymentStatus.PENDING)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     tx_hash = db.Column(db.String(100))
     block_number = db.Column(db.Integer)
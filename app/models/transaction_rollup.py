@@ -0,0 +1,31 @@
+from datetime import datetime
+from decimal import Decimal
+from ..extensions import db
+
+
+class TransactionHourlyRollup(db.Model):
+    """
+    Hourly transaction counters per (client, currency, status).
+
+    Maintained incrementally by app.services.transaction_rollup in the same
+    transaction as the Transaction change, so admin analytics read bucket
+    ranges instead of scanning transactions. `flask rollup transactions`
+    rebuilds buckets from history.
+    """
+    __tablename__ = 'transaction_hourly_rollups'
+    __table_args__ = (
+        # Per-client ranges (top clients, client drill-downs)
+        db.Index('ix_transaction_rollups_client_bucket', 'client_id', 'bucket'),
+    )
+
+    bucket = db.Column(db.DateTime, primary_key=True)  # UTC, truncated to the hour
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), primary_key=True)
+    currency = db.Column(db.String(10), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_total = db.Column(db.Numeric(28, 8), nullable=False, default=Decimal('0'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return (f'<TransactionHourlyRollup {self.bucket:%Y-%m-%d %H}:00 client={self.client_id} '
+                f'{self.currency} {self.status} count={self.tx_count}>')
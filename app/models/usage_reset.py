@@ -0,0 +1,61 @@
+from datetime import datetime
+from decimal import Decimal
+from ..extensions import db
+
+
+class ClientUsageHistory(db.Model):
+    """Pre-reset monthly usage counters, one row per client per reset run"""
+    __tablename__ = 'client_usage_history'
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), nullable=False, index=True)
+    period_start = db.Column(db.DateTime, nullable=True)  # Previous reset, i.e. start of the closed period
+    period_end = db.Column(db.DateTime, nullable=False)
+    month_volume = db.Column(db.Numeric(20, 2), nullable=False, default=Decimal('0.00'))
+    month_transactions = db.Column(db.Integer, nullable=False, default=0)
+    run_key = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'run_key', name='uq_client_usage_history_client_run'),
+    )
+
+    def __repr__(self):
+        return f'<ClientUsageHistory client={self.client_id} run={self.run_key} volume={self.month_volume}>'
+
+
+class UsageResetRun(db.Model):
+    """Checkpoint of a monthly usage reset; a retried run resumes after last_client_id"""
+    __tablename__ = 'usage_reset_runs'
+
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+
+    run_key = db.Column(db.String(64), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_RUNNING)
+    force = db.Column(db.Boolean, nullable=False, default=False)
+    client_id = db.Column(db.Integer, nullable=True)  # Set when the run targets one client
+    last_client_id = db.Column(db.Integer, nullable=False, default=0)
+    clients_reset = db.Column(db.Integer, nullable=False, default=0)
+    volume_reset = db.Column(db.Numeric(20, 2), nullable=False, default=Decimal('0.00'))
+    transactions_reset = db.Column(db.Integer, nullable=False, default=0)
+    batches = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'run_key': self.run_key,
+            'status': self.status,
+            'last_client_id': self.last_client_id,
+            'clients_reset': self.clients_reset,
+            'total_volume_reset': float(self.volume_reset or 0),
+            'total_transactions_reset': self.transactions_reset,
+            'batches': self.batches,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<UsageResetRun {self.run_key} {self.status} after={self.last_client_id}>'
@@ -0,0 +1,53 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class WebhookDelivery(db.Model):
+    """Outbox row for one signed webhook event to a merchant endpoint"""
+    __tablename__ = 'webhook_deliveries'
+
+    STATUS_PENDING = 'pending'
+    STATUS_DELIVERING = 'delivering'
+    STATUS_DELIVERED = 'delivered'
+    STATUS_FAILED = 'failed'  # Gave up after max attempts or a permanent error
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), nullable=False, index=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    endpoint_url = db.Column(db.String(255), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # Exact JSON body that is signed and sent
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)  # Claim lease while a worker is sending
+
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_status_code = db.Column(db.Integer, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Dispatcher claims due rows in next_attempt_at order
+        db.Index('ix_webhook_deliveries_status_next', 'status', 'next_attempt_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'client_id': self.client_id,
+            'event_type': self.event_type,
+            'endpoint_url': self.endpoint_url,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_status_code': self.last_status_code,
+            'last_error': self.last_error,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f'<WebhookDelivery {self.id} {self.event_type} -> {self.endpoint_url} {self.status}>'
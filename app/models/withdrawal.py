@@ -21,6 +21,10 @@ class WithdrawalType(Enum):
 
 class WithdrawalRequest(BaseModel):
     __tablename__ = 'withdrawal_requests'
+    __table_args__ = (
+        # Per-client windowed aggregates (fraud features, recent lists)
+        db.Index('ix_withdrawal_requests_client_created', 'client_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False)
@@ -45,7 +49,7 @@ class WithdrawalRequest(BaseModel):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # For B2C withdrawals
     user_wallet_address = db.Column(db.String(100))  # User's destination wallet
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
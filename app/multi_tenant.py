@@ -1,12 +1,13 @@
-from flask import Flask, request
+from flask import Flask, request, render_template
 from werkzeug.middleware.proxy_fix import ProxyFix
-from app.models import Client
-from app.extensions import db
+from app.services.tenant_registry import DEFAULT_BRANDING, Tenant, tenant_registry
 
 class MultiTenantMiddleware:
     def __init__(self, app: Flask):
         self.app = app
-        self.app.wsgi_app = ProxyFix(self.app.wsgi_app)
+        # Wrap the original WSGI callable; calling the Flask app itself would
+        # re-enter this middleware once it is installed as app.wsgi_app
+        self.wsgi_app = ProxyFix(app.wsgi_app)
         
     def __call__(self, environ, start_response):
         # Get the hostname from the request
@@ -16,31 +17,21 @@ class MultiTenantMiddleware:
         if '.' in host:
             subdomain = host.split('.')[0]
             
-            # Try to find client by subdomain
-            client = Client.query.filter_by(subdomain=subdomain).first()
+            # Resolve from the in-process registry (no query per request)
+            tenant = tenant_registry.resolve(subdomain)
             
-            if client:
+            if tenant:
                 # Store client ID in the environment
-                environ['CLIENT_ID'] = str(client.id)
+                environ['CLIENT_ID'] = str(tenant.client_id)
                 
                 # Apply client-specific branding
-                self.apply_branding(client, environ)
+                self.apply_branding(tenant, environ)
         
-        return self.app(environ, start_response)
+        return self.wsgi_app(environ, start_response)
     
-    def apply_branding(self, client: Client, environ):
+    def apply_branding(self, tenant: Tenant, environ):
         """Apply client-specific branding to the request"""
-        # Get branding settings
-        logo_url = client.settings.filter_by(key='logo_url').first()
-        primary_color = client.settings.filter_by(key='primary_color').first()
-        secondary_color = client.settings.filter_by(key='secondary_color').first()
-        
-        # Store branding settings in environment
-        environ['BRANDING'] = {
-            'logo_url': logo_url.value if logo_url else None,
-            'primary_color': primary_color.value if primary_color else '#007bff',
-            'secondary_color': secondary_color.value if secondary_color else '#6c757d'
-        }
+        environ['BRANDING'] = dict(tenant.branding)
 
 def init_multi_tenant(app: Flask):
     """Initialize multi-tenant support"""
@@ -51,11 +42,7 @@ def init_multi_tenant(app: Flask):
     @app.context_processor
     def inject_branding():
         def get_branding():
-            return request.environ.get('BRANDING', {
-                'logo_url': None,
-                'primary_color': '#007bff',
-                'secondary_color': '#6c757d'
-            })
+            return request.environ.get('BRANDING', dict(DEFAULT_BRANDING))
         return dict(get_branding=get_branding)
     
     # Add URL converters for subdomains
@@ -8,16 +8,17 @@ from flask_login import login_required, current_user
 from decimal import Decimal
 from datetime import datetime, timedelta
 import secrets
-import hashlib
 
 from app import db
-from app.models import Client, ClientPackage, PackageActivationPayment, FlatRateSubscriptionPayment, Payment, PaymentStatus, ClientType, SubscriptionBillingCycle
+from app.models import Client, ClientPackage, PackageActivationPayment, FlatRateSubscriptionPayment, Payment, PaymentStatus, ClientType, SubscriptionBillingCycle, PaymentAddress
 from app.decorators import client_required
 from app.utils.exchange import get_exchange_rate, convert_fiat_to_crypto, format_crypto_amount, get_popular_cryptocurrencies
 from app.utils.crypto_config import get_cryptocurrency_choices, get_cryptocurrency_info
 from app.utils.security import rate_limit, abuse_protection
 from app.utils.audit import log_api_usage, log_security_event
 from app.utils.fraud_detection import FraudDetectionService
+from app.services.address_pool import address_pool
+from app.services.payment_events import payment_events, status_payload
 
 package_payment = Blueprint('package_payment', __name__, url_prefix='/package-payment')
 
@@ -198,9 +199,6 @@ def create_payment(package_id, crypto_currency):
             flash('Unable to get current exchange rate. Please try again later.', 'error')
             return redirect(url_for('package_payment.initiate_activation', package_id=package_id))
         
-        # Generate unique payment address (simplified - in production, use proper wallet API)
-        payment_address = generate_payment_address(crypto_currency)
-        
         activation_payment = PackageActivationPayment(
             client_id=current_user.id,
             package_id=package_id,
@@ -208,13 +206,14 @@ def create_payment(package_id, crypto_currency):
             setup_fee_currency='USD',
             crypto_amount=crypto_amount,
             crypto_currency=crypto_currency,
-            crypto_address=payment_address,
             exchange_rate=exchange_rate,
             rate_timestamp=datetime.utcnow(),
             expires_at=datetime.utcnow() + timedelta(hours=24)
         )
         
         db.session.add(activation_payment)
+        # Lease a pre-derived deposit address; it is committed with the payment
+        address_pool.assign(activation_payment, PaymentAddress.OWNER_PACKAGE_ACTIVATION)
         db.session.commit()
         
         return redirect(url_for('package_payment.payment_details', payment_id=activation_payment.id))
@@ -223,8 +222,6 @@ def create_payment(package_id, crypto_currency):
         current_app.logger.error(f"Error creating package activation payment: {e}")
         flash('An error occurred. Please try again.', 'error')
         return redirect(url_for('package_payment.initiate_activation', package_id=package_id))
-        payment_address = generate_payment_address()
-        
         activation_payment = PackageActivationPayment(
             client_id=current_user.id,
             package_id=package_id,
@@ -232,13 +229,13 @@ def create_payment(package_id, crypto_currency):
             setup_fee_currency='USD',
             crypto_amount=btc_amount,
             crypto_currency='BTC',
-            crypto_address=payment_address,
             exchange_rate=Decimal(str(btc_rate)),
             rate_timestamp=datetime.utcnow(),
             expires_at=datetime.utcnow() + timedelta(hours=24)
         )
         
         db.session.add(activation_payment)
+        address_pool.assign(activation_payment, PaymentAddress.OWNER_PACKAGE_ACTIVATION)
         db.session.commit()
         
         return redirect(url_for('package_payment.payment_details', payment_id=activation_payment.id))
@@ -314,18 +311,60 @@ def check_payment_status(payment_id):
         # For demo purposes, simulate payment detection
         # In production, integrate with blockchain API or payment processor
         
-        return jsonify({
-            'status': payment.status.value,
-            'confirmations': payment.confirmations,
-            'required_confirmations': payment.required_confirmations,
-            'is_completed': payment.status == PaymentStatus.COMPLETED,
-            'time_remaining': str(payment.time_remaining) if not payment.is_expired else '0:00:00'
-        })
+        return jsonify(status_payload(payment))
         
     except Exception as e:
         current_app.logger.error(f"Error checking payment status: {e}")
         return jsonify({'error': 'An error occurred'}), 500
 
+@package_payment.route('/payment-events/<int:payment_id>')
+@login_required
+@client_required
+@rate_limit('payment_events', limit=30)
+def payment_status_stream(payment_id):
+    """
+    Server-sent events stream of payment status transitions
+    Replaces check_payment_status polling; idle streams make no DB queries
+    """
+    if not payment_events.try_open_stream():
+        # Every stream holds a worker thread; over the cap the page keeps polling
+        response = jsonify({'error': 'Too many open streams'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    # Subscribe before reading, so a transition in between is not missed
+    subscription = payment_events.subscribe(payment_id)
+    try:
+        log_api_usage(
+            user_id=current_user.id,
+            endpoint=f'/package-payment/payment-events/{payment_id}',
+            method='GET',
+            request_data=None,
+            ip_address=request.remote_addr
+        )
+        
+        payment = PackageActivationPayment.query.get_or_404(payment_id)
+        if payment.client_id != current_user.id:
+            log_security_event(
+                event_type='unauthorized_payment_access',
+                user_id=current_user.id,
+                details={'payment_id': payment_id, 'actual_owner': payment.client_id},
+                ip_address=request.remote_addr
+            )
+            subscription.close()
+            payment_events.close_stream()
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        initial = status_payload(payment)
+        # Return the connection to the pool; the stream only waits on the broker
+        db.session.close()
+    except BaseException:
+        subscription.close()
+        payment_events.close_stream()
+        raise
+    
+    return payment_events.sse_response(subscription, initial)
+
 @package_payment.route('/simulate-payment/<int:payment_id>', methods=['POST'])
 @login_required
 @client_required
@@ -462,9 +501,6 @@ def create_flat_rate_crypto_payment(package_id, billing_cycle, crypto_currency):
             flash('Unable to get current exchange rate. Please try again later.', 'error')
             return redirect(url_for('package_payment.create_flat_rate_payment', package_id=package_id, billing_cycle=billing_cycle))
         
-        # Generate payment address
-        payment_address = generate_payment_address(crypto_currency)
-        
         # Set billing period
         period_start = datetime.utcnow()
         if billing_cycle == 'monthly':
@@ -483,7 +519,6 @@ def create_flat_rate_crypto_payment(package_id, billing_cycle, crypto_currency):
             billing_period_end=period_end,
             crypto_amount=crypto_amount,
             crypto_currency=crypto_currency,
-            crypto_address=payment_address,
             exchange_rate=exchange_rate,
             rate_timestamp=datetime.utcnow(),
             discount_applied=discount_applied,
@@ -491,6 +526,8 @@ def create_flat_rate_crypto_payment(package_id, billing_cycle, crypto_currency):
         )
         
         db.session.add(subscription_payment)
+        # Lease a pre-derived deposit address; it is committed with the payment
+        address_pool.assign(subscription_payment, PaymentAddress.OWNER_FLAT_RATE_SUBSCRIPTION)
         db.session.commit()
         
         return redirect(url_for('package_payment.flat_rate_payment_details', payment_id=subscription_payment.id))
@@ -555,113 +592,6 @@ def simulate_flat_rate_payment(payment_id):
         current_app.logger.error(f"Error simulating flat-rate payment: {e}")
         return jsonify({'error': 'An error occurred'}), 500
 
-def generate_payment_address(crypto_currency='BTC'):
-    """
-    Generate a unique payment address for the specified cryptocurrency
-    In production, integrate with wallet API for each supported crypto
-    """
-    crypto_currency = crypto_currency.upper()
-    
-    # Generate different address formats based on cryptocurrency
-    if crypto_currency == 'BTC':
-        # Bitcoin address format
-        prefix = "1PayCrypt"
-        random_part = secrets.token_hex(15)
-        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
-        return f"{prefix}{random_part}{checksum}"
-    
-    elif crypto_currency == 'ETH':
-        # Ethereum address format (42 characters, starts with 0x)
-        return "0x" + secrets.token_hex(20)
-    
-    elif crypto_currency in ['USDT', 'USDC', 'LINK', 'UNI', 'AAVE', 'COMP', 'SHIB']:
-        # ERC-20 tokens use Ethereum addresses
-        return "0x" + secrets.token_hex(20)
-    
-    elif crypto_currency == 'LTC':
-        # Litecoin address format
-        prefix = "LPayCrypt"
-        random_part = secrets.token_hex(15)
-        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
-        return f"{prefix}{random_part}{checksum}"
-    
-    elif crypto_currency == 'BCH':
-        # Bitcoin Cash address format
-        prefix = "bitcoincash:q"
-        random_part = secrets.token_hex(16)
-        return f"{prefix}{random_part}"
-    
-    elif crypto_currency == 'XRP':
-        # Ripple address format
-        return "r" + secrets.token_hex(15) + secrets.token_hex(10)
-    
-    elif crypto_currency == 'ADA':
-        # Cardano address format
-        prefix = "addr1"
-        random_part = secrets.token_hex(25)
-        return f"{prefix}{random_part}"
-    
-    elif crypto_currency == 'SOL':
-        # Solana address format (base58, ~44 characters)
-        return secrets.token_urlsafe(32)[:44]
-    
-    elif crypto_currency == 'DOT':
-        # Polkadot address format
-        return "1" + secrets.token_hex(15) + secrets.token_hex(16)
-    
-    elif crypto_currency == 'BNB':
-        # Binance Smart Chain address format (similar to Ethereum)
-        return "0x" + secrets.token_hex(20)
-    
-    elif crypto_currency == 'MATIC':
-        # Polygon uses Ethereum-compatible addresses
-        return "0x" + secrets.token_hex(20)
-    
-    elif crypto_currency == 'AVAX':
-        # Avalanche C-Chain uses Ethereum-compatible addresses
-        return "0x" + secrets.token_hex(20)
-    
-    elif crypto_currency == 'ATOM':
-        # Cosmos address format
-        prefix = "cosmos1"
-        random_part = secrets.token_hex(18)
-        return f"{prefix}{random_part}"
-    
-    elif crypto_currency == 'TRX':
-        # TRON address format
-        prefix = "T"
-        random_part = secrets.token_hex(16)
-        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
-        return f"{prefix}{random_part}{checksum}"
-    
-    elif crypto_currency == 'XMR':
-        # Monero address format (long address)
-        return "4" + secrets.token_hex(47)
-    
-    elif crypto_currency == 'ZEC':
-        # Zcash address format
-        prefix = "t1"
-        random_part = secrets.token_hex(16)
-        return f"{prefix}{random_part}"
-    
-    elif crypto_currency == 'DOGE':
-        # Dogecoin address format
-        prefix = "D"
-        random_part = secrets.token_hex(16)
-        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
-        return f"{prefix}{random_part}{checksum}"
-    
-    elif crypto_currency == 'ETC':
-        # Ethereum Classic uses Ethereum-like addresses
-        return "0x" + secrets.token_hex(20)
-    
-    else:
-        # Default to Bitcoin-like format for unknown currencies
-        prefix = f"1{crypto_currency[:3]}"
-        random_part = secrets.token_hex(15)
-        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
-        return f"{prefix}{random_part}{checksum}"
-
 def get_exchange_rate(from_currency, to_currency):
     """
     Get current exchange rate
@@ -0,0 +1,426 @@
+"""
+Address Pool
+Leases pre-derived deposit addresses to package payments and keeps per-coin pools topped up
+"""
+
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+class AddressPool:
+    """
+    Per-coin pool of pre-derived deposit addresses.
+
+    Deriving an address is a wallet-node round trip, so it happens ahead
+    of checkout: a scheduled maintenance job tops each coin's AVAILABLE
+    addresses back up to target_size whenever they drop below
+    low_watermark. assign() leases the lowest AVAILABLE row inside the
+    payment's own transaction: SELECT ... FOR UPDATE SKIP LOCKED picks a
+    row no concurrent checkout holds, and a conditional UPDATE (still
+    AVAILABLE) claims it, retrying on a lost race where SKIP LOCKED is not
+    supported. An address is therefore never leased twice, and a checkout
+    that rolls back hands its address back with it. Only an empty pool
+    makes checkout derive inline. The same job recycles: the address of an
+    expired, unpaid payment cools for cooldown_seconds, so a late deposit
+    is not credited to the next payer, then becomes AVAILABLE again;
+    addresses that received funds are retired as USED.
+    """
+
+    JOB_ID = 'address_pool_maintenance'
+    LOCK_KEY = 'address_pool:maintenance'
+
+    def __init__(self, redis_conn=None, target_size: int = 50, low_watermark: int = 20,
+                 refill_batch: int = 100, cooldown_seconds: int = 7 * 86400,
+                 maintenance_interval: int = 60, claim_attempts: int = 5):
+        self.redis = redis_conn
+        self.target_size = target_size
+        self.low_watermark = low_watermark
+        self.refill_batch = refill_batch
+        self.cooldown_seconds = cooldown_seconds
+        self.maintenance_interval = maintenance_interval
+        self.claim_attempts = claim_attempts
+        self.coins: tuple = ()
+        self.enabled = True
+
+        # Wallet call that derives one new address for a coin
+        self.deriver: Callable[[str], str] = derive_address
+
+    def init_app(self, app):
+        """Read configuration and schedule pool maintenance"""
+        self.enabled = app.config.get('ADDRESS_POOL_ENABLED', self.enabled)
+        self.target_size = app.config.get('ADDRESS_POOL_TARGET_SIZE', self.target_size)
+        self.low_watermark = app.config.get('ADDRESS_POOL_LOW_WATERMARK', self.low_watermark)
+        self.refill_batch = app.config.get('ADDRESS_POOL_REFILL_BATCH', self.refill_batch)
+        self.cooldown_seconds = app.config.get('ADDRESS_POOL_COOLDOWN', self.cooldown_seconds)
+        self.maintenance_interval = app.config.get('ADDRESS_POOL_MAINTENANCE_INTERVAL', self.maintenance_interval)
+        coins = app.config.get('ADDRESS_POOL_COINS') or app.config.get('COIN_LIST') or ()
+        self.coins = tuple(coin.upper() for coin in coins)
+        if self.redis is None:
+            self.redis = _redis_connection()
+
+        if not self.enabled:
+            app.logger.info("Address pool maintenance disabled; addresses are derived at checkout")
+            return
+
+        def _maintenance_job():
+            with app.app_context():
+                try:
+                    self.maintain()
+                except Exception as e:
+                    logger.error(f"Address pool maintenance failed: {e}", exc_info=True)
+
+        try:
+            from app.extensions import scheduler
+            scheduler.add_job(
+                id=self.JOB_ID,
+                func=_maintenance_job,
+                trigger='interval',
+                seconds=self.maintenance_interval,
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+            )
+        except Exception as e:
+            app.logger.error(f"Failed to schedule address pool maintenance: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Checkout side
+    # ------------------------------------------------------------------
+
+    def assign(self, payment, owner_type: str, session=None) -> str:
+        """
+        Lease an address for a new payment and set its crypto_address
+
+        The payment is flushed for its id; the lease commits or rolls back
+        with the caller's transaction.
+        """
+        from app.extensions import db
+
+        session = session or db.session()
+        if payment.id is None:
+            session.add(payment)
+            session.flush()
+        payment.crypto_address = self.lease(payment.crypto_currency, owner_type, payment.id,
+                                            payment.expires_at, session)
+        return payment.crypto_address
+
+    def lease(self, coin: str, owner_type: str, owner_id: int, expires_at: datetime,
+              session=None) -> str:
+        """Claim an AVAILABLE address of coin for (owner_type, owner_id) until expires_at"""
+        from app.extensions import db
+        from app.models.payment_address import PaymentAddress as A
+
+        session = session or db.session()
+        coin = coin.upper()
+        now = datetime.utcnow()
+        candidate = (
+            select(A.id, A.address)
+            .where(A.coin == coin, A.status == A.STATUS_AVAILABLE)
+            .order_by(A.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        for _ in range(self.claim_attempts):
+            row = session.execute(candidate).first()
+            if row is None:
+                break
+            claimed = session.execute(
+                update(A)
+                .where(A.id == row.id, A.status == A.STATUS_AVAILABLE)
+                .values(status=A.STATUS_LEASED, owner_type=owner_type, owner_id=owner_id,
+                        leased_at=now, lease_expires_at=expires_at, released_at=None,
+                        lease_count=A.lease_count + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed:
+                return row.address
+
+        logger.warning(f"Address pool for {coin} is empty; deriving at checkout")
+        address = self.deriver(coin)
+        session.add(A(coin=coin, address=address, status=A.STATUS_LEASED, owner_type=owner_type,
+                      owner_id=owner_id, leased_at=now, lease_expires_at=expires_at, lease_count=1))
+        return address
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def maintain(self) -> Dict[str, int]:
+        """One recycle + refill pass, run by a single worker per interval"""
+        if not self._acquire():
+            return {}
+        result = self.recycle()
+        result['derived'] = self.refill()
+        return result
+
+    def refill(self, coins: Optional[Iterable[str]] = None, force: bool = False) -> int:
+        """
+        Top up each coin's AVAILABLE addresses to target_size
+
+        Coins at or above low_watermark are left alone unless force is set.
+        Returns the number of addresses added.
+        """
+        from app.extensions import db
+        from app.models.payment_address import PaymentAddress as A
+
+        coins = tuple(coin.upper() for coin in (coins or self.coins))
+        if not coins:
+            return 0
+        available = dict(db.session.execute(
+            select(A.coin, func.count(A.id))
+            .where(A.status == A.STATUS_AVAILABLE, A.coin.in_(coins))
+            .group_by(A.coin)
+        ).all())
+        db.session.rollback()
+
+        written = 0
+        for coin in coins:
+            have = available.get(coin, 0)
+            if have >= self.low_watermark and not force:
+                continue
+            need = self.target_size - have
+            while need > 0:
+                rows = self._derive(coin, min(need, self.refill_batch))
+                if not rows:
+                    break
+                try:
+                    db.session.execute(insert(A), rows)
+                    db.session.commit()
+                    written += len(rows)
+                except IntegrityError as e:
+                    # Wallet returned an address we already hold; try again next pass
+                    db.session.rollback()
+                    logger.warning(f"Duplicate {coin} address while refilling pool: {e}")
+                    break
+                need -= len(rows)
+        if written:
+            logger.info(f"Address pool refilled with {written} address(es)")
+        return written
+
+    def recycle(self) -> Dict[str, int]:
+        """
+        Release expired leases of unpaid payments and reopen cooled addresses
+
+        A payment counts as paid once it is APPROVED/COMPLETED or carries a
+        transaction hash; its address is retired instead.
+        """
+        from app.extensions import db
+        from app.models.enums import PaymentStatus
+        from app.models.payment_address import PaymentAddress as A
+
+        now = datetime.utcnow()
+        retired = released = 0
+        for owner_type, model in _owner_models().items():
+            expired = and_(A.status == A.STATUS_LEASED, A.owner_type == owner_type,
+                           A.lease_expires_at < now)
+            paid = select(model.id).where(or_(
+                model.status.in_([PaymentStatus.APPROVED, PaymentStatus.COMPLETED]),
+                model.transaction_hash.isnot(None),
+            ))
+            retired += db.session.execute(
+                update(A).where(expired, A.owner_id.in_(paid))
+                .values(status=A.STATUS_USED)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            released += db.session.execute(
+                update(A).where(expired, A.owner_id.notin_(paid))
+                .values(status=A.STATUS_COOLING, released_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+        reopened = db.session.execute(
+            update(A)
+            .where(A.status == A.STATUS_COOLING,
+                   A.released_at < now - timedelta(seconds=self.cooldown_seconds))
+            .values(status=A.STATUS_AVAILABLE, owner_type=None, owner_id=None,
+                    leased_at=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+        if retired or released or reopened:
+            logger.info(f"Address pool recycle: {released} cooling, {reopened} reopened, {retired} retired")
+        return {'retired': retired, 'released': released, 'reopened': reopened}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Address counts per coin and status"""
+        from app.extensions import db
+        from app.models.payment_address import PaymentAddress as A
+
+        counts: Dict[str, Dict[str, int]] = {}
+        rows = db.session.execute(
+            select(A.coin, A.status, func.count(A.id)).group_by(A.coin, A.status)
+        ).all()
+        for coin, status, count in rows:
+            counts.setdefault(coin, {})[status] = count
+        return counts
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _derive(self, coin: str, count: int):
+        from app.models.payment_address import PaymentAddress as A
+
+        now = datetime.utcnow()
+        rows, seen = [], set()
+        for _ in range(count):
+            try:
+                address = self.deriver(coin)
+            except Exception as e:
+                logger.error(f"Failed to derive {coin} address: {e}")
+                break
+            if address in seen:
+                continue
+            seen.add(address)
+            rows.append({'coin': coin, 'address': address, 'status': A.STATUS_AVAILABLE,
+                         'lease_count': 0, 'created_at': now})
+        return rows
+
+    def _acquire(self) -> bool:
+        """True if this worker should run maintenance now (the lock simply expires)"""
+        if self.redis is None:
+            return True
+        try:
+            ttl = max(int(self.maintenance_interval) - 1, 1)
+            return bool(self.redis.set(self.LOCK_KEY, '1', nx=True, ex=ttl))
+        except Exception as e:
+            logger.warning(f"Address pool lock unavailable, running maintenance anyway: {e}")
+            return True
+
+
+def _owner_models() -> Dict:
+    from app.models.package_payment import FlatRateSubscriptionPayment, PackageActivationPayment
+    from app.models.payment_address import PaymentAddress
+
+    return {
+        PaymentAddress.OWNER_PACKAGE_ACTIVATION: PackageActivationPayment,
+        PaymentAddress.OWNER_FLAT_RATE_SUBSCRIPTION: FlatRateSubscriptionPayment,
+    }
+
+
+def _redis_connection():
+    from app.utils.security import REDIS_AVAILABLE, redis_client
+    return redis_client if REDIS_AVAILABLE else None
+
+
+def derive_address(crypto_currency: str = 'BTC') -> str:
+    """
+    Derive a fresh deposit address for crypto_currency
+
+    Stand-in for the wallet node: in production this is the per-coin
+    wallet RPC call that the pool refill job makes ahead of checkout.
+    """
+    crypto_currency = crypto_currency.upper()
+
+    # Generate different address formats based on cryptocurrency
+    if crypto_currency == 'BTC':
+        # Bitcoin address format
+        prefix = "1PayCrypt"
+        random_part = secrets.token_hex(15)
+        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
+        return f"{prefix}{random_part}{checksum}"
+
+    elif crypto_currency == 'ETH':
+        # Ethereum address format (42 characters, starts with 0x)
+        return "0x" + secrets.token_hex(20)
+
+    elif crypto_currency in ['USDT', 'USDC', 'LINK', 'UNI', 'AAVE', 'COMP', 'SHIB']:
+        # ERC-20 tokens use Ethereum addresses
+        return "0x" + secrets.token_hex(20)
+
+    elif crypto_currency == 'LTC':
+        # Litecoin address format
+        prefix = "LPayCrypt"
+        random_part = secrets.token_hex(15)
+        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
+        return f"{prefix}{random_part}{checksum}"
+
+    elif crypto_currency == 'BCH':
+        # Bitcoin Cash address format
+        prefix = "bitcoincash:q"
+        random_part = secrets.token_hex(16)
+        return f"{prefix}{random_part}"
+
+    elif crypto_currency == 'XRP':
+        # Ripple address format
+        return "r" + secrets.token_hex(15) + secrets.token_hex(10)
+
+    elif crypto_currency == 'ADA':
+        # Cardano address format
+        prefix = "addr1"
+        random_part = secrets.token_hex(25)
+        return f"{prefix}{random_part}"
+
+    elif crypto_currency == 'SOL':
+        # Solana address format (base58, ~44 characters)
+        return secrets.token_urlsafe(32)[:44]
+
+    elif crypto_currency == 'DOT':
+        # Polkadot address format
+        return "1" + secrets.token_hex(15) + secrets.token_hex(16)
+
+    elif crypto_currency == 'BNB':
+        # Binance Smart Chain address format (similar to Ethereum)
+        return "0x" + secrets.token_hex(20)
+
+    elif crypto_currency == 'MATIC':
+        # Polygon uses Ethereum-compatible addresses
+        return "0x" + secrets.token_hex(20)
+
+    elif crypto_currency == 'AVAX':
+        # Avalanche C-Chain uses Ethereum-compatible addresses
+        return "0x" + secrets.token_hex(20)
+
+    elif crypto_currency == 'ATOM':
+        # Cosmos address format
+        prefix = "cosmos1"
+        random_part = secrets.token_hex(18)
+        return f"{prefix}{random_part}"
+
+    elif crypto_currency == 'TRX':
+        # TRON address format
+        prefix = "T"
+        random_part = secrets.token_hex(16)
+        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
+        return f"{prefix}{random_part}{checksum}"
+
+    elif crypto_currency == 'XMR':
+        # Monero address format (long address)
+        return "4" + secrets.token_hex(47)
+
+    elif crypto_currency == 'ZEC':
+        # Zcash address format
+        prefix = "t1"
+        random_part = secrets.token_hex(16)
+        return f"{prefix}{random_part}"
+
+    elif crypto_currency == 'DOGE':
+        # Dogecoin address format
+        prefix = "D"
+        random_part = secrets.token_hex(16)
+        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
+        return f"{prefix}{random_part}{checksum}"
+
+    elif crypto_currency == 'ETC':
+        # Ethereum Classic uses Ethereum-like addresses
+        return "0x" + secrets.token_hex(20)
+
+    else:
+        # Default to Bitcoin-like format for unknown currencies
+        prefix = f"1{crypto_currency[:3]}"
+        random_part = secrets.token_hex(15)
+        checksum = hashlib.sha256(f"{prefix}{random_part}".encode()).hexdigest()[:4]
+        return f"{prefix}{random_part}{checksum}"
+
+
+# Global address pool
+address_pool = AddressPool()
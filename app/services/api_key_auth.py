@@ -0,0 +1,234 @@
+"""
+API Key Authentication Service
+Prefix-indexed lookup, keyed-HMAC verification and a short-TTL verified-key cache
+"""
+
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# session.info key collecting digests to invalidate once the transaction commits
+PENDING_INVALIDATIONS_KEY = 'api_key_auth_invalidations'
+
+
+@dataclass(frozen=True)
+class ApiKeyIdentity:
+    """What a verified API key grants; safe to cache, holds no secret material"""
+    api_key_id: int
+    client_id: int
+    scopes: FrozenSet[str]
+    rate_limit: int
+    allowed_ips: Tuple[str, ...] = ()
+    expires_at: Optional[datetime] = None
+
+    def has_scope(self, scope: str) -> bool:
+        return scope in self.scopes
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+    def is_ip_allowed(self, ip_address: str) -> bool:
+        return not self.allowed_ips or ip_address in self.allowed_ips
+
+    def to_dict(self) -> Dict:
+        return {
+            'api_key_id': self.api_key_id,
+            'client_id': self.client_id,
+            'scopes': sorted(self.scopes),
+            'rate_limit': self.rate_limit,
+            'allowed_ips': list(self.allowed_ips),
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ApiKeyIdentity':
+        return cls(
+            api_key_id=data['api_key_id'],
+            client_id=data['client_id'],
+            scopes=frozenset(data.get('scopes') or ()),
+            rate_limit=data.get('rate_limit') or 60,
+            allowed_ips=tuple(data.get('allowed_ips') or ()),
+            expires_at=datetime.fromisoformat(data['expires_at']) if data.get('expires_at') else None,
+        )
+
+    @classmethod
+    def from_api_key(cls, api_key) -> 'ApiKeyIdentity':
+        return cls(
+            api_key_id=api_key.id,
+            client_id=api_key.client_id,
+            scopes=frozenset(api_key.permissions or ()),
+            rate_limit=api_key.rate_limit or 60,
+            allowed_ips=tuple(api_key.allowed_ips or ()),
+            expires_at=api_key.expires_at,
+        )
+
+
+def compute_key_digest(raw_key: str) -> str:
+    """Keyed HMAC-SHA256 of an API key, used for storage and per-request checks"""
+    secret = current_app.config.get('API_KEY_DIGEST_SECRET') or current_app.config['SECRET_KEY']
+    return hmac.new(secret.encode('utf-8'), raw_key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class ApiKeyAuthService:
+    """
+    Authenticates raw API keys in microseconds.
+
+    Lookup: the indexed key_prefix column narrows the search to one candidate
+    row, which is verified by comparing HMAC digests in constant time.
+    Verified identities are cached by digest in Flask-Caching (shared) and
+    in-process (local_ttl seconds). Any update or delete of a ClientApiKey
+    invalidates both once the transaction commits; other workers drop their
+    local copy within local_ttl.
+    """
+
+    CACHE_PREFIX = 'api_key_auth:'
+
+    def __init__(self, shared_ttl: int = 60, local_ttl: int = 5, max_local_entries: int = 10000):
+        self.shared_ttl = shared_ttl
+        self.local_ttl = local_ttl
+        self.max_local_entries = max_local_entries
+        self._local: Dict[str, Tuple[float, ApiKeyIdentity]] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.shared_ttl = app.config.get('API_KEY_CACHE_TTL', self.shared_ttl)
+        self.local_ttl = app.config.get('API_KEY_LOCAL_CACHE_TTL', self.local_ttl)
+
+    def authenticate(self, raw_key: Optional[str]) -> Optional[ApiKeyIdentity]:
+        """Return the identity for an active, unexpired key, or None"""
+        if not raw_key:
+            return None
+
+        digest = compute_key_digest(raw_key)
+        identity = self._get_cached(digest)
+        if identity is None:
+            identity = self._load(raw_key, digest)
+            if identity is None:
+                return None
+            self._store(digest, identity)
+
+        if identity.is_expired():
+            return None
+        return identity
+
+    def invalidate(self, *digests: str):
+        """Drop cached identities for the given key digests"""
+        digests = [d for d in digests if d]
+        if not digests:
+            return
+        with self._lock:
+            for digest in digests:
+                self._local.pop(digest, None)
+        try:
+            cache.delete_many(*[self.CACHE_PREFIX + d for d in digests])
+        except Exception as e:
+            logger.warning(f"Failed to invalidate shared API key cache: {e}")
+
+    def invalidate_after_commit(self, api_key):
+        """Invalidate now and again after the surrounding transaction commits"""
+        digests = {api_key.key_digest}
+        history = _attribute_history(api_key, 'key_digest')
+        if history:
+            digests.update(history)
+        digests.discard(None)
+        self.invalidate(*digests)
+
+        session = object_session(api_key)
+        if session is not None:
+            session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).update(digests)
+
+    def _load(self, raw_key: str, digest: str) -> Optional[ApiKeyIdentity]:
+        from app.extensions import db
+        from app.models.api_key import ClientApiKey
+
+        candidates = ClientApiKey.query.filter_by(
+            key_prefix=ClientApiKey.generate_key_prefix(raw_key),
+            is_active=True
+        ).all()
+
+        for api_key in candidates:
+            if api_key.key_digest:
+                if hmac.compare_digest(api_key.key_digest, digest):
+                    return ApiKeyIdentity.from_api_key(api_key)
+            elif ClientApiKey.verify_key(raw_key, api_key.key_hash):
+                # Legacy row created before digests existed; upgrade it once
+                api_key.key_digest = digest
+                try:
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Failed to backfill digest for API key {api_key.id}: {e}")
+                return ApiKeyIdentity.from_api_key(api_key)
+        return None
+
+    def _get_cached(self, digest: str) -> Optional[ApiKeyIdentity]:
+        now = time.monotonic()
+        entry = self._local.get(digest)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        try:
+            data = cache.get(self.CACHE_PREFIX + digest)
+        except Exception as e:
+            logger.warning(f"Failed to read shared API key cache: {e}")
+            data = None
+        if not data:
+            return None
+
+        identity = ApiKeyIdentity.from_dict(data)
+        self._store_local(digest, identity)
+        return identity
+
+    def _store(self, digest: str, identity: ApiKeyIdentity):
+        try:
+            cache.set(self.CACHE_PREFIX + digest, identity.to_dict(), timeout=self.shared_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write shared API key cache: {e}")
+        self._store_local(digest, identity)
+
+    def _store_local(self, digest: str, identity: ApiKeyIdentity):
+        expires = time.monotonic() + self.local_ttl
+        with self._lock:
+            if len(self._local) >= self.max_local_entries:
+                now = time.monotonic()
+                self._local = {k: v for k, v in self._local.items() if v[0] > now}
+                if len(self._local) >= self.max_local_entries:
+                    self._local.clear()
+            self._local[digest] = (expires, identity)
+
+
+def _attribute_history(instance, attribute: str):
+    """Previous values of an attribute within the current flush"""
+    try:
+        return list(inspect(instance).attrs[attribute].history.deleted or ())
+    except Exception:
+        return []
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_api_keys(session):
+    digests = session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+    if digests:
+        api_key_auth.invalidate(*digests)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_api_key_invalidations(session):
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+
+
+# Global API key authentication service
+api_key_auth = ApiKeyAuthService()
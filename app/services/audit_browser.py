@@ -0,0 +1,236 @@
+"""
+Audit Trail Browser
+Keyset-paginated, index-backed queries for the admin audit trail page
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.orm import joinedload
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+DIRECTION_NEXT = 'next'
+DIRECTION_PREV = 'prev'
+
+
+@dataclass(frozen=True)
+class AuditFilters:
+    """Filters supported by the audit trail page (each matches an index)"""
+    action_type: Optional[str] = None
+    entity_type: Optional[str] = None
+    entity_id: Optional[int] = None
+    user_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None  # Exclusive
+
+    @classmethod
+    def from_args(cls, args) -> 'AuditFilters':
+        """Build filters from request.args; dates are YYYY-MM-DD and end_date is inclusive"""
+        end_date = _parse_date(args.get('end_date'))
+        return cls(
+            action_type=args.get('action_type') or None,
+            entity_type=args.get('entity_type') or None,
+            entity_id=args.get('entity_id', type=int),
+            user_id=args.get('user_id', type=int),
+            start_date=_parse_date(args.get('start_date')),
+            end_date=end_date + timedelta(days=1) if end_date else None,
+        )
+
+    def criteria(self) -> List:
+        """WHERE clauses for these filters"""
+        from app.models.audit import AuditTrail
+
+        clauses = []
+        if self.action_type:
+            clauses.append(AuditTrail.action_type == self.action_type)
+        if self.entity_type:
+            clauses.append(AuditTrail.entity_type == self.entity_type)
+        if self.entity_id:
+            clauses.append(AuditTrail.entity_id == self.entity_id)
+        if self.user_id:
+            clauses.append(AuditTrail.user_id == self.user_id)
+        if self.start_date:
+            clauses.append(AuditTrail.created_at >= self.start_date)
+        if self.end_date:
+            clauses.append(AuditTrail.created_at < self.end_date)
+        return clauses
+
+    def cache_key(self) -> str:
+        raw = json.dumps([self.action_type, self.entity_type, self.entity_id, self.user_id,
+                          self.start_date.isoformat() if self.start_date else None,
+                          self.end_date.isoformat() if self.end_date else None])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class AuditPage:
+    entries: List = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: int = 0
+    total_is_estimate: bool = False
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def encode_cursor(created_at: datetime, entry_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{entry_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """(created_at, id) from an opaque cursor, or None if missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, entry_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class AuditTrailBrowser:
+    """
+    Audit trail queries that stay fast at any table size.
+
+    Pages are fetched by keyset on (created_at, id) rather than OFFSET, so
+    each page is one index range scan of per_page + 1 rows whatever its
+    position. Every supported filter has a composite index ending in
+    (created_at, id) - see AuditTrail.__table_args__ - so the ORDER BY is
+    satisfied by the index instead of a sort. Totals are exact up to
+    count_cap rows and estimated beyond that (from the planner on
+    PostgreSQL), and are cached briefly per filter set.
+    """
+
+    COUNT_CACHE_PREFIX = 'audit_trail_count:'
+
+    def __init__(self, per_page: int = 50, max_per_page: int = 200,
+                 count_cap: int = 10000, count_cache_ttl: int = 60):
+        self.per_page = per_page
+        self.max_per_page = max_per_page
+        self.count_cap = count_cap
+        self.count_cache_ttl = count_cache_ttl
+
+    def init_app(self, app):
+        self.per_page = app.config.get('AUDIT_TRAIL_PER_PAGE', self.per_page)
+        self.count_cap = app.config.get('AUDIT_TRAIL_COUNT_CAP', self.count_cap)
+        self.count_cache_ttl = app.config.get('AUDIT_TRAIL_COUNT_CACHE_TTL', self.count_cache_ttl)
+
+    def page(self, filters: AuditFilters, cursor: Optional[str] = None,
+             direction: str = DIRECTION_NEXT, per_page: Optional[int] = None) -> AuditPage:
+        """One page of entries, newest first, starting after (or before) cursor"""
+        from app.extensions import db
+        from app.models.audit import AuditTrail
+
+        per_page = max(1, min(per_page or self.per_page, self.max_per_page))
+        position = decode_cursor(cursor)
+        backwards = direction == DIRECTION_PREV and position is not None
+
+        stmt = self._filtered(select(AuditTrail), filters).options(joinedload(AuditTrail.user))
+        key = tuple_(AuditTrail.created_at, AuditTrail.id)
+        if position is not None:
+            stmt = stmt.where(key > position if backwards else key < position)
+        if backwards:
+            stmt = stmt.order_by(AuditTrail.created_at.asc(), AuditTrail.id.asc())
+        else:
+            stmt = stmt.order_by(AuditTrail.created_at.desc(), AuditTrail.id.desc())
+
+        rows = list(db.session.execute(stmt.limit(per_page + 1)).scalars().unique())
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backwards:
+            rows.reverse()
+
+        result = AuditPage(entries=rows)
+        if rows:
+            # Going back, more rows means newer pages; going forward, older ones
+            older = True if backwards else has_more
+            newer = has_more if backwards else position is not None
+            if older:
+                result.next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+            if newer:
+                result.prev_cursor = encode_cursor(rows[0].created_at, rows[0].id)
+        result.total, result.total_is_estimate = self.estimate_count(filters)
+        return result
+
+    def estimate_count(self, filters: AuditFilters) -> Tuple[int, bool]:
+        """(count, is_estimate): exact below count_cap, planner estimate above it"""
+        cache_key = self.COUNT_CACHE_PREFIX + filters.cache_key()
+        try:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return tuple(cached)
+        except Exception as e:
+            logger.warning(f"Failed to read audit trail count cache: {e}")
+
+        result = self._count(filters)
+        try:
+            cache.set(cache_key, list(result), timeout=self.count_cache_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write audit trail count cache: {e}")
+        return result
+
+    def search_users(self, query: str, limit: int = 20) -> List[Dict]:
+        """Users whose email or username starts with query (prefix match keeps the unique indexes usable)"""
+        from app.extensions import db
+        from app.models.user import User
+
+        query = (query or '').strip()
+        if not query:
+            return []
+        pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        rows = db.session.execute(
+            select(User.id, User.email, User.username)
+            .where((User.email.like(pattern, escape='\\')) | (User.username.like(pattern, escape='\\')))
+            .order_by(User.email)
+            .limit(limit)
+        ).all()
+        return [{'id': row.id, 'email': row.email, 'username': row.username} for row in rows]
+
+    def _filtered(self, stmt, filters: AuditFilters):
+        criteria = filters.criteria()
+        return stmt.where(*criteria) if criteria else stmt
+
+    def _count(self, filters: AuditFilters) -> Tuple[int, bool]:
+        from app.extensions import db
+        from app.models.audit import AuditTrail
+
+        # Count at most count_cap + 1 rows; an index-only scan that stops early
+        capped = self._filtered(select(AuditTrail.id), filters).limit(self.count_cap + 1).subquery()
+        count = db.session.execute(select(func.count()).select_from(capped)).scalar() or 0
+        if count <= self.count_cap:
+            return count, False
+
+        if db.engine.dialect.name == 'postgresql':
+            try:
+                stmt = self._filtered(select(AuditTrail.id), filters)
+                compiled = stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+                plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = int(plan[0]['Plan']['Plan Rows'])
+                return max(estimate, count), True
+            except Exception as e:
+                logger.warning(f"Audit trail count estimate failed: {e}")
+        return count, True
+
+
+# Global audit trail browser
+audit_browser = AuditTrailBrowser()
@@ -0,0 +1,213 @@
+"""
+Audit Pipeline
+Buffers audit events in memory and writes them in batches from a background thread
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns that AuditTrail declares NOT NULL; rows missing them are rejected up front
+REQUIRED_FIELDS = ('user_id', 'action_type', 'entity_type', 'entity_id')
+
+
+class AuditPipeline:
+    """
+    Asynchronous, bounded audit-log writer.
+
+    Request code calls submit(), which only enqueues a row. A background
+    writer flushes rows with one multi-row INSERT (executemany) on its own
+    connection when batch_size rows are queued or flush_interval seconds have
+    passed, so audit writes never commit or roll back the caller's session.
+    A full queue waits up to enqueue_timeout seconds (backpressure) and then
+    drops the event; both are counted. drain() flushes everything at shutdown.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0, enqueue_timeout: float = 0.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.async_enabled = True
+
+        self.app = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'backpressured': 0,
+            'rejected': 0,
+            'failed': 0,
+            'batches': 0,
+        }
+
+    def init_app(self, app):
+        """Bind to the app and read configuration; the writer starts on first submit"""
+        self.app = app
+        self.max_queue = app.config.get('AUDIT_QUEUE_MAXSIZE', self.max_queue)
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', self.flush_interval)
+        self.enqueue_timeout = app.config.get('AUDIT_ENQUEUE_TIMEOUT', self.enqueue_timeout)
+        self.async_enabled = app.config.get('AUDIT_ASYNC', self.async_enabled)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        atexit.register(self.drain)
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def submit(self, user_id, action_type: str, entity_type: str, entity_id,
+               old_value: Any = None, new_value: Any = None,
+               ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> bool:
+        """
+        Queue one audit row for writing
+
+        Returns:
+            True if the event was accepted, False if it was rejected or dropped
+        """
+        row = {
+            'user_id': user_id,
+            'action_type': action_type,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'old_value': old_value,
+            'new_value': new_value,
+            'ip_address': ip_address,
+            'user_agent': (user_agent or '')[:255] or None,
+            'created_at': datetime.utcnow(),
+        }
+        missing = [name for name in REQUIRED_FIELDS if row[name] is None]
+        if missing:
+            logger.debug(f"Audit event {action_type} skipped, missing {', '.join(missing)}")
+            self._incr('rejected')
+            return False
+
+        if not self.async_enabled or self.app is None:
+            self._write([row], self.app)
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            if self.enqueue_timeout <= 0:
+                self._incr('dropped')
+                logger.warning(f"Audit queue full, dropped {action_type} event")
+                return False
+            self._incr('backpressured')
+            try:
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            except queue.Full:
+                self._incr('dropped')
+                logger.warning(f"Audit queue full after {self.enqueue_timeout}s, dropped {action_type} event")
+                return False
+
+        self._incr('enqueued')
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring, plus current queue depth"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so (re)start per worker process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set() or not self._queue.empty():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self._write(batch, self.app)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+        if batch:
+            self._write(batch, self.app)
+
+    def _write(self, rows: List[Dict], app):
+        """Insert rows on a dedicated connection; isolate bad rows if the batch fails"""
+        from app.extensions import db
+        from app.models.audit import AuditTrail
+
+        if app is None:
+            from flask import current_app
+            app = current_app._get_current_object()
+
+        table = AuditTrail.__table__
+        with app.app_context():
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert(), rows)
+                self._incr('written', len(rows))
+                self._incr('batches')
+                return
+            except Exception as e:
+                if len(rows) == 1:
+                    self._incr('failed')
+                    logger.error(f"Failed to write audit event {rows[0]['action_type']}: {e}")
+                    return
+                logger.warning(f"Audit batch of {len(rows)} failed, retrying row by row: {e}")
+
+            for row in rows:
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(table.insert(), [row])
+                    self._incr('written')
+                except Exception as e:
+                    self._incr('failed')
+                    logger.error(f"Failed to write audit event {row['action_type']}: {e}")
+
+    def drain(self, timeout: float = 10.0):
+        """Stop the writer after flushing every queued event"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._stop.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error(f"Audit writer did not drain within {timeout}s; {self._queue.qsize()} events pending")
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+
+# Global audit pipeline instance
+audit_pipeline = AuditPipeline()
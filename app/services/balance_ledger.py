@@ -0,0 +1,328 @@
+"""
+Balance Ledger Service
+Keeps per-client running deposit/withdrawal totals in step with the transaction tables
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, ROUND_DOWN
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+QUANTUM = Decimal('0.00000001')
+
+# Statuses in which money has actually moved and counts towards the balance
+SETTLED_PAYMENT_STATUSES = ('APPROVED', 'COMPLETED')
+SETTLED_WITHDRAWAL_STATUSES = ('APPROVED', 'PROCESSING', 'COMPLETED')
+
+
+@dataclass(frozen=True)
+class LedgerTotals:
+    """Gross settled totals for one client"""
+    client_id: int
+    deposit_total: Decimal = ZERO
+    withdrawal_total: Decimal = ZERO
+    deposit_count: int = 0
+    withdrawal_count: int = 0
+
+    def commission(self, deposit_rate, withdrawal_rate) -> Tuple[Decimal, Decimal, Decimal]:
+        """(deposit_commission, withdrawal_commission, total_commission) at the given rates"""
+        deposit_comm = self.deposit_total * Decimal(str(deposit_rate))
+        withdrawal_comm = self.withdrawal_total * Decimal(str(withdrawal_rate))
+        return deposit_comm, withdrawal_comm, deposit_comm + withdrawal_comm
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _status_name(value) -> Optional[str]:
+    if value is None:
+        return None
+    return getattr(value, 'name', str(value).upper())
+
+
+class BalanceLedgerService:
+    """
+    Incremental client balance ledger.
+
+    Every flush that creates, updates or deletes a Payment or
+    WithdrawalRequest is diffed against the attribute history; the net
+    change per client is applied to client_ledger_balances with a single
+    relative UPDATE on the flushing connection, so it commits or rolls back
+    with the transaction that caused it. A client without a ledger row is
+    seeded from history on first use.
+
+    Bulk Query.update()/delete() calls bypass the ORM and therefore the
+    ledger; run `flask ledger reconcile` after such maintenance.
+    """
+
+    def __init__(self):
+        self._instrumented = False
+
+    def init_app(self, app):
+        self.instrument()
+
+    def instrument(self):
+        """Make the tracked attributes keep their previous value on assignment"""
+        if self._instrumented:
+            return
+        from app.models.payment import Payment
+        from app.models.withdrawal import WithdrawalRequest
+
+        # Without active history, assigning an expired attribute loses the old
+        # value and a status transition could not be diffed
+        for attribute in (Payment._status, Payment.amount, Payment.client_id,
+                          WithdrawalRequest.status, WithdrawalRequest.amount, WithdrawalRequest.client_id):
+            event.listen(attribute, 'set', _keep_history, active_history=True)
+        self._instrumented = True
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_totals(self, client_id: int) -> LedgerTotals:
+        """Settled totals for a client via a primary-key lookup"""
+        from app.extensions import db
+        from app.models.client_ledger import ClientLedgerBalance
+
+        table = ClientLedgerBalance.__table__
+        row = db.session.execute(
+            select(table.c.deposit_total, table.c.withdrawal_total,
+                   table.c.deposit_count, table.c.withdrawal_count)
+            .where(table.c.client_id == client_id)
+        ).first()
+        if row is not None:
+            return LedgerTotals(client_id, _to_decimal(row[0]), _to_decimal(row[1]), row[2] or 0, row[3] or 0)
+
+        # Not seeded yet: compute once from history and persist on a separate connection
+        totals = _history_totals(db.session.connection(), [client_id]).get(client_id, LedgerTotals(client_id))
+        try:
+            with db.engine.begin() as conn:
+                _insert_ignore(conn, table, _row_values(totals))
+        except Exception as e:
+            logger.warning(f"Failed to seed balance ledger for client {client_id}: {e}")
+        return totals
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def apply_flush(self, session):
+        """Fold the Payment/WithdrawalRequest changes of a flush into the ledger"""
+        from app.models.payment import Payment
+        from app.models.withdrawal import WithdrawalRequest
+
+        deltas: Dict[int, List] = defaultdict(lambda: [ZERO, ZERO, 0, 0])
+        # after_flush still sees the pre-flush new/dirty/deleted sets and history
+        changes = [(obj, 'new') for obj in session.new] + \
+                  [(obj, 'dirty') for obj in session.dirty] + \
+                  [(obj, 'deleted') for obj in session.deleted]
+
+        for obj, kind in changes:
+            if isinstance(obj, Payment):
+                self._diff(obj, '_status', SETTLED_PAYMENT_STATUSES, 0, kind, deltas)
+            elif isinstance(obj, WithdrawalRequest):
+                self._diff(obj, 'status', SETTLED_WITHDRAWAL_STATUSES, 1, kind, deltas)
+
+        deltas = {cid: d for cid, d in deltas.items() if cid is not None and any(d)}
+        if not deltas:
+            return
+
+        from app.models.client_ledger import ClientLedgerBalance
+        table = ClientLedgerBalance.__table__
+        conn = session.connection()
+        now = datetime.utcnow()
+        # Sorted so concurrent transactions lock ledger rows in the same order
+        for client_id, delta in sorted(deltas.items()):
+            if _apply_delta(conn, table, client_id, delta, now):
+                continue
+            # First movement for this client: history already includes this flush
+            totals = _history_totals(conn, [client_id]).get(client_id, LedgerTotals(client_id))
+            if not _insert_ignore(conn, table, _row_values(totals)):
+                # Seeded concurrently by a transaction that cannot see ours; add our delta
+                _apply_delta(conn, table, client_id, delta, now)
+
+    @staticmethod
+    def _diff(obj, status_attr: str, settled: Tuple[str, ...], slot: int, kind: str, deltas):
+        state = inspect(obj)
+        if kind == 'new':
+            before = None
+        else:
+            before = tuple(_previous(state, name) for name in ('client_id', status_attr, 'amount'))
+        after = None if kind == 'deleted' else (obj.client_id, getattr(obj, status_attr), obj.amount)
+
+        if before == after:
+            return
+        for sign, snapshot in ((-1, before), (1, after)):
+            if snapshot is None or _status_name(snapshot[1]) not in settled:
+                continue
+            entry = deltas[snapshot[0]]
+            entry[slot] += sign * _to_decimal(snapshot[2])
+            entry[slot + 2] += sign
+
+    # ------------------------------------------------------------------
+    # Reconciliation
+    # ------------------------------------------------------------------
+
+    def reconcile(self, client_id: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """
+        Rebuild ledger rows from payment/withdrawal history
+
+        Returns:
+            One dict per client whose stored totals differed from history
+        """
+        from app.extensions import db
+        from app.models.client_ledger import ClientLedgerBalance
+
+        table = ClientLedgerBalance.__table__
+        client_ids = [client_id] if client_id is not None else None
+        expected = _history_totals(db.session.connection(), client_ids)
+
+        query = select(table.c.client_id, table.c.deposit_total, table.c.withdrawal_total,
+                       table.c.deposit_count, table.c.withdrawal_count)
+        if client_id is not None:
+            query = query.where(table.c.client_id == client_id)
+        stored = {
+            row[0]: LedgerTotals(row[0], _to_decimal(row[1]), _to_decimal(row[2]), row[3] or 0, row[4] or 0)
+            for row in db.session.execute(query)
+        }
+
+        drift = []
+        now = datetime.utcnow()
+        for cid in sorted(set(expected) | set(stored)):
+            want = expected.get(cid, LedgerTotals(cid))
+            have = stored.get(cid)
+            if have is not None and _same(have, want):
+                continue
+            drift.append({
+                'client_id': cid,
+                'stored': None if have is None else _row_values(have),
+                'expected': _row_values(want),
+            })
+            if dry_run:
+                continue
+            values = dict(_row_values(want), updated_at=now, reconciled_at=now)
+            if have is None:
+                db.session.execute(table.insert().values(**values))
+            else:
+                db.session.execute(table.update().where(table.c.client_id == cid).values(**values))
+
+        if not dry_run:
+            touched = table.update().values(reconciled_at=now)
+            if client_id is not None:
+                touched = touched.where(table.c.client_id == client_id)
+            db.session.execute(touched)
+            db.session.commit()
+        return drift
+
+
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+
+def _previous(state, name):
+    """Value an attribute had when it was loaded, before this flush's changes"""
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.attrs[name].value
+
+
+def _apply_delta(conn, table, client_id: int, delta, now: datetime) -> bool:
+    """Relative UPDATE of one ledger row; False if the row does not exist"""
+    deposit_delta, withdrawal_delta, deposit_count, withdrawal_count = delta
+    result = conn.execute(
+        table.update()
+        .where(table.c.client_id == client_id)
+        .values(deposit_total=table.c.deposit_total + deposit_delta,
+                withdrawal_total=table.c.withdrawal_total + withdrawal_delta,
+                deposit_count=table.c.deposit_count + deposit_count,
+                withdrawal_count=table.c.withdrawal_count + withdrawal_count,
+                updated_at=now)
+    )
+    return bool(result.rowcount)
+
+
+def _history_totals(conn, client_ids: Optional[Iterable[int]] = None) -> Dict[int, LedgerTotals]:
+    """Set-based settled totals per client, straight from the transaction tables"""
+    from app.models.enums import PaymentStatus
+    from app.models.payment import Payment
+    from app.models.withdrawal import WithdrawalRequest, WithdrawalStatus
+
+    payments = Payment.__table__
+    withdrawals = WithdrawalRequest.__table__
+    sources = (
+        (payments, [PaymentStatus[name] for name in SETTLED_PAYMENT_STATUSES]),
+        (withdrawals, [WithdrawalStatus[name] for name in SETTLED_WITHDRAWAL_STATUSES]),
+    )
+
+    sums: Dict[int, List] = defaultdict(lambda: [ZERO, ZERO, 0, 0])
+    for slot, (table, statuses) in enumerate(sources):
+        query = (
+            select(table.c.client_id, func.coalesce(func.sum(table.c.amount), 0), func.count(table.c.id))
+            .where(table.c.status.in_(statuses))
+            .group_by(table.c.client_id)
+        )
+        if client_ids is not None:
+            query = query.where(table.c.client_id.in_(list(client_ids)))
+        for cid, total, count in conn.execute(query):
+            sums[cid][slot] = _to_decimal(total)
+            sums[cid][slot + 2] = count
+
+    return {cid: LedgerTotals(cid, *values) for cid, values in sums.items()}
+
+
+def _row_values(totals: LedgerTotals) -> Dict:
+    return {
+        'client_id': totals.client_id,
+        'deposit_total': totals.deposit_total.quantize(QUANTUM, rounding=ROUND_DOWN),
+        'withdrawal_total': totals.withdrawal_total.quantize(QUANTUM, rounding=ROUND_DOWN),
+        'deposit_count': totals.deposit_count,
+        'withdrawal_count': totals.withdrawal_count,
+    }
+
+
+def _same(a: LedgerTotals, b: LedgerTotals) -> bool:
+    return _row_values(a) == _row_values(b)
+
+
+def _insert_ignore(conn, table, values: Dict) -> bool:
+    """INSERT that yields to an existing row; returns True if a row was written"""
+    values = dict(values, updated_at=datetime.utcnow())
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**values).on_conflict_do_nothing(index_elements=['client_id'])
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(**values).on_conflict_do_nothing(index_elements=['client_id'])
+    elif dialect == 'mysql':
+        stmt = table.insert().values(**values).prefix_with('IGNORE')
+    else:
+        if conn.execute(select(table.c.client_id).where(table.c.client_id == values['client_id'])).first():
+            return False
+        stmt = table.insert().values(**values)
+    return bool(conn.execute(stmt).rowcount)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_balance_ledger(session, flush_context):
+    if not balance_ledger._instrumented:
+        return
+    balance_ledger.apply_flush(session)
+
+
+# Global balance ledger service
+balance_ledger = BalanceLedgerService()
@@ -0,0 +1,265 @@
+"""
+Coin Catalog
+Immutable, versioned snapshot of coin metadata and per-package allowed coins
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# Session.info flag: a committed transaction changed coin metadata
+PENDING_RELOAD_KEY = 'coin_catalog_reload'
+
+# Limit applied to package slugs missing from PACKAGE_COIN_LIMITS
+DEFAULT_PACKAGE_SLUG = 'starter_flat_rate'
+DEFAULT_COIN_LIMIT = 15
+
+
+@dataclass(frozen=True)
+class CoinInfo:
+    """Read-only view of a coin_metadata row"""
+    id: Optional[int]
+    symbol: str
+    name: str
+    is_active: bool = True
+    decimals: int = 8
+    min_confirmations: int = 6
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'symbol': self.symbol,
+            'name': self.name,
+            'is_active': self.is_active,
+            'decimals': self.decimals,
+            'min_confirmations': self.min_confirmations,
+        }
+
+
+@dataclass(frozen=True)
+class CoinSnapshot:
+    """
+    One consistent view of the catalog.
+
+    package_symbols holds each package's COIN_LIST slice (what the plan
+    allows); package_coins narrows it to coins that are active in the
+    coins table, in COIN_LIST order. The None entry of each mapping is
+    used for package slugs missing from PACKAGE_COIN_LIMITS.
+    """
+    version: Optional[str]
+    coins: Mapping[str, CoinInfo]
+    package_symbols: Mapping[str, Tuple[str, ...]]
+    package_sets: Mapping[str, FrozenSet[str]]
+    package_active_sets: Mapping[str, FrozenSet[str]]
+    package_coins: Mapping[str, Tuple[CoinInfo, ...]]
+    from_database: bool = True
+
+    def get(self, symbol: str) -> Optional[CoinInfo]:
+        return self.coins.get(symbol.upper()) if symbol else None
+
+    def symbols_for(self, package_slug: str) -> Tuple[str, ...]:
+        return self.package_symbols[self._package_key(package_slug)]
+
+    def coins_for(self, package_slug: str) -> Tuple[CoinInfo, ...]:
+        return self.package_coins[self._package_key(package_slug)]
+
+    def is_allowed(self, package_slug: str, symbol: str, active_only: bool = False) -> bool:
+        if not package_slug or not symbol:
+            return False
+        sets = self.package_active_sets if active_only else self.package_sets
+        return symbol.upper() in sets[self._package_key(package_slug)]
+
+    def _package_key(self, package_slug: str) -> Optional[str]:
+        return package_slug if package_slug in self.package_symbols else None
+
+
+class CoinCatalog:
+    """
+    Process-wide coin catalog served from an immutable snapshot.
+
+    The snapshot is built from the coins table plus COIN_LIST and
+    PACKAGE_COIN_LIMITS in one query, and replaced wholesale (a single
+    reference swap) on reload, so readers never see a half-built catalog
+    and never lock. Coin writes bump a version stamp in the shared cache
+    after commit; each process checks the stamp at most every
+    check_interval seconds and rebuilds when it changed. Symbol lookups and
+    allowed-coin checks therefore never touch the database.
+    """
+
+    VERSION_KEY = 'coin_catalog:version'
+
+    def __init__(self, check_interval: float = 10.0):
+        self.check_interval = check_interval
+        self.app = None
+        self.coin_list: Tuple[str, ...] = ()
+        self.package_limits: Dict[str, int] = {}
+        self._snapshot: Optional[CoinSnapshot] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.check_interval = app.config.get('COIN_CATALOG_CHECK_INTERVAL', self.check_interval)
+        self.coin_list = tuple(symbol.upper() for symbol in app.config.get('COIN_LIST', []))
+        self.package_limits = dict(app.config.get('PACKAGE_COIN_LIMITS', {}))
+        with self._lock:
+            self._snapshot = None
+            self._next_check = 0.0
+
+    @property
+    def snapshot(self) -> CoinSnapshot:
+        """Current snapshot, rebuilt first if the shared version changed"""
+        if self._snapshot is None or time.monotonic() >= self._next_check:
+            self._refresh_if_stale()
+        return self._snapshot
+
+    def get_by_symbol(self, symbol: str) -> Optional[CoinInfo]:
+        return self.snapshot.get(symbol)
+
+    def allowed_symbols(self, package_slug: str) -> Tuple[str, ...]:
+        """COIN_LIST slice the package allows"""
+        if not package_slug:
+            return ()
+        return self.snapshot.symbols_for(package_slug)
+
+    def allowed_coins(self, package_slug: str) -> Tuple[CoinInfo, ...]:
+        """Active coins the package allows, in COIN_LIST order"""
+        if not package_slug:
+            return ()
+        return self.snapshot.coins_for(package_slug)
+
+    def is_allowed(self, package_slug: str, symbol: str, active_only: bool = False) -> bool:
+        """Whether the package allows symbol (active_only: and the coin is active)"""
+        return self.snapshot.is_allowed(package_slug, symbol, active_only)
+
+    def reload(self):
+        """Rebuild this process's snapshot now and tell other processes to do the same"""
+        version = uuid.uuid4().hex
+        try:
+            cache.set(self.VERSION_KEY, version, timeout=0)
+        except Exception as e:
+            logger.warning(f"Failed to publish coin catalog version: {e}")
+        snapshot = self._build(version)
+        with self._lock:
+            self._snapshot = snapshot
+            self._next_check = time.monotonic() + self.check_interval
+
+    def reload_after_commit(self, session=None):
+        """Reload once the surrounding transaction commits"""
+        from app.extensions import db
+
+        session = session or db.session()
+        session.info[PENDING_RELOAD_KEY] = True
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                version = cache.get(self.VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Failed to read coin catalog version: {e}")
+                version = self._snapshot.version if self._snapshot else None
+            if (self._snapshot is not None and self._snapshot.from_database
+                    and version == self._snapshot.version):
+                return
+            self._snapshot = self._build(version, previous=self._snapshot)
+
+    def _build(self, version: Optional[str], previous: Optional[CoinSnapshot] = None) -> CoinSnapshot:
+        try:
+            rows = self._load_rows()
+        except Exception as e:
+            if previous is not None:
+                # Keep serving the previous snapshot; retry at the next check
+                logger.error(f"Failed to reload coin catalog: {e}")
+                return previous
+            logger.error(f"Failed to load coin catalog, using COIN_LIST only: {e}")
+            rows = None
+
+        coins: Dict[str, CoinInfo] = {}
+        if rows is None:
+            display_names = self.app.config.get('COIN_DISPLAY_NAMES', {}) if self.app else {}
+            for symbol in self.coin_list:
+                coins[symbol] = CoinInfo(id=None, symbol=symbol, name=display_names.get(symbol, symbol))
+        else:
+            for row in rows:
+                coin = CoinInfo(
+                    id=row.id,
+                    symbol=row.symbol.upper(),
+                    name=row.name,
+                    is_active=bool(row.is_active),
+                    decimals=row.decimals,
+                    min_confirmations=row.min_confirmations,
+                )
+                coins[coin.symbol] = coin
+
+        def package_view(limit: int):
+            symbols = self.coin_list[:min(limit, len(self.coin_list))]
+            active = tuple(coins[s] for s in symbols if s in coins and coins[s].is_active)
+            return symbols, active
+
+        package_symbols, package_sets, package_active_sets, package_coins = {}, {}, {}, {}
+        limits = dict(self.package_limits)
+        limits[None] = self.package_limits.get(DEFAULT_PACKAGE_SLUG, DEFAULT_COIN_LIMIT)
+        for slug, limit in limits.items():
+            symbols, active = package_view(limit)
+            package_symbols[slug] = symbols
+            package_sets[slug] = frozenset(symbols)
+            package_active_sets[slug] = frozenset(coin.symbol for coin in active)
+            package_coins[slug] = active
+
+        return CoinSnapshot(
+            version=version,
+            coins=MappingProxyType(coins),
+            package_symbols=MappingProxyType(package_symbols),
+            package_sets=MappingProxyType(package_sets),
+            package_active_sets=MappingProxyType(package_active_sets),
+            package_coins=MappingProxyType(package_coins),
+            from_database=rows is not None,
+        )
+
+    def _load_rows(self):
+        from app.extensions import db
+        from app.models.coin import Coin
+
+        query = select(
+            Coin.id, Coin.symbol, Coin.name, Coin.is_active, Coin.decimals, Coin.min_confirmations
+        )
+
+        def load():
+            # Own connection, so a reload never touches the caller's session
+            with db.engine.connect() as conn:
+                return conn.execute(query).all()
+
+        if has_app_context() or self.app is None:
+            return load()
+        with self.app.app_context():
+            return load()
+
+
+@event.listens_for(Session, 'after_commit')
+def _reload_coin_catalog_after_commit(session):
+    if session.info.pop(PENDING_RELOAD_KEY, None):
+        coin_catalog.reload()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_coin_catalog_reload(session):
+    session.info.pop(PENDING_RELOAD_KEY, None)
+
+
+# Global coin catalog
+coin_catalog = CoinCatalog()
@@ -0,0 +1,192 @@
+"""
+Commission Service
+Set-based commission aggregation for one or many clients
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, insert, select, update
+
+from app.services.balance_ledger import SETTLED_PAYMENT_STATUSES, SETTLED_WITHDRAWAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPOSIT_RATE = Decimal('0.035')
+DEFAULT_WITHDRAWAL_RATE = Decimal('0.015')
+SNAPSHOT_QUANTUM = Decimal('0.01')
+ZERO = Decimal('0')
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+@dataclass(frozen=True)
+class CommissionTotals:
+    """Settled volume and commission for one client over a period"""
+    client_id: int
+    deposit_volume: Decimal = ZERO
+    withdrawal_volume: Decimal = ZERO
+    deposit_commission: Decimal = ZERO
+    withdrawal_commission: Decimal = ZERO
+
+    @property
+    def total_commission(self) -> Decimal:
+        return self.deposit_commission + self.withdrawal_commission
+
+    @property
+    def total_volume(self) -> Decimal:
+        return self.deposit_volume + self.withdrawal_volume
+
+
+class CommissionService:
+    """
+    Commission totals from grouped SQL aggregates.
+
+    One statement covers any number of clients: per-client sums of settled
+    deposits and withdrawals are computed in grouped subqueries and joined
+    onto the clients' commission rates; the multiplication is done in
+    Decimal. Unbounded (lifetime) totals are read from the balance ledger
+    instead of scanning the transaction tables.
+    """
+
+    def aggregate(self, client_ids: Optional[Iterable[int]] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  active_only: bool = False) -> Dict[int, CommissionTotals]:
+        """
+        Commission totals keyed by client id
+
+        Args:
+            client_ids: Restrict to these clients (None for all clients)
+            since: Inclusive lower bound on transaction created_at
+            until: Exclusive upper bound on transaction created_at
+            active_only: Skip inactive clients
+        """
+        from app.extensions import db
+        from app.models.client import Client
+
+        if client_ids is not None:
+            client_ids = list(client_ids)
+            if not client_ids:
+                return {}
+
+        if since is None and until is None:
+            deposits, withdrawals = self._ledger_subqueries()
+        else:
+            deposits, withdrawals = self._history_subqueries(since, until)
+
+        query = (
+            select(Client.id, Client.deposit_commission_rate, Client.withdrawal_commission_rate,
+                   deposits.c.total, withdrawals.c.total)
+            .outerjoin(deposits, deposits.c.client_id == Client.id)
+            .outerjoin(withdrawals, withdrawals.c.client_id == Client.id)
+        )
+        if client_ids is not None:
+            query = query.where(Client.id.in_(client_ids))
+        if active_only:
+            query = query.where(Client.is_active == True)
+
+        results = {}
+        for client_id, deposit_rate, withdrawal_rate, deposit_total, withdrawal_total in db.session.execute(query):
+            deposit_volume = _to_decimal(deposit_total)
+            withdrawal_volume = _to_decimal(withdrawal_total)
+            deposit_rate = _to_decimal(deposit_rate) if deposit_rate is not None else DEFAULT_DEPOSIT_RATE
+            withdrawal_rate = _to_decimal(withdrawal_rate) if withdrawal_rate is not None else DEFAULT_WITHDRAWAL_RATE
+            results[client_id] = CommissionTotals(
+                client_id=client_id,
+                deposit_volume=deposit_volume,
+                withdrawal_volume=withdrawal_volume,
+                deposit_commission=deposit_volume * deposit_rate,
+                withdrawal_commission=withdrawal_volume * withdrawal_rate,
+            )
+        return results
+
+    def for_client(self, client_id: int, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None) -> CommissionTotals:
+        """Commission totals for a single client"""
+        return self.aggregate([client_id], since=since, until=until).get(client_id, CommissionTotals(client_id))
+
+    def write_snapshots(self, period_start: datetime, period_end: datetime,
+                        client_ids: Optional[Iterable[int]] = None, active_only: bool = False) -> int:
+        """
+        Upsert one CommissionSnapshot per client for [period_start, period_end)
+
+        Existing snapshots for the same client and period_start are updated in
+        place, so re-running a period is idempotent. Returns rows written.
+        """
+        from app.extensions import db
+        from app.models.commission_snapshot import CommissionSnapshot
+
+        totals = self.aggregate(client_ids, since=period_start, until=period_end, active_only=active_only)
+        if not totals:
+            return 0
+
+        existing = dict(db.session.execute(
+            select(CommissionSnapshot.client_id, CommissionSnapshot.id)
+            .where(CommissionSnapshot.period_start == period_start,
+                   CommissionSnapshot.client_id.in_(list(totals)))
+        ).all())
+
+        now = datetime.utcnow()
+        inserts, updates = [], []
+        for client_id, entry in totals.items():
+            row = {
+                'period_end': period_end,
+                'deposit_commission': entry.deposit_commission.quantize(SNAPSHOT_QUANTUM, ROUND_HALF_UP),
+                'withdrawal_commission': entry.withdrawal_commission.quantize(SNAPSHOT_QUANTUM, ROUND_HALF_UP),
+                'total_commission': entry.total_commission.quantize(SNAPSHOT_QUANTUM, ROUND_HALF_UP),
+                'updated_at': now,
+            }
+            if client_id in existing:
+                updates.append(dict(row, id=existing[client_id]))
+            else:
+                inserts.append(dict(row, client_id=client_id, period_start=period_start, created_at=now))
+
+        if inserts:
+            db.session.execute(insert(CommissionSnapshot), inserts)
+        if updates:
+            db.session.execute(update(CommissionSnapshot), updates)
+        db.session.commit()
+        return len(inserts) + len(updates)
+
+    @staticmethod
+    def _history_subqueries(since: Optional[datetime], until: Optional[datetime]):
+        from app.models.enums import PaymentStatus
+        from app.models.payment import Payment
+        from app.models.withdrawal import WithdrawalRequest, WithdrawalStatus
+
+        subqueries = []
+        for model, status_column, statuses in (
+            (Payment, Payment._status, [PaymentStatus[name] for name in SETTLED_PAYMENT_STATUSES]),
+            (WithdrawalRequest, WithdrawalRequest.status, [WithdrawalStatus[name] for name in SETTLED_WITHDRAWAL_STATUSES]),
+        ):
+            query = (
+                select(model.client_id.label('client_id'), func.sum(model.amount).label('total'))
+                .where(status_column.in_(statuses))
+                .group_by(model.client_id)
+            )
+            if since is not None:
+                query = query.where(model.created_at >= since)
+            if until is not None:
+                query = query.where(model.created_at < until)
+            subqueries.append(query.subquery())
+        return tuple(subqueries)
+
+    @staticmethod
+    def _ledger_subqueries():
+        from app.models.client_ledger import ClientLedgerBalance
+
+        ledger = ClientLedgerBalance.__table__
+        deposits = select(ledger.c.client_id.label('client_id'), ledger.c.deposit_total.label('total')).subquery()
+        withdrawals = select(ledger.c.client_id.label('client_id'), ledger.c.withdrawal_total.label('total')).subquery()
+        return deposits, withdrawals
+
+
+# Global commission service
+commission_service = CommissionService()
@@ -0,0 +1,408 @@
+"""
+Dashboard Rollup Service
+Maintains per-client daily activity rollups and serves dashboard summaries from them
+"""
+
+import logging
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.extensions import cache
+from app.services.balance_ledger import SETTLED_PAYMENT_STATUSES, SETTLED_WITHDRAWAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+# Session.info set of (day, client_id) rollups a flush made stale, queued once the transaction commits
+PENDING_STALE_KEY = 'dashboard_rollup_stale'
+
+
+@dataclass(frozen=True)
+class DashboardSummary:
+    """Activity figures for one client, as of the last rollup refresh"""
+    client_id: int
+    monthly_transactions: int = 0
+    total_transactions: int = 0
+    volume_30d: Decimal = ZERO
+    monthly_api_calls: int = 0
+    last_api_call_at: Optional[datetime] = None
+    as_of: Optional[datetime] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'monthly_transactions': self.monthly_transactions,
+            'total_transactions': self.total_transactions,
+            'volume_30d': float(self.volume_30d),
+            'monthly_api_calls': self.monthly_api_calls,
+            'last_api_call_at': self.last_api_call_at.isoformat() if self.last_api_call_at else None,
+            'as_of': self.as_of.isoformat() if self.as_of else None,
+        }
+
+
+class DashboardRollupService:
+    """
+    Periodic daily rollups of payments, withdrawals and API calls.
+
+    A scheduled job rebuilds the last lookback_days of client_daily_rollups
+    from range scans on the indexed created_at/timestamp columns, one day
+    at a time, so its cost follows recent activity rather than history.
+    Dashboard reads aggregate the client's rollup rows in one
+    conditional-aggregate query on the (client_id, day) primary key and
+    report the time of the last refresh as their freshness.
+
+    Every worker schedules the job, so a refresh holds a Redis SET NX lock
+    while it rebuilds (concurrent rebuilds of the same days would collide
+    on the primary key), and a scheduled run is skipped when another worker
+    completed one within the last half interval.
+
+    Rows are bucketed by created_at, so a payment settled or a withdrawal
+    rejected after its day left the lookback window would otherwise never
+    be counted. A flush hook queues the (day, client_id) of such changes
+    in a Redis set once their transaction commits (a process-local set
+    without Redis), and each refresh rebuilds the queued days as well.
+    """
+
+    JOB_ID = 'dashboard_rollup_refresh'
+    REFRESHED_AT_KEY = 'dashboard_rollup:refreshed_at'
+    LOCK_KEY = 'dashboard_rollup:lock'
+    STALE_KEY = 'dashboard_rollup:stale_days'
+    STALE_BATCH = 500
+
+    def __init__(self, refresh_interval: int = 300, lookback_days: int = 2, redis_conn=None):
+        self.refresh_interval = refresh_interval
+        self.lookback_days = lookback_days
+        self.redis = redis_conn
+        self.enabled = True
+
+        self._stale: Set[Tuple[date, int]] = set()
+        self._stale_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read configuration and schedule the periodic refresh"""
+        self.refresh_interval = app.config.get('DASHBOARD_ROLLUP_INTERVAL', self.refresh_interval)
+        self.lookback_days = app.config.get('DASHBOARD_ROLLUP_LOOKBACK_DAYS', self.lookback_days)
+        self.enabled = app.config.get('DASHBOARD_ROLLUP_ENABLED', self.enabled)
+        if self.redis is None:
+            self.redis = _redis_connection()
+
+        if not self.enabled:
+            app.logger.info("Dashboard rollup job disabled")
+            return
+
+        def _refresh_job():
+            with app.app_context():
+                try:
+                    last = self.refreshed_at()
+                    if last and datetime.utcnow() - last < timedelta(seconds=self.refresh_interval / 2):
+                        return  # Another worker just refreshed
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Dashboard rollup refresh failed: {e}", exc_info=True)
+
+        try:
+            from app.extensions import scheduler
+            scheduler.add_job(
+                id=self.JOB_ID,
+                func=_refresh_job,
+                trigger='interval',
+                seconds=self.refresh_interval,
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+            )
+            app.logger.info(f"Dashboard rollup scheduled every {self.refresh_interval}s")
+        except Exception as e:
+            app.logger.error(f"Failed to schedule dashboard rollup: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def summary(self, client_id: int, now: Optional[datetime] = None) -> DashboardSummary:
+        """Monthly, 30-day and lifetime figures for a client in one query"""
+        from app.extensions import db
+        from app.models.client_rollup import ClientDailyRollup as R
+
+        today = (now or datetime.utcnow()).date()
+        month_start = today.replace(day=1)
+        window_start = today - timedelta(days=29)
+
+        row = db.session.execute(
+            select(
+                func.coalesce(func.sum(case((R.day >= month_start, R.payment_count), else_=0)), 0),
+                func.coalesce(func.sum(R.payment_count), 0),
+                func.coalesce(func.sum(case((R.day >= window_start, R.deposit_volume), else_=0)), 0),
+                func.coalesce(func.sum(case((R.day >= month_start, R.api_call_count), else_=0)), 0),
+                func.max(R.last_api_call_at),
+                func.max(R.updated_at),
+            ).where(R.client_id == client_id)
+        ).first()
+
+        as_of = self.refreshed_at() or (row[5] if row else None)
+        if row is None:
+            return DashboardSummary(client_id, as_of=as_of)
+        return DashboardSummary(
+            client_id=client_id,
+            monthly_transactions=int(row[0] or 0),
+            total_transactions=int(row[1] or 0),
+            volume_30d=row[2] if isinstance(row[2], Decimal) else Decimal(str(row[2] or 0)),
+            monthly_api_calls=int(row[3] or 0),
+            last_api_call_at=row[4],
+            as_of=as_of,
+        )
+
+    def refreshed_at(self) -> Optional[datetime]:
+        """When the rollup job last completed, if known"""
+        try:
+            value = cache.get(self.REFRESHED_AT_KEY)
+        except Exception:
+            return None
+        return datetime.fromisoformat(value) if value else None
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def refresh(self, days: Optional[int] = None, client_id: Optional[int] = None,
+                end: Optional[date] = None) -> int:
+        """
+        Rebuild rollup rows for the last `days` days (default lookback_days)
+
+        Skipped (returning 0) while another worker holds the refresh lock.
+
+        Returns:
+            Number of rollup rows written
+        """
+        token = self._acquire()
+        if token is None:
+            logger.info("Dashboard rollup refresh already running elsewhere; skipped")
+            return 0
+
+        try:
+            end = end or datetime.utcnow().date()
+            days = days or self.lookback_days
+            written = 0
+            for offset in range(days - 1, -1, -1):
+                written += self._rebuild_day(end - timedelta(days=offset), client_id)
+
+            if client_id is None and end == datetime.utcnow().date():
+                written += self._rebuild_stale()
+                try:
+                    cache.set(self.REFRESHED_AT_KEY, datetime.utcnow().isoformat(), timeout=0)
+                except Exception as e:
+                    logger.warning(f"Failed to record dashboard rollup refresh time: {e}")
+            return written
+        finally:
+            self._release(token)
+
+    def mark_stale(self, entries: Iterable[Tuple[date, int]]):
+        """Queue (day, client_id) rollups for the next refresh to rebuild"""
+        entries = set(entries)
+        if not entries:
+            return
+        if self.redis is not None:
+            try:
+                self.redis.sadd(self.STALE_KEY, *(f"{day.isoformat()}:{cid}" for day, cid in entries))
+                return
+            except Exception as e:
+                logger.warning(f"Failed to queue stale rollup days in Redis, keeping them locally: {e}")
+        with self._stale_lock:
+            self._stale.update(entries)
+
+    def collect_flush(self, session):
+        """Remember rollup days outside the lookback window that this flush changed"""
+        from app.models.payment import Payment
+        from app.models.withdrawal import WithdrawalRequest
+
+        # Columns that feed a rollup row
+        tracked = {
+            Payment: ('_status', 'amount', 'client_id'),
+            WithdrawalRequest: ('status', 'amount', 'client_id'),
+        }
+        cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=self.lookback_days - 1),
+                                  dt_time.min)
+        changed = [(obj, False) for obj in session.new] + [(obj, True) for obj in session.dirty] \
+            + [(obj, False) for obj in session.deleted]
+        for obj, check_history in changed:
+            attributes = tracked.get(type(obj))
+            if attributes is None:
+                continue
+            created = obj.created_at
+            if created is None or created >= cutoff:
+                continue  # The next refresh rebuilds this day anyway
+            state = inspect(obj)
+            if check_history and not any(state.attrs[name].history.has_changes() for name in attributes):
+                continue
+            client_ids = {obj.client_id, *state.attrs['client_id'].history.deleted}
+            stale = session.info.setdefault(PENDING_STALE_KEY, set())
+            stale.update((created.date(), cid) for cid in client_ids if cid is not None)
+
+    def _drain_stale(self) -> List[Tuple[date, int]]:
+        entries: Set[Tuple[date, int]] = set()
+        if self.redis is not None:
+            try:
+                for member in self.redis.spop(self.STALE_KEY, self.STALE_BATCH) or ():
+                    if isinstance(member, bytes):
+                        member = member.decode('utf-8')
+                    day, cid = member.rsplit(':', 1)
+                    entries.add((date.fromisoformat(day), int(cid)))
+            except Exception as e:
+                logger.warning(f"Failed to read stale rollup days from Redis: {e}")
+        with self._stale_lock:
+            while self._stale and len(entries) < self.STALE_BATCH:
+                entries.add(self._stale.pop())
+        return sorted(entries)
+
+    def _rebuild_stale(self) -> int:
+        """Rebuild queued days; ones that fail are queued again for the next run"""
+        written = 0
+        entries = self._drain_stale()
+        for index, (day, cid) in enumerate(entries):
+            try:
+                written += self._rebuild_day(day, cid)
+            except Exception:
+                self.mark_stale(entries[index:])
+                raise
+        if entries:
+            logger.info(f"Dashboard rollup rebuilt {len(entries)} late-changed client day(s)")
+        return written
+
+    def _acquire(self) -> Optional[str]:
+        """Refresh lock token, or None if another worker is refreshing"""
+        token = uuid.uuid4().hex
+        if self.redis is None:
+            return token
+        try:
+            ttl = max(int(self.refresh_interval), 60)
+            return token if self.redis.set(self.LOCK_KEY, token, nx=True, ex=ttl) else None
+        except Exception as e:
+            logger.warning(f"Dashboard rollup lock unavailable, refreshing anyway: {e}")
+            return token
+
+    def _release(self, token: str):
+        if self.redis is None:
+            return
+        try:
+            from app.extensions.single_flight import RELEASE_SCRIPT
+            self.redis.eval(RELEASE_SCRIPT, 1, self.LOCK_KEY, token)
+        except Exception as e:
+            logger.warning(f"Failed to release dashboard rollup lock: {e}")
+
+    def _rebuild_day(self, day: date, client_id: Optional[int]) -> int:
+        from app.extensions import db
+        from app.models.client_rollup import ClientDailyRollup
+
+        rows = self._aggregate_day(day, client_id)
+        now = datetime.utcnow()
+        for row in rows.values():
+            row['updated_at'] = now
+
+        try:
+            stmt = delete(ClientDailyRollup).where(ClientDailyRollup.day == day)
+            if client_id is not None:
+                stmt = stmt.where(ClientDailyRollup.client_id == client_id)
+            db.session.execute(stmt)
+            if rows:
+                db.session.execute(insert(ClientDailyRollup), list(rows.values()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(rows)
+
+    @staticmethod
+    def _aggregate_day(day: date, client_id: Optional[int]) -> Dict[int, Dict]:
+        """Grouped per-client counters for [day, day + 1) from the source tables"""
+        from app.extensions import db
+        from app.models.api_usage import ApiUsage
+        from app.models.enums import PaymentStatus
+        from app.models.payment import Payment
+        from app.models.withdrawal import WithdrawalRequest, WithdrawalStatus
+
+        start = datetime.combine(day, dt_time.min)
+        stop = start + timedelta(days=1)
+        rows: Dict[int, Dict] = {}
+
+        def row_for(cid):
+            return rows.setdefault(cid, {
+                'client_id': cid, 'day': day,
+                'payment_count': 0, 'deposit_volume': ZERO,
+                'withdrawal_count': 0, 'withdrawal_volume': ZERO,
+                'api_call_count': 0, 'last_api_call_at': None,
+            })
+
+        settled_payments = [PaymentStatus[name] for name in SETTLED_PAYMENT_STATUSES]
+        settled_withdrawals = [WithdrawalStatus[name] for name in SETTLED_WITHDRAWAL_STATUSES]
+        sources = (
+            (Payment, Payment.created_at, Payment._status, settled_payments, 'payment_count', 'deposit_volume'),
+            (WithdrawalRequest, WithdrawalRequest.created_at, WithdrawalRequest.status, settled_withdrawals,
+             'withdrawal_count', 'withdrawal_volume'),
+        )
+        for model, created, status, settled, count_field, volume_field in sources:
+            query = (
+                select(model.client_id, func.count(model.id),
+                       func.coalesce(func.sum(case((status.in_(settled), model.amount), else_=0)), 0))
+                .where(created >= start, created < stop)
+                .group_by(model.client_id)
+            )
+            if client_id is not None:
+                query = query.where(model.client_id == client_id)
+            for cid, count, volume in db.session.execute(query):
+                row = row_for(cid)
+                row[count_field] = count
+                row[volume_field] = volume if isinstance(volume, Decimal) else Decimal(str(volume or 0))
+
+        query = (
+            select(ApiUsage.client_id, func.count(ApiUsage.id), func.max(ApiUsage.timestamp))
+            .where(ApiUsage.timestamp >= start, ApiUsage.timestamp < stop)
+            .group_by(ApiUsage.client_id)
+        )
+        if client_id is not None:
+            query = query.where(ApiUsage.client_id == client_id)
+        for cid, count, last_call in db.session.execute(query):
+            row = row_for(cid)
+            row['api_call_count'] = count
+            row['last_api_call_at'] = last_call
+
+        return rows
+
+
+def _redis_connection():
+    from app.utils.security import REDIS_AVAILABLE, redis_client
+    return redis_client if REDIS_AVAILABLE else None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stale_rollups(session, flush_context):
+    if not dashboard_rollup.enabled:
+        return
+    dashboard_rollup.collect_flush(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _queue_stale_rollups(session):
+    stale = session.info.pop(PENDING_STALE_KEY, None)
+    if not stale:
+        return
+    try:
+        dashboard_rollup.mark_stale(stale)
+    except Exception as e:
+        logger.error(f"Failed to queue stale rollup days: {e}", exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stale_rollups(session):
+    session.info.pop(PENDING_STALE_KEY, None)
+
+
+# Global dashboard rollup service
+dashboard_rollup = DashboardRollupService()
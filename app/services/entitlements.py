@@ -0,0 +1,259 @@
+"""
+Feature Entitlements
+Package feature lists and per-client overrides compiled into frozensets for O(1) gates
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# Session.info flag: a committed transaction changed package_features rows
+PENDING_INVALIDATION_KEY = 'entitlements_invalidate'
+
+EMPTY_OVERRIDE: Tuple[Tuple[str, ...], Tuple[str, ...]] = ((), ())
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    """
+    Compiled feature set of one package (optionally with a client override).
+
+    keys holds the raw entries ('api_basic', 'max_coins:15'); features holds
+    their base names, so parameterized entries also answer has('max_coins');
+    values maps each parameterized base name to its value.
+    """
+    keys: FrozenSet[str]
+    features: FrozenSet[str]
+    values: Mapping[str, str]
+
+    def has(self, feature_name: str) -> bool:
+        return feature_name in self.features or feature_name in self.keys
+
+    def value(self, feature_name: str, default=None):
+        return self.values.get(feature_name, default)
+
+    def with_override(self, override: Tuple[Tuple[str, ...], Tuple[str, ...]]) -> 'Entitlements':
+        add, remove = override
+        if not add and not remove:
+            return self
+        return compile_features((self.keys | set(add)) - set(remove))
+
+
+def compile_features(keys: Iterable[str]) -> Entitlements:
+    """Intern and index a list of feature entries"""
+    raw = frozenset(sys.intern(key) for key in keys if key)
+    features = set()
+    values = {}
+    for key in raw:
+        base, sep, value = key.partition(':')
+        base = sys.intern(base)
+        features.add(base)
+        if sep:
+            values.setdefault(base, value)
+    return Entitlements(keys=raw, features=frozenset(features), values=MappingProxyType(values))
+
+
+EMPTY = compile_features(())
+
+
+def normalize_override(raw) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Hashable (add, remove) form of Client.features_override
+
+    Accepts the list of extra feature keys written by the admin screens,
+    an {"add": [...], "remove": [...]} dict, or either as a JSON string.
+    Anything else counts as no override.
+    """
+    if not raw:
+        return EMPTY_OVERRIDE
+    try:
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        if isinstance(raw, dict):
+            return (tuple(sorted(raw.get('add') or ())), tuple(sorted(raw.get('remove') or ())))
+        if isinstance(raw, (list, tuple, set, frozenset)):
+            return (tuple(sorted(str(key) for key in raw)), ())
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        pass  # Ignore invalid override data
+    return EMPTY_OVERRIDE
+
+
+class EntitlementResolver:
+    """
+    Process-wide cache of compiled feature entitlements.
+
+    Static feature tables (the PACKAGE_FEATURES dicts) are compiled once per
+    table into Entitlements per slug; a client's effective set is the
+    package's entry with its features_override applied, memoized by
+    (table, slug, override). Database package assignments (package_features
+    joined to features) are loaded for all packages in one query and kept
+    as a package id -> frozenset map. PackageService and PackageFeature
+    writes invalidate it by bumping a version stamp in the shared cache,
+    which other processes compare at most every check_interval seconds.
+    Feature gates therefore cost a few dict and set lookups and no I/O.
+    """
+
+    VERSION_KEY = 'entitlements:version'
+
+    def __init__(self, check_interval: float = 10.0, max_resolved: int = 10000):
+        self.check_interval = check_interval
+        self.max_resolved = max_resolved
+        self.app = None
+        self._tables: Dict[int, Tuple[Mapping, Dict[str, Entitlements]]] = {}
+        self._resolved: Dict[Tuple, Entitlements] = {}
+        self._packages: Optional[Dict[int, FrozenSet[str]]] = None
+        self._version: Optional[str] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.check_interval = app.config.get('ENTITLEMENTS_CHECK_INTERVAL', self.check_interval)
+
+    def for_slug(self, package_slug: Optional[str], table: Optional[Mapping] = None) -> Entitlements:
+        """Compiled entitlements of a package slug in a PACKAGE_FEATURES-style table"""
+        if not package_slug:
+            return EMPTY
+        return self._compiled(table).get(package_slug, EMPTY)
+
+    def resolve(self, package_slug: Optional[str], override=None, table: Optional[Mapping] = None) -> Entitlements:
+        """Package entitlements with a features_override applied"""
+        override_key = normalize_override(override)
+        if override_key == EMPTY_OVERRIDE:
+            return self.for_slug(package_slug, table)
+
+        table = self._table(table)
+        key = (id(table), package_slug, override_key)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = self.for_slug(package_slug, table).with_override(override_key)
+            with self._lock:
+                if len(self._resolved) >= self.max_resolved:
+                    self._resolved.clear()
+                self._resolved[key] = resolved
+        return resolved
+
+    def for_client(self, client) -> Entitlements:
+        """Effective entitlements of a client: its package plus features_override"""
+        package = getattr(client, 'package', None)
+        if not package:
+            return EMPTY
+        return self.resolve(package.slug, getattr(client, 'features_override', None))
+
+    def package_features(self, package_id: int) -> FrozenSet[str]:
+        """Feature keys assigned (is_included) to a package in package_features"""
+        if time.monotonic() >= self._next_check:
+            self._refresh_if_stale()
+        return (self._packages or {}).get(package_id, frozenset())
+
+    def package_has_feature(self, package_id: int, feature_key: str) -> bool:
+        return feature_key in self.package_features(package_id)
+
+    def invalidate(self):
+        """Drop compiled package assignments here and in every other process"""
+        version = uuid.uuid4().hex
+        try:
+            cache.set(self.VERSION_KEY, version, timeout=0)
+        except Exception as e:
+            logger.warning(f"Failed to publish entitlements version: {e}")
+        with self._lock:
+            self._packages = None
+            self._next_check = 0.0
+
+    def invalidate_after_commit(self, session=None):
+        """Invalidate once the surrounding transaction commits"""
+        from app.extensions import db
+
+        session = session or db.session()
+        session.info[PENDING_INVALIDATION_KEY] = True
+
+    def _table(self, table: Optional[Mapping]) -> Mapping:
+        if table is None:
+            from app.config.packages import PACKAGE_FEATURES
+            table = PACKAGE_FEATURES
+        return table
+
+    def _compiled(self, table: Optional[Mapping]) -> Dict[str, Entitlements]:
+        table = self._table(table)
+        entry = self._tables.get(id(table))
+        if entry is None or entry[0] is not table:
+            compiled = {slug: compile_features(keys) for slug, keys in table.items()}
+            with self._lock:
+                self._tables[id(table)] = (table, compiled)
+            return compiled
+        return entry[1]
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                version = cache.get(self.VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Failed to read entitlements version: {e}")
+                version = self._version
+            if self._packages is not None and version == self._version:
+                return
+            try:
+                self._packages = self._load_packages()
+                self._version = version
+            except Exception as e:
+                # Keep serving the previous map (or none); retry at the next check
+                logger.error(f"Failed to load package entitlements: {e}")
+
+    def _load_packages(self) -> Dict[int, FrozenSet[str]]:
+        from app.extensions import db
+        from app.models.client_package import PackageFeature
+        from app.models.feature import Feature
+
+        query = (
+            select(PackageFeature.package_id, Feature.feature_key)
+            .join(Feature, PackageFeature.feature_id == Feature.id)
+            .where(PackageFeature.is_included.is_(True))
+        )
+
+        def load():
+            # Own connection, so a refresh never touches the caller's session
+            with db.engine.connect() as conn:
+                return conn.execute(query).all()
+
+        if has_app_context() or self.app is None:
+            rows = load()
+        else:
+            with self.app.app_context():
+                rows = load()
+
+        packages: Dict[int, set] = {}
+        for package_id, feature_key in rows:
+            packages.setdefault(package_id, set()).add(sys.intern(feature_key))
+        return {package_id: frozenset(keys) for package_id, keys in packages.items()}
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_entitlements_after_commit(session):
+    if session.info.pop(PENDING_INVALIDATION_KEY, None):
+        entitlements.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_entitlements_invalidation(session):
+    session.info.pop(PENDING_INVALIDATION_KEY, None)
+
+
+# Global entitlement resolver
+entitlements = EntitlementResolver()
@@ -0,0 +1,259 @@
+"""
+Fraud Feature Store
+Per-client withdrawal features for fraud scoring, computed in one aggregate query
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Windows counted for withdrawal frequency, newest first
+FREQUENCY_WINDOWS = {
+    'last_hour': timedelta(hours=1),
+    'last_24h': timedelta(hours=24),
+    'last_week': timedelta(days=7),
+    'last_month': timedelta(days=30),
+}
+PATTERN_WINDOW = timedelta(days=30)
+SUCCESSION_WINDOW = timedelta(minutes=30)
+
+
+@dataclass(frozen=True)
+class WithdrawalFeatures:
+    """Aggregates of a client's other withdrawals, as seen when one withdrawal is scored"""
+    client_id: int
+    withdrawal_id: Optional[int]
+    window_counts: Dict[str, int] = field(default_factory=dict)
+    history_count: int = 0
+    history_sum: float = 0.0
+    history_max: Optional[float] = None
+    history_m2: float = 0.0
+    recent_count: int = 0
+    recent: Tuple[Tuple[float, datetime], ...] = ()
+    last_recent_at: Optional[datetime] = None
+    computed_at: Optional[datetime] = None
+
+    @property
+    def history_mean(self) -> Optional[float]:
+        return self.history_sum / self.history_count if self.history_count else None
+
+    @property
+    def history_variance(self) -> Optional[float]:
+        """Sample variance of historical amounts (M2 / (n - 1))"""
+        if self.history_count < 2:
+            return None
+        return self.history_m2 / (self.history_count - 1)
+
+    @property
+    def history_stddev(self) -> Optional[float]:
+        variance = self.history_variance
+        return math.sqrt(variance) if variance is not None else None
+
+
+@dataclass(frozen=True)
+class ClientWithdrawalAggregates:
+    """
+    Aggregates over all of one client's withdrawals, cached per client.
+
+    The two largest history amounts and the newest rows of the pattern
+    window keep their ids, so the withdrawal being scored can be taken back
+    out in Python (without()) instead of by a query per withdrawal.
+    """
+    client_id: int
+    window_counts: Dict[str, int] = field(default_factory=dict)
+    history_count: int = 0
+    history_sum: float = 0.0
+    history_sumsq: float = 0.0
+    history_top: Tuple[Tuple[int, float], ...] = ()  # (id, amount), largest first
+    recent_count: int = 0
+    recent: Tuple[Tuple[int, float, datetime], ...] = ()  # (id, amount, created_at), newest first
+    computed_at: Optional[datetime] = None
+
+    def without(self, withdrawal, sample_limit: int) -> WithdrawalFeatures:
+        """Features of `withdrawal` against the client's other withdrawals"""
+        from app.models.withdrawal import WithdrawalStatus
+
+        withdrawal_id = withdrawal.id
+        history_count, history_sum, history_sumsq = self.history_count, self.history_sum, self.history_sumsq
+        # An unsaved withdrawal is not in the aggregates; a rejected one is not in the history
+        if withdrawal_id is not None and withdrawal.status not in (None, WithdrawalStatus.REJECTED) \
+                and history_count:
+            amount = float(withdrawal.amount or 0)
+            history_count -= 1
+            history_sum -= amount
+            history_sumsq -= amount * amount
+
+        top = [amount for row_id, amount in self.history_top if row_id != withdrawal_id]
+        history_m2 = 0.0
+        if history_count:
+            history_m2 = max(history_sumsq - history_sum * history_sum / history_count, 0.0)
+        else:
+            history_sum = 0.0
+
+        others = tuple((amount, created_at) for row_id, amount, created_at in self.recent
+                       if row_id != withdrawal_id)
+        recent_count = self.recent_count - (len(self.recent) - len(others))
+        last_recent_at = None
+        if others and others[0][1] >= self.computed_at - SUCCESSION_WINDOW:
+            last_recent_at = others[0][1]
+
+        return WithdrawalFeatures(
+            client_id=self.client_id,
+            withdrawal_id=withdrawal_id,
+            window_counts=dict(self.window_counts),
+            history_count=history_count,
+            history_sum=history_sum,
+            history_max=top[0] if history_count and top else None,
+            history_m2=history_m2,
+            recent_count=recent_count,
+            recent=others[:sample_limit] if recent_count >= 3 else (),
+            last_recent_at=last_recent_at,
+            computed_at=self.computed_at,
+        )
+
+
+class FraudFeatureStore:
+    """
+    Serves WithdrawalFeatures from a short-TTL in-process cache.
+
+    On a miss, the windowed counts and the amount statistics (count, sum
+    and sum of squares, from which M2 is derived) of all of the client's
+    withdrawals are computed by a single conditional-aggregate query, plus
+    two small ordered reads: the two largest amounts, and the newest
+    recent_limit + 1 rows of the 30-day pattern window. Entries are keyed
+    by client_id, so every withdrawal of a client shares one entry, and the
+    withdrawal being scored is subtracted in Python. An entry is dropped
+    whenever a withdrawal of that client is flushed, so the TTL only bounds
+    the age of figures between writes.
+    """
+
+    def __init__(self, ttl: int = 30, recent_limit: int = 100, max_entries: int = 10000):
+        self.ttl = ttl
+        self.recent_limit = recent_limit
+        self.max_entries = max_entries
+        self._entries: Dict[int, Tuple[float, ClientWithdrawalAggregates]] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('FRAUD_FEATURE_CACHE_TTL', self.ttl)
+        self.recent_limit = app.config.get('FRAUD_FEATURE_RECENT_LIMIT', self.recent_limit)
+
+    def get(self, withdrawal) -> WithdrawalFeatures:
+        """Features for scoring `withdrawal` against the rest of its client's history"""
+        client_id = withdrawal.client_id
+        entry = self._entries.get(client_id)
+        if entry is not None and entry[0] > time.monotonic():
+            aggregates = entry[1]
+        else:
+            aggregates = self.compute(client_id)
+            self._store(client_id, aggregates)
+        return aggregates.without(withdrawal, self.recent_limit)
+
+    def compute(self, client_id: int, now: Optional[datetime] = None) -> ClientWithdrawalAggregates:
+        """Compute a client's aggregates from the database, bypassing the cache"""
+        from app.extensions import db
+        from app.models.withdrawal import WithdrawalRequest as W, WithdrawalStatus
+
+        now = now or datetime.utcnow()
+        history = W.status != WithdrawalStatus.REJECTED
+        recent = W.created_at >= now - PATTERN_WINDOW
+
+        def count_where(condition):
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+        # Frequency windows include the withdrawal being scored, as before
+        columns = [count_where(and_(history, W.created_at >= now - window))
+                   for window in FREQUENCY_WINDOWS.values()]
+        columns += [
+            count_where(history),
+            func.coalesce(func.sum(case((history, W.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((history, W.amount * W.amount), else_=0)), 0),
+            count_where(recent),
+        ]
+        row = db.session.execute(select(*columns).where(W.client_id == client_id)).one()
+
+        windows = len(FREQUENCY_WINDOWS)
+        window_counts = {name: int(value or 0) for name, value in zip(FREQUENCY_WINDOWS, row[:windows])}
+        history_count, history_sum, history_sumsq, recent_count = row[windows:]
+        history_count = int(history_count or 0)
+        recent_count = int(recent_count or 0)
+
+        # Two, so the maximum is still known once the scored withdrawal is removed
+        top = ()
+        if history_count:
+            top = tuple(
+                (row_id, float(amount))
+                for row_id, amount in db.session.execute(
+                    select(W.id, W.amount)
+                    .where(W.client_id == client_id, history)
+                    .order_by(W.amount.desc())
+                    .limit(2)
+                )
+            )
+
+        # One extra row, so a full sample remains once the scored withdrawal is removed
+        samples = ()
+        if recent_count:
+            samples = tuple(
+                (row_id, float(amount), created_at)
+                for row_id, amount, created_at in db.session.execute(
+                    select(W.id, W.amount, W.created_at)
+                    .where(W.client_id == client_id, recent)
+                    .order_by(W.created_at.desc())
+                    .limit(self.recent_limit + 1)
+                )
+            )
+
+        return ClientWithdrawalAggregates(
+            client_id=client_id,
+            window_counts=window_counts,
+            history_count=history_count,
+            history_sum=float(history_sum or 0),
+            history_sumsq=float(history_sumsq or 0),
+            history_top=top,
+            recent_count=recent_count,
+            recent=samples,
+            computed_at=now,
+        )
+
+    def invalidate(self, *client_ids: int):
+        """Drop cached aggregates for the given clients"""
+        with self._lock:
+            for client_id in client_ids:
+                self._entries.pop(client_id, None)
+
+    def _store(self, key: int, aggregates: ClientWithdrawalAggregates):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (expires, aggregates)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_flushed_withdrawals(session, flush_context):
+    from app.models.withdrawal import WithdrawalRequest
+
+    client_ids = {
+        obj.client_id
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, WithdrawalRequest) and obj.client_id is not None
+    }
+    if client_ids:
+        fraud_features.invalidate(*client_ids)
+
+
+# Global fraud feature store
+fraud_features = FraudFeatureStore()
@@ -0,0 +1,305 @@
+"""
+Idempotency Keys
+Replays stored responses for retried write requests carrying an Idempotency-Key header
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional
+
+import redis
+from flask import current_app, jsonify, make_response, request
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+STATE_PENDING = 'pending'
+STATE_DONE = 'done'
+
+# Response headers worth replaying; everything else is regenerated per request
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+# Refusals that mean the write did not run (auth, conflicts, rate limits);
+# storing one would replay the refusal to every retry for the whole TTL
+UNSTORED_STATUSES = frozenset({401, 403, 408, 409, 423, 425, 429})
+
+
+class LocalIdempotencyStore:
+    """
+    Bounded in-process store used when Redis is unavailable.
+
+    Entries expire after their TTL and the least recently written ones are
+    evicted beyond max_keys. Waiters block on a condition that is notified
+    whenever an entry changes, instead of polling.
+    """
+
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._entries: OrderedDict = OrderedDict()
+        self._cond = threading.Condition()
+
+    def add(self, key: str, record: Dict, ttl: int) -> bool:
+        with self._cond:
+            if self._get(key) is not None:
+                return False
+            self._put(key, record, ttl)
+            return True
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._cond:
+            return self._get(key)
+
+    def set(self, key: str, record: Dict, ttl: int):
+        with self._cond:
+            self._put(key, record, ttl)
+            self._cond.notify_all()
+
+    def delete(self, key: str):
+        with self._cond:
+            self._entries.pop(key, None)
+            self._cond.notify_all()
+
+    def wait(self, key: str, timeout: float) -> Optional[Dict]:
+        """Block until the key is no longer pending; returns its record (None if released)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                record = self._get(key)
+                if record is None or record.get('state') != STATE_PENDING:
+                    return record
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return record
+                self._cond.wait(remaining)
+
+    def _get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def _put(self, key: str, record: Dict, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, record)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+
+class IdempotencyStore:
+    """
+    Keyed store for idempotency records, Redis first with a local fallback.
+
+    A request claims its key with an atomic SET NX holding a short-lived
+    pending marker and the request fingerprint. On completion the marker is
+    replaced by the serialized response for ttl seconds; on a server error
+    or exception it is deleted so the client can retry. Duplicates that
+    arrive while the first request is in flight wait for the marker to
+    resolve rather than running the write path themselves.
+    """
+
+    KEY_PREFIX = 'idempotency:'
+
+    def __init__(self, redis_conn=None, ttl: int = 86400, lock_ttl: int = 60,
+                 wait_timeout: float = 10.0, max_body_bytes: int = 256 * 1024):
+        self.redis = redis_conn
+        self.local = LocalIdempotencyStore()
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.max_body_bytes = max_body_bytes
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', self.ttl)
+        self.lock_ttl = app.config.get('IDEMPOTENCY_LOCK_TTL', self.lock_ttl)
+        self.wait_timeout = app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', self.wait_timeout)
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Dict]:
+        """Claim key for this request; returns None on success, else the existing record"""
+        record = {'state': STATE_PENDING, 'fp': fingerprint}
+        if self.redis is not None:
+            try:
+                for _ in range(2):
+                    if self.redis.set(self.KEY_PREFIX + key, json.dumps(record), nx=True, ex=self.lock_ttl):
+                        return None
+                    existing = self.get(key)
+                    if existing is not None:
+                        return existing
+                    # The holder released between SET NX and GET; try once more
+                return record
+            except redis.RedisError as e:
+                logger.warning(f"Redis idempotency store unavailable, using local fallback: {e}")
+        if self.local.add(key, record, self.lock_ttl):
+            return None
+        return self.local.get(key) or record
+
+    def get(self, key: str) -> Optional[Dict]:
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self.KEY_PREFIX + key)
+                return json.loads(raw) if raw else None
+            except redis.RedisError as e:
+                logger.warning(f"Redis idempotency read failed, using local fallback: {e}")
+        return self.local.get(key)
+
+    def complete(self, key: str, fingerprint: str, response) -> bool:
+        """Store a finished response for replay; returns False if it was not stored"""
+        body = response.get_data()
+        if len(body) > self.max_body_bytes:
+            self.release(key)
+            return False
+        record = {
+            'state': STATE_DONE,
+            'fp': fingerprint,
+            'status': response.status_code,
+            'body': body.decode('utf-8', errors='replace'),
+            'headers': {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers},
+        }
+        if self.redis is not None:
+            try:
+                self.redis.set(self.KEY_PREFIX + key, json.dumps(record), ex=self.ttl)
+                return True
+            except redis.RedisError as e:
+                logger.warning(f"Redis idempotency write failed, using local fallback: {e}")
+        self.local.set(key, record, self.ttl)
+        return True
+
+    def release(self, key: str):
+        """Drop a pending marker so the request can be retried"""
+        if self.redis is not None:
+            try:
+                self.redis.delete(self.KEY_PREFIX + key)
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Redis idempotency release failed, using local fallback: {e}")
+        self.local.delete(key)
+
+    def wait(self, key: str) -> Optional[Dict]:
+        """Wait up to wait_timeout for a pending key to resolve"""
+        if self.redis is None:
+            return self.local.wait(key, self.wait_timeout)
+
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.02
+        record = self.get(key)
+        while record is not None and record.get('state') == STATE_PENDING and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            record = self.get(key)
+        return record
+
+
+def _redis_connection():
+    from app.utils.security import REDIS_AVAILABLE, redis_client
+    return redis_client if REDIS_AVAILABLE else None
+
+
+# Global idempotency store
+idempotency_store = IdempotencyStore(_redis_connection())
+
+
+def _principal() -> str:
+    """Who the key belongs to, so keys from different callers never collide"""
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        identity = get_jwt_identity()
+        if identity is not None:
+            return f"jwt:{identity}"
+    except Exception:
+        pass
+    try:
+        from flask_login import current_user
+        if current_user and current_user.is_authenticated:
+            return f"user:{current_user.get_id()}"
+    except Exception:
+        pass
+    return f"ip:{request.remote_addr}"
+
+
+def _fingerprint() -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0' + request.path.encode())
+    digest.update(b'\0' + request.query_string)
+    digest.update(b'\0' + request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(record: Dict):
+    response = make_response(record.get('body', ''), record.get('status', 200))
+    for name, value in (record.get('headers') or {}).items():
+        response.headers[name] = value
+    response.headers[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(scope: str):
+    """
+    Decorator making a write endpoint safe to retry with an Idempotency-Key header
+
+    Requests without the header run normally. A repeated key with the same
+    request replays the stored response; with a different request it is
+    rejected with 422. Server errors (>= 500) and refusals such as 409 or
+    429 release the key instead of being stored, so a retry runs again.
+    Apply it below rate limiting and abuse protection decorators so their
+    rejections never claim a key in the first place.
+
+    Usage:
+        @idempotent('payment_initiate')
+        def initiate_payment():
+            pass
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            raw_key = request.headers.get(HEADER)
+            if request.method != 'POST' or not raw_key:
+                return f(*args, **kwargs)
+            if len(raw_key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+            key_hash = hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+            key = f"{scope}:{_principal()}:{key_hash}"
+            fingerprint = _fingerprint()
+
+            record = idempotency_store.claim(key, fingerprint)
+            if record is not None and record.get('state') == STATE_PENDING:
+                record = idempotency_store.wait(key)
+                if record is None:
+                    # First request failed and released the key; take it over
+                    record = idempotency_store.claim(key, fingerprint)
+
+            if record is not None:
+                if record.get('fp') != fingerprint:
+                    return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+                if record.get('state') == STATE_PENDING:
+                    response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                return _replay(record)
+
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                idempotency_store.release(key)
+                raise
+
+            if (response.status_code >= 500 or response.status_code in UNSTORED_STATUSES
+                    or response.direct_passthrough):
+                idempotency_store.release(key)
+            elif not idempotency_store.complete(key, fingerprint, response):
+                current_app.logger.warning(f"Response for idempotent {scope} request too large to store")
+            return response
+        return decorated_function
+    return decorator
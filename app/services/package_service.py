@@ -9,6 +9,7 @@ from sqlalchemy.exc import IntegrityError
 from app.extensions import db
 from app.models.client_package import ClientPackage, PackageFeature, ClientType, PackageStatus
 from app.models.feature import Feature
+from app.services.entitlements import entitlements
 from app.utils.logger import logger
 
 class PackageService:
@@ -150,6 +151,7 @@ class PackageService:
                     )
                     session.add(assignment)
                 
+                entitlements.invalidate()
                 return assignment
                 
             except Exception as e:
@@ -186,6 +188,7 @@ class PackageService:
                 
                 if assignment:
                     session.delete(assignment)
+                    entitlements.invalidate()
                     return True
                     
                 return False
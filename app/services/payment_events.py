@@ -0,0 +1,294 @@
+"""
+Payment Events
+Publishes package payment state transitions and streams them to checkouts over SSE
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, Optional, Set
+
+from flask import Response, stream_with_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Session.info dict: payment id -> status payload to publish once the transaction commits
+PENDING_EVENTS_KEY = 'payment_events_pending'
+
+CHANNEL_PREFIX = 'payment_events:'
+
+# Tracked columns; a change to any of them is a state transition worth pushing
+TRACKED_ATTRIBUTES = ('status', 'confirmations', 'required_confirmations', 'expires_at')
+
+
+def status_payload(payment) -> Dict:
+    """What the checkout page needs to know about a PackageActivationPayment"""
+    from app.models.enums import PaymentStatus
+
+    status = payment.status or PaymentStatus.PENDING
+    return {
+        'payment_id': payment.id,
+        'status': status.value,
+        'confirmations': payment.confirmations,
+        'required_confirmations': payment.required_confirmations,
+        'is_completed': status == PaymentStatus.COMPLETED,
+        'is_final': status in (PaymentStatus.COMPLETED, PaymentStatus.REJECTED,
+                               PaymentStatus.FAILED, PaymentStatus.CANCELLED),
+        'expires_at': payment.expires_at.isoformat() if payment.expires_at else None,
+        'time_remaining': str(payment.time_remaining) if not payment.is_expired else '0:00:00',
+    }
+
+
+class Subscription:
+    """One listener on one payment's channel"""
+
+    def __init__(self, broker: 'PaymentEventBroker', payment_id: int, maxsize: int = 16):
+        self.broker = broker
+        self.payment_id = payment_id
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def deliver(self, payload: Dict):
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            # A slow reader only needs the latest state
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(payload)
+
+    def next(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class PaymentEventBroker:
+    """
+    Pub/sub of package payment state transitions.
+
+    Flushes that change a PackageActivationPayment's status or
+    confirmations queue its status payload on the session; after commit it
+    is published on the payment's channel. With Redis, publishing goes
+    through Redis pub/sub and one listener thread per process pattern-
+    subscribes to all payment channels and fans messages out to local
+    subscribers, so a checkout connected to any worker sees transitions
+    made by any other. Without Redis (and in tests) the same fan-out runs
+    in-process. A subscriber is a small queue that blocks without polling,
+    so an idle stream costs no database queries: the stream endpoint reads
+    the payment once, releases its connection and then only waits.
+    """
+
+    def __init__(self, redis_conn=None, heartbeat: float = 15.0, max_duration: float = 120.0,
+                 max_streams: int = 2):
+        self.redis = redis_conn
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+        self.max_streams = max_streams
+        self.use_redis = True
+
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._active_streams = 0
+        self._listener: Optional[threading.Thread] = None
+        self._listener_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.use_redis = app.config.get('PAYMENT_EVENTS_REDIS', self.use_redis)
+        self.heartbeat = app.config.get('PAYMENT_STREAM_HEARTBEAT', self.heartbeat)
+        self.max_duration = app.config.get('PAYMENT_STREAM_MAX_DURATION', self.max_duration)
+        self.max_streams = app.config.get('PAYMENT_STREAM_MAX_PER_PROCESS', self.max_streams)
+        if not self.use_redis:
+            self.redis = None
+        elif self.redis is None:
+            self.redis = _redis_connection()
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def publish(self, payload: Dict):
+        """Send a status payload to every subscriber of its payment, in any process"""
+        if self.redis is not None:
+            try:
+                self.redis.publish(CHANNEL_PREFIX + str(payload['payment_id']),
+                                   json.dumps(payload, default=str))
+                return
+            except Exception as e:
+                logger.warning(f"Redis publish failed, delivering locally only: {e}")
+        self._fan_out(payload)
+
+    def publish_after_commit(self, payment, session=None):
+        """Publish payment's status once the current transaction commits"""
+        from app.extensions import db
+
+        session = session or db.session()
+        session.info.setdefault(PENDING_EVENTS_KEY, {})[payment.id] = status_payload(payment)
+
+    # ------------------------------------------------------------------
+    # Subscribing
+    # ------------------------------------------------------------------
+
+    def subscribe(self, payment_id: int) -> Subscription:
+        if self.redis is not None:
+            self._ensure_listener()
+        subscription = Subscription(self, payment_id)
+        with self._lock:
+            self._subscribers.setdefault(payment_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.payment_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.payment_id]
+
+    def try_open_stream(self) -> bool:
+        """Reserve one of this process's stream slots (each stream holds a worker thread)"""
+        with self._lock:
+            if self._active_streams >= self.max_streams:
+                return False
+            self._active_streams += 1
+            return True
+
+    def close_stream(self):
+        with self._lock:
+            self._active_streams = max(0, self._active_streams - 1)
+
+    def sse_response(self, subscription: Subscription, initial: Dict) -> Response:
+        """
+        text/event-stream of a payment's status, starting with initial
+
+        The caller must have reserved a slot with try_open_stream(). The
+        stream ends on a final status or after max_duration; the browser's
+        EventSource then reconnects on its own.
+        """
+        def generate() -> Iterator[str]:
+            yield f"retry: 3000\n{_sse_event(initial)}"
+            if initial.get('is_final'):
+                return
+            deadline = time.monotonic() + self.max_duration
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                payload = subscription.next(min(self.heartbeat, remaining))
+                if payload is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield _sse_event(payload)
+                if payload.get('is_final'):
+                    return
+
+        def release():
+            subscription.close()
+            self.close_stream()
+
+        headers = {
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no',  # Let nginx pass events straight through
+        }
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+        # Runs when the server closes the response, even if the client left before the first event
+        response.call_on_close(release)
+        return response
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _fan_out(self, payload: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(payload.get('payment_id'), ()))
+        for subscription in subscribers:
+            subscription.deliver(payload)
+
+    def _ensure_listener(self):
+        # Threads do not survive fork, so (re)start per worker process
+        if self._listener is not None and self._listener.is_alive() and self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener is not None and self._listener.is_alive() and self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='payment-events', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        delay = 0.5
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(CHANNEL_PREFIX + '*')
+                delay = 0.5
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'pmessage':
+                        data = message['data']
+                        if isinstance(data, bytes):
+                            data = data.decode('utf-8')
+                        self._fan_out(json.loads(data))
+            except Exception as e:
+                logger.warning(f"Payment event listener disconnected, retrying in {delay}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+def _sse_event(payload: Dict) -> str:
+    return f"event: status\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def _redis_connection():
+    from app.utils.security import REDIS_AVAILABLE, redis_client
+    return redis_client if REDIS_AVAILABLE else None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_payment_transitions(session, flush_context):
+    from app.models.package_payment import PackageActivationPayment
+
+    for obj in session.dirty:
+        if not isinstance(obj, PackageActivationPayment):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+            payment_events.publish_after_commit(obj, session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_payment_transitions(session):
+    pending: Optional[Dict[int, Dict]] = session.info.pop(PENDING_EVENTS_KEY, None)
+    for payload in (pending or {}).values():
+        try:
+            payment_events.publish(payload)
+        except Exception as e:
+            logger.error(f"Failed to publish payment event: {e}", exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_payment_transitions(session):
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+# Global payment event broker
+payment_events = PaymentEventBroker()
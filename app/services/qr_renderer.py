@@ -0,0 +1,316 @@
+"""
+QR Renderer
+Renders payment QR codes off the request threads and serves them from a content-addressed cache
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def render_png(data: str, scale: int) -> bytes:
+    """PNG bytes of data's QR code (runs in the render pool's worker processes)"""
+    import pyqrcode
+
+    buffer = BytesIO()
+    pyqrcode.create(data).png(buffer, scale=scale, quiet_zone=2)
+    return buffer.getvalue()
+
+
+class QRRenderer:
+    """
+    Content-addressed cache of payment QR code PNGs.
+
+    A code is keyed by an HMAC of (data, scale) under the app's secret key.
+    The same address therefore always maps to the same URL, and only URLs
+    the app issued can make it render. Pages link to that URL through
+    qr_url() rather than inlining a base64 data URI, and it is served as
+    immutable, so reloads and re-renders of a payment page do not fetch the
+    image again. A lookup tries a per-process LRU first, then the on-disk
+    cache under instance/qr_cache that all workers share (memory only if
+    that directory cannot be created), and only then renders. The disk
+    cache lives outside the static folder, so only issued URLs reach it,
+    and a scheduled prune() caps it by age and file count.
+    PNG encoding is CPU-bound pure Python, so it runs in a small process
+    pool; the request thread waits on the future without holding the GIL,
+    and concurrent requests for the same missing code share one render.
+    """
+
+    PRUNE_JOB_ID = 'qr_cache_prune'
+
+    def __init__(self, cache_dir: Optional[str] = None, memory_size: int = 256,
+                 processes: int = 2, render_timeout: float = 10.0, default_scale: int = 6,
+                 max_data_length: int = 512, max_files: int = 10000, max_age: int = 30 * 86400,
+                 prune_interval: int = 3600):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self.memory_size = memory_size
+        self.processes = processes
+        self.render_timeout = render_timeout
+        self.default_scale = default_scale
+        self.max_data_length = max_data_length
+        self.secret = b''
+
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Expose qr_url() to templates, read configuration and create the disk cache"""
+        app.jinja_env.globals['qr_url'] = self.url
+        self.memory_size = app.config.get('QR_MEMORY_CACHE_SIZE', self.memory_size)
+        self.processes = app.config.get('QR_RENDER_PROCESSES', self.processes)
+        self.render_timeout = app.config.get('QR_RENDER_TIMEOUT', self.render_timeout)
+        self.default_scale = app.config.get('QR_DEFAULT_SCALE', self.default_scale)
+        self.max_data_length = app.config.get('QR_MAX_DATA_LENGTH', self.max_data_length)
+        self.max_files = app.config.get('QR_CACHE_MAX_FILES', self.max_files)
+        self.max_age = app.config.get('QR_CACHE_MAX_AGE', self.max_age)
+        self.prune_interval = app.config.get('QR_CACHE_PRUNE_INTERVAL', self.prune_interval)
+        self.secret = str(app.config.get('SECRET_KEY') or '').encode('utf-8')
+
+        cache_dir = app.config.get('QR_CACHE_DIR') or os.path.join(app.instance_path, 'qr_cache')
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.cache_dir = cache_dir
+        except OSError as e:
+            self.cache_dir = None
+            app.logger.warning(f"QR disk cache unavailable at {cache_dir}, using memory only: {e}")
+            return
+
+        if not self.prune_interval:
+            return
+
+        def _prune_job():
+            try:
+                self.prune()
+            except Exception as e:
+                logger.error(f"QR cache prune failed: {e}", exc_info=True)
+
+        try:
+            from app.extensions import scheduler
+            scheduler.add_job(
+                id=self.PRUNE_JOB_ID,
+                func=_prune_job,
+                trigger='interval',
+                seconds=self.prune_interval,
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+            )
+        except Exception as e:
+            app.logger.error(f"Failed to schedule QR cache pruning: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Addressing
+    # ------------------------------------------------------------------
+
+    def key(self, data: str, scale: Optional[int] = None) -> str:
+        scale = scale or self.default_scale
+        message = f"{scale}\n{data}".encode('utf-8')
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def verify(self, key: str, data: str, scale: Optional[int] = None) -> bool:
+        """True if key was issued for (data, scale)"""
+        if not data or len(data) > self.max_data_length:
+            return False
+        return hmac.compare_digest(key, self.key(data, scale))
+
+    def url(self, data: str, scale: Optional[int] = None) -> str:
+        """Long-lived, cacheable URL of data's QR code"""
+        from flask import url_for
+
+        scale = scale or self.default_scale
+        return url_for('main.qr_code', key=self.key(data, scale), d=data, s=scale)
+
+    # ------------------------------------------------------------------
+    # Images
+    # ------------------------------------------------------------------
+
+    def png(self, data: str, scale: Optional[int] = None) -> bytes:
+        """PNG bytes of data's QR code from the LRU, the disk cache, or a render"""
+        scale = scale or self.default_scale
+        key = self.key(data, scale)
+
+        png = self._memory_get(key)
+        if png is not None:
+            return png
+        png = self._disk_get(key)
+        if png is not None:
+            self._memory_put(key, png)
+            return png
+        return self._coalesced(key, data, scale)
+
+    def data_uri(self, data: str, scale: Optional[int] = None) -> str:
+        """Inline data URI, for JSON responses that cannot reference a URL"""
+        return "data:image/png;base64," + base64.b64encode(self.png(data, scale)).decode('ascii')
+
+    def prune(self) -> int:
+        """
+        Delete cached PNGs older than max_age, then the oldest beyond max_files
+
+        Evicted codes are simply rendered again on their next request.
+        Returns the number of files removed.
+        """
+        if not self.cache_dir:
+            return 0
+        pngs, stale = [], []
+        cutoff = time.time() - self.max_age
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    if mtime < cutoff:
+                        stale.append(entry.path)  # Includes temp files of crashed writes
+                    elif entry.name.endswith('.png'):
+                        pngs.append((mtime, entry.path))
+        except OSError as e:
+            logger.warning(f"Failed to scan QR disk cache: {e}")
+            return 0
+
+        if len(pngs) > self.max_files:
+            pngs.sort(reverse=True)
+            stale.extend(path for _, path in pngs[self.max_files:])
+
+        removed = 0
+        for path in stale:
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # Pruned by another worker
+            except OSError as e:
+                logger.warning(f"Failed to prune cached QR code {path}: {e}")
+        if removed:
+            logger.info(f"Pruned {removed} cached QR code(s)")
+        return removed
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def _coalesced(self, key: str, data: str, scale: int) -> bytes:
+        with self._lock:
+            future = self._pending.get(key)
+            leader = future is None
+            if leader:
+                future = self._pending[key] = Future()
+
+        if not leader:
+            return future.result(timeout=self.render_timeout)
+
+        try:
+            png = self._render(data, scale)
+            self._disk_put(key, png)
+            self._memory_put(key, png)
+            future.set_result(png)
+            return png
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _render(self, data: str, scale: int) -> bytes:
+        if self.processes <= 0:
+            return render_png(data, scale)
+        try:
+            return self._pool().submit(render_png, data, scale).result(timeout=self.render_timeout)
+        except BrokenProcessPool:
+            # A pool process died; start a fresh pool next time and render this one here
+            logger.warning("QR render pool broken; restarting it")
+            with self._start_lock:
+                broken, self._executor = self._executor, None
+            if broken is not None:
+                broken.shutdown(wait=False)
+            return render_png(data, scale)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Pools do not survive fork, so (re)create per worker process
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._start_lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                # spawn, not fork: forking a threaded worker can copy held locks into the child
+                self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    # ------------------------------------------------------------------
+    # Caches
+    # ------------------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+            return png
+
+    def _memory_put(self, key: str, png: bytes):
+        with self._lock:
+            self._memory[key] = png
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cached QR code {key}: {e}")
+            return None
+
+    def _disk_put(self, key: str, png: bytes):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            # Write then rename, so other workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(png)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to write cached QR code {key}: {e}")
+
+
+# Global QR renderer
+qr_renderer = QRRenderer()
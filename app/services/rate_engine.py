@@ -0,0 +1,296 @@
+"""
+Exchange Rate Engine
+Refreshes crypto/fiat rates in the background and serves them from a shared tiered cache
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional
+
+import requests
+
+from app.extensions import cache
+from app.utils.crypto_config import SUPPORTED_CRYPTOCURRENCIES
+
+logger = logging.getLogger(__name__)
+
+# Fiat currencies priced for every supported cryptocurrency
+SUPPORTED_FIAT_CURRENCIES = ('USD', 'EUR', 'GBP', 'TRY')
+
+SOURCE_LIVE = 'live'
+SOURCE_DEFAULT = 'default'
+
+
+@dataclass
+class RateSnapshot:
+    """Immutable set of crypto -> fiat rates fetched at one point in time"""
+    rates: Dict[str, Dict[str, Decimal]]
+    fetched_at: datetime
+    source: str
+    stale_after: int = 300
+    version: int = field(default=0)
+
+    def get(self, crypto_currency: str, fiat_currency: str) -> Optional[Decimal]:
+        """Return the rate (1 crypto = X fiat) or None if the pair is unknown"""
+        return self.rates.get(crypto_currency, {}).get(fiat_currency)
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, (datetime.utcnow() - self.fetched_at).total_seconds())
+
+    @property
+    def is_stale(self) -> bool:
+        return self.source != SOURCE_LIVE or self.age_seconds > self.stale_after
+
+    @property
+    def expires_at(self) -> datetime:
+        return self.fetched_at + timedelta(seconds=self.stale_after)
+
+    def metadata(self) -> Dict:
+        """Staleness metadata suitable for API responses"""
+        return {
+            'rate_timestamp': self.fetched_at.isoformat(),
+            'rate_expiry': self.expires_at.isoformat(),
+            'rate_source': self.source,
+            'rate_age_seconds': int(self.age_seconds),
+            'stale': self.is_stale,
+        }
+
+    def to_dict(self) -> Dict:
+        """Serialize for the shared (L2) cache; Decimals travel as strings"""
+        return {
+            'rates': {
+                crypto: {fiat: str(rate) for fiat, rate in fiats.items()}
+                for crypto, fiats in self.rates.items()
+            },
+            'fetched_at': self.fetched_at.isoformat(),
+            'source': self.source,
+            'stale_after': self.stale_after,
+            'version': self.version,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RateSnapshot':
+        return cls(
+            rates={
+                crypto: {fiat: Decimal(rate) for fiat, rate in fiats.items()}
+                for crypto, fiats in data['rates'].items()
+            },
+            fetched_at=datetime.fromisoformat(data['fetched_at']),
+            source=data['source'],
+            stale_after=data.get('stale_after', 300),
+            version=data.get('version', 0),
+        )
+
+
+class RateEngine:
+    """
+    Background exchange-rate engine.
+
+    A scheduled job fetches every SUPPORTED_CRYPTOCURRENCIES x fiat pair in one
+    batched upstream call and publishes the result to Flask-Caching (L2, shared
+    by all workers). Each process keeps the last snapshot in memory (L1) for a
+    few seconds. Readers never perform upstream I/O: on a cold cache they get
+    the static default table, flagged as stale.
+    """
+
+    CACHE_KEY = 'rate_engine:snapshot'
+    LOCK_KEY = 'rate_engine:refresh_lock'
+    JOB_ID = 'rate_engine_refresh'
+
+    def __init__(self, refresh_interval: int = 60, l1_ttl: int = 5, stale_after: int = 300,
+                 api_url: str = 'https://api.coingecko.com/api/v3/simple/price',
+                 request_timeout: int = 5):
+        self.refresh_interval = refresh_interval
+        self.l1_ttl = l1_ttl
+        self.stale_after = stale_after
+        self.api_url = api_url
+        self.request_timeout = request_timeout
+        self.live_fetch_enabled = True
+
+        self._lock = threading.Lock()
+        self._l1_snapshot: Optional[RateSnapshot] = None
+        self._l1_expires = 0.0
+        self._session = requests.Session()
+        self._session.headers.update({'User-Agent': 'PayCrypt-Gateway/1.0'})
+
+    def init_app(self, app):
+        """Read configuration and schedule the background refresh job"""
+        self.refresh_interval = app.config.get('RATE_ENGINE_REFRESH_INTERVAL', self.refresh_interval)
+        self.l1_ttl = app.config.get('RATE_ENGINE_L1_TTL', self.l1_ttl)
+        self.stale_after = app.config.get('RATE_ENGINE_STALE_AFTER', self.stale_after)
+        self.api_url = app.config.get('EXCHANGE_RATE_API_URL', self.api_url)
+        self.live_fetch_enabled = app.config.get('RATE_ENGINE_LIVE_FETCH', self.live_fetch_enabled)
+
+        if not self.live_fetch_enabled:
+            app.logger.info("Rate engine live fetch disabled; serving default rates")
+            return
+
+        def _refresh_job():
+            with app.app_context():
+                self.refresh()
+
+        try:
+            from app.extensions import scheduler
+            scheduler.add_job(
+                id=self.JOB_ID,
+                func=_refresh_job,
+                trigger='interval',
+                seconds=self.refresh_interval,
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+            )
+            app.logger.info(f"Rate engine scheduled every {self.refresh_interval}s")
+        except Exception as e:
+            app.logger.error(f"Failed to schedule rate engine refresh: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Read path (never blocks on upstream I/O)
+    # ------------------------------------------------------------------
+
+    def get_snapshot(self) -> RateSnapshot:
+        """Return the freshest snapshot available from L1, L2 or the default table"""
+        now = time.monotonic()
+        snapshot = self._l1_snapshot
+        if snapshot is not None and now < self._l1_expires:
+            return snapshot
+
+        shared = self._read_shared()
+        if shared is not None:
+            self._store_l1(shared)
+            return shared
+
+        if snapshot is not None:
+            # Shared cache unavailable or evicted; keep serving what we have
+            self._store_l1(snapshot)
+            return snapshot
+
+        snapshot = self._default_snapshot()
+        self._store_l1(snapshot)
+        return snapshot
+
+    def get_rate(self, crypto_currency: str, fiat_currency: str) -> Optional[Decimal]:
+        return self.get_snapshot().get(crypto_currency, fiat_currency)
+
+    def invalidate_local(self):
+        """Drop the in-process snapshot so the next read goes to the shared cache"""
+        with self._lock:
+            self._l1_snapshot = None
+            self._l1_expires = 0.0
+
+    # ------------------------------------------------------------------
+    # Write path (scheduler only)
+    # ------------------------------------------------------------------
+
+    def refresh(self, force: bool = False) -> Optional[RateSnapshot]:
+        """
+        Fetch all pairs in one batched call and publish the snapshot.
+
+        Only one worker refreshes per interval: a fresh shared snapshot or a
+        held refresh lock makes the others skip.
+        """
+        if not force:
+            shared = self._read_shared()
+            if shared is not None and shared.source == SOURCE_LIVE \
+                    and shared.age_seconds < self.refresh_interval / 2:
+                self._store_l1(shared)
+                return shared
+            try:
+                if not cache.add(self.LOCK_KEY, 1, timeout=max(1, self.refresh_interval - 1)):
+                    return None
+            except Exception as e:
+                logger.warning(f"Rate engine lock unavailable, refreshing anyway: {e}")
+
+        rates = self._fetch_all()
+        if not rates:
+            logger.warning("Rate engine refresh returned no rates; keeping previous snapshot")
+            return None
+
+        previous = self._l1_snapshot
+        snapshot = RateSnapshot(
+            rates=rates,
+            fetched_at=datetime.utcnow(),
+            source=SOURCE_LIVE,
+            stale_after=self.stale_after,
+            version=(previous.version + 1) if previous else 1,
+        )
+        self._publish(snapshot)
+        logger.info(f"Rate engine published {sum(len(f) for f in rates.values())} rates (v{snapshot.version})")
+        return snapshot
+
+    def _fetch_all(self) -> Dict[str, Dict[str, Decimal]]:
+        """Single batched upstream call covering every crypto and fiat currency"""
+        ids_by_symbol = {symbol: info['api_id'] for symbol, info in SUPPORTED_CRYPTOCURRENCIES.items()}
+        try:
+            response = self._session.get(
+                self.api_url,
+                params={
+                    'ids': ','.join(sorted(set(ids_by_symbol.values()))),
+                    'vs_currencies': ','.join(f.lower() for f in SUPPORTED_FIAT_CURRENCIES),
+                    'precision': 8,
+                },
+                timeout=self.request_timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.error(f"Error fetching exchange rates: {e}")
+            return {}
+
+        rates = {}
+        for symbol, api_id in ids_by_symbol.items():
+            prices = data.get(api_id) or {}
+            pair_rates = {}
+            for fiat in SUPPORTED_FIAT_CURRENCIES:
+                value = prices.get(fiat.lower())
+                if value is None:
+                    continue
+                try:
+                    rate = Decimal(str(value))
+                except InvalidOperation:
+                    continue
+                if rate > 0:
+                    pair_rates[fiat] = rate
+            if pair_rates:
+                rates[symbol] = pair_rates
+        return rates
+
+    def _publish(self, snapshot: RateSnapshot):
+        try:
+            # Keep the shared copy well past staleness so readers can still flag it
+            cache.set(self.CACHE_KEY, snapshot.to_dict(), timeout=self.stale_after * 4)
+        except Exception as e:
+            logger.error(f"Failed to publish rate snapshot to shared cache: {e}")
+        self._store_l1(snapshot)
+
+    def _read_shared(self) -> Optional[RateSnapshot]:
+        try:
+            data = cache.get(self.CACHE_KEY)
+            return RateSnapshot.from_dict(data) if data else None
+        except Exception as e:
+            logger.warning(f"Failed to read rate snapshot from shared cache: {e}")
+            return None
+
+    def _store_l1(self, snapshot: RateSnapshot):
+        with self._lock:
+            self._l1_snapshot = snapshot
+            self._l1_expires = time.monotonic() + self.l1_ttl
+
+    def _default_snapshot(self) -> RateSnapshot:
+        from app.utils.exchange import DEFAULT_RATES
+        return RateSnapshot(
+            rates=DEFAULT_RATES,
+            fetched_at=datetime.utcnow(),
+            source=SOURCE_DEFAULT,
+            stale_after=self.stale_after,
+        )
+
+
+# Global rate engine instance
+rate_engine = RateEngine()
@@ -0,0 +1,141 @@
+"""
+Webhook Replay Cache
+Rotating, time-bucketed Bloom filters of recently seen webhook signatures
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Returns 1 if the item was absent from every bucket (and records it in the
+# current one, KEYS[1]), 0 if any bucket already holds all of its bits.
+CHECK_AND_ADD_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local add = tonumber(ARGV[2])
+for i = 1, #KEYS do
+    local present = true
+    for j = 3, #ARGV do
+        if redis.call('GETBIT', KEYS[i], ARGV[j]) == 0 then
+            present = false
+            break
+        end
+    end
+    if present then
+        return 0
+    end
+end
+if add == 1 then
+    for j = 3, #ARGV do
+        redis.call('SETBIT', KEYS[1], ARGV[j], 1)
+    end
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+
+class ReplayCache:
+    """
+    Bounded "seen recently" set for (client_id, signature) pairs.
+
+    Time is cut into bucket_seconds buckets, each holding a Bloom filter of
+    size_bits bits; lookups consult every bucket that overlaps the replay
+    window and inserts go to the current one, so old buckets simply expire.
+    Memory is fixed at size_bits / 8 bytes per live bucket regardless of
+    webhook rate. The filters live in Redis (one bitmap per bucket, updated
+    by a Lua script so check-and-add is atomic across workers) and fall
+    back to in-process bytearrays when Redis is unavailable. False
+    positives are possible at a rate set by size_bits and hashes; false
+    negatives are not.
+    """
+
+    KEY_PREFIX = 'webhook_replay:{bloom}:'  # Hash tag keeps all buckets in one cluster slot
+
+    def __init__(self, redis_conn=None, window: int = 300, bucket_seconds: int = 60,
+                 size_bits: int = 1 << 24, hashes: int = 7):
+        self.redis = redis_conn
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._script = redis_conn.register_script(CHECK_AND_ADD_SCRIPT) if redis_conn else None
+        self._local: Dict[int, bytearray] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.bucket_seconds = app.config.get('WEBHOOK_REPLAY_BUCKET_SECONDS', self.bucket_seconds)
+        self.size_bits = app.config.get('WEBHOOK_REPLAY_BLOOM_BITS', self.size_bits)
+        self.hashes = app.config.get('WEBHOOK_REPLAY_BLOOM_HASHES', self.hashes)
+        with self._lock:
+            self._local = {}
+
+    def seen(self, client_id: int, signature: str, now: Optional[float] = None) -> bool:
+        """Whether the pair was recorded within the replay window (read-only)"""
+        return not self._check(client_id, signature, add=False, now=now)
+
+    def add(self, client_id: int, signature: str, now: Optional[float] = None) -> bool:
+        """Record the pair; returns False if it was already seen (a replay)"""
+        return self._check(client_id, signature, add=True, now=now)
+
+    def _check(self, client_id: int, signature: str, add: bool, now: Optional[float]) -> bool:
+        now = time.time() if now is None else now
+        offsets = self._offsets(client_id, signature)
+        buckets = self._buckets(now)
+
+        if self._script is not None:
+            try:
+                result = self._script(
+                    keys=[self.KEY_PREFIX + str(idx) for idx in buckets],
+                    args=[self._bucket_ttl(), 1 if add else 0] + offsets,
+                )
+                return bool(int(result))
+            except redis.RedisError as e:
+                logger.warning(f"Redis replay cache unavailable, using local fallback: {e}")
+
+        with self._lock:
+            # Drop buckets that no longer overlap the window
+            for idx in [idx for idx in self._local if idx < buckets[-1]]:
+                del self._local[idx]
+            for idx in buckets:
+                bits = self._local.get(idx)
+                if bits is not None and all(bits[o >> 3] & (1 << (o & 7)) for o in offsets):
+                    return False
+            if add:
+                bits = self._local.get(buckets[0])
+                if bits is None:
+                    bits = self._local[buckets[0]] = bytearray((self.size_bits + 7) // 8)
+                for o in offsets:
+                    bits[o >> 3] |= 1 << (o & 7)
+        return True
+
+    def _buckets(self, now: float) -> List[int]:
+        """Current bucket first, then every older bucket overlapping the window"""
+        current = int(now // self.bucket_seconds)
+        span = math.ceil(self.window / self.bucket_seconds)
+        return [current - i for i in range(span + 1)]
+
+    def _bucket_ttl(self) -> int:
+        return self.window + 2 * self.bucket_seconds
+
+    def _offsets(self, client_id: int, signature: str) -> List[int]:
+        """k bit positions by double hashing one SHA-256 digest"""
+        digest = hashlib.sha256(f"{client_id}:{signature}".encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+
+def _redis_connection():
+    from app.utils.security import REDIS_AVAILABLE, redis_client
+    return redis_client if REDIS_AVAILABLE else None
+
+
+# Global webhook replay cache
+webhook_replay_cache = ReplayCache(_redis_connection())
@@ -0,0 +1,248 @@
+"""
+Report Engine
+Generates admin reports in the background and serves stored results
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, or_, update
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+
+def result_key(report_type: str, filters: Optional[Dict]) -> str:
+    """Stable hash of (report_type, filters); identical reports share a result"""
+    raw = json.dumps([report_type, filters or {}], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ReportEngine:
+    """
+    Asynchronous report generation with persisted, shared results.
+
+    submit() marks a saved report PENDING, commits, and hands its id to a
+    small per-process thread pool, so the request returns at once. A worker
+    claims the row with a conditional UPDATE (PENDING, or PROCESSING with
+    an expired lease, becomes PROCESSING), so only one process generates a
+    report. It first looks for a result under the (type, filters) hash in
+    the shared cache, then runs the grouped SQL aggregates in
+    Report.generate_report() and stores the result on the row and in the
+    cache. view/export read report.result, so requests never run report
+    queries. A scheduled sweep re-submits rows left PENDING or stranded by
+    a worker that died mid-generation.
+    """
+
+    JOB_ID = 'report_engine_sweep'
+    CACHE_PREFIX = 'report_result:'
+
+    def __init__(self, workers: int = 2, result_ttl: int = 900, lease_seconds: int = 600,
+                 sweep_interval: int = 60):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.lease_seconds = lease_seconds
+        self.sweep_interval = sweep_interval
+        self.enabled = True
+
+        self.app = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read configuration and schedule the recovery sweep"""
+        self.app = app
+        self.enabled = app.config.get('REPORT_ASYNC', self.enabled)
+        self.workers = app.config.get('REPORT_WORKERS', self.workers)
+        self.result_ttl = app.config.get('REPORT_RESULT_TTL', self.result_ttl)
+        self.lease_seconds = app.config.get('REPORT_LEASE_SECONDS', self.lease_seconds)
+        self.sweep_interval = app.config.get('REPORT_SWEEP_INTERVAL', self.sweep_interval)
+
+        if not self.enabled:
+            app.logger.info("Async report generation disabled; reports generate inline")
+            return
+
+        def _sweep_job():
+            with app.app_context():
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Report sweep failed: {e}", exc_info=True)
+
+        try:
+            from app.extensions import scheduler
+            scheduler.add_job(
+                id=self.JOB_ID,
+                func=_sweep_job,
+                trigger='interval',
+                seconds=self.sweep_interval,
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+            )
+        except Exception as e:
+            app.logger.error(f"Failed to schedule report sweep: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Request side
+    # ------------------------------------------------------------------
+
+    def submit(self, report, refresh: bool = False):
+        """
+        Mark a saved report PENDING, commit, and hand it to a worker
+
+        Runs inline when REPORT_ASYNC is off. refresh=True skips the shared
+        result cache so the aggregates are recomputed.
+        """
+        from app.extensions import db
+        from app.models.report import ReportStatus
+
+        report.status = ReportStatus.PENDING.value
+        report.result_key = result_key(report.report_type, report.filters)
+        report.error = None
+        db.session.commit()
+        if refresh:
+            try:
+                cache.delete(self.CACHE_PREFIX + report.result_key)
+            except Exception as e:
+                logger.warning(f"Failed to clear report result cache: {e}")
+        self.dispatch(report.id)
+
+    def stored_result(self, report) -> Optional[Dict]:
+        """The persisted result of report, or None while it is still generating"""
+        from app.models.report import ReportStatus
+
+        if report.status == ReportStatus.COMPLETED.value:
+            return report.result
+        return None
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def dispatch(self, report_id: int):
+        if not self.enabled or self.app is None:
+            self.run(report_id)
+            return
+        self._ensure_started()
+        try:
+            self._executor.submit(self._run_in_context, report_id)
+        except RuntimeError:
+            # Executor shut down; the sweep picks the report up later
+            logger.warning(f"Report {report_id} left pending; executor unavailable")
+
+    def sweep(self) -> int:
+        """Re-dispatch reports that are pending or whose generation lease expired"""
+        from app.extensions import db
+        from app.models.report import Report, ReportStatus
+
+        stale = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        ids = [row[0] for row in db.session.query(Report.id).filter(or_(
+            Report.status == ReportStatus.PENDING.value,
+            and_(Report.status == ReportStatus.PROCESSING.value, Report.started_at < stale),
+        )).all()]
+        db.session.rollback()
+        for report_id in ids:
+            self.dispatch(report_id)
+        return len(ids)
+
+    def run(self, report_id: int) -> bool:
+        """Claim, generate and store one report; False if another worker owns it"""
+        from app.extensions import db
+        from app.models.report import Report, ReportStatus
+
+        if not self._claim(report_id):
+            return False
+
+        report = db.session.get(Report, report_id)
+        if report is None:
+            return False
+        key = report.result_key or result_key(report.report_type, report.filters)
+        try:
+            data = self._cached(key)
+            if data is None:
+                data = report.generate_report()
+                if data is None:
+                    raise ValueError('Report type or filters produce no data')
+                data = json.loads(json.dumps(data, default=str))
+                self._store(key, data)
+
+            report.result = data
+            report.result_key = key
+            report.status = ReportStatus.COMPLETED.value
+            report.error = None
+            report.generated_at = datetime.utcnow()
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Report {report_id} generation failed: {e}", exc_info=True)
+            db.session.execute(
+                update(Report).where(Report.id == report_id)
+                .values(status=ReportStatus.FAILED.value, error=str(e)[:1000])
+            )
+            db.session.commit()
+            return False
+
+    def _claim(self, report_id: int) -> bool:
+        from app.extensions import db
+        from app.models.report import Report, ReportStatus
+
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.lease_seconds)
+        claimed = db.session.execute(
+            update(Report)
+            .where(Report.id == report_id, or_(
+                Report.status == ReportStatus.PENDING.value,
+                and_(Report.status == ReportStatus.PROCESSING.value, Report.started_at < stale),
+            ))
+            .values(status=ReportStatus.PROCESSING.value, started_at=now)
+        ).rowcount
+        db.session.commit()
+        return bool(claimed)
+
+    def _cached(self, key: str) -> Optional[Dict]:
+        try:
+            return cache.get(self.CACHE_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Failed to read report result cache: {e}")
+            return None
+
+    def _store(self, key: str, data: Dict):
+        try:
+            cache.set(self.CACHE_PREFIX + key, data, timeout=self.result_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write report result cache: {e}")
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so (re)start per worker process
+        if self._executor is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report-worker')
+
+    def _run_in_context(self, report_id: int):
+        from app.extensions import db
+
+        with self.app.app_context():
+            try:
+                self.run(report_id)
+            except Exception as e:
+                logger.error(f"Report {report_id} worker crashed: {e}", exc_info=True)
+            finally:
+                db.session.remove()
+
+
+# Global report engine
+report_engine = ReportEngine()
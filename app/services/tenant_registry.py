@@ -0,0 +1,163 @@
+"""
+Tenant Registry
+In-process subdomain -> (client_id, branding) map for multi-tenant requests
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRANDING = {
+    'logo_url': None,
+    'primary_color': '#007bff',
+    'secondary_color': '#6c757d',
+}
+
+# Session.info flag: a committed transaction changed tenant data
+PENDING_BUMP_KEY = 'tenant_registry_bump'
+
+# Client columns that feed the registry; other updates do not trigger a reload
+TENANT_ATTRIBUTES = ('subdomain', 'logo_url', 'settings')
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A client reachable through its own subdomain"""
+    client_id: int
+    subdomain: str
+    branding: Dict = field(default_factory=lambda: dict(DEFAULT_BRANDING))
+
+
+class TenantRegistry:
+    """
+    Subdomain lookups served from a dict loaded once per process.
+
+    Every client with a subdomain is loaded in one query, so a subdomain
+    missing from the map is a cached negative answer. Writers bump a
+    version stamp in the shared cache; each process compares its loaded
+    version with the stamp at most every check_interval seconds and
+    reloads when it differs, so resolution costs a dict lookup per request
+    and one cache read per interval.
+    """
+
+    VERSION_KEY = 'tenant_registry:version'
+
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self.app = None
+        self._tenants: Dict[str, Tenant] = {}
+        self._version: Optional[str] = None
+        self._loaded = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.check_interval = app.config.get('TENANT_REGISTRY_CHECK_INTERVAL', self.check_interval)
+
+    def resolve(self, subdomain: str) -> Optional[Tenant]:
+        """Tenant for a subdomain, or None (negative answers are served from the map too)"""
+        if time.monotonic() >= self._next_check:
+            self._refresh_if_stale()
+        return self._tenants.get(subdomain.lower())
+
+    def bump(self):
+        """Publish a new version stamp so every process reloads, and reload this one"""
+        try:
+            cache.set(self.VERSION_KEY, uuid.uuid4().hex, timeout=0)
+        except Exception as e:
+            logger.warning(f"Failed to publish tenant registry version: {e}")
+        with self._lock:
+            self._next_check = 0.0
+            self._loaded = False
+
+    def bump_after_commit(self, session=None):
+        """Bump once the surrounding transaction commits"""
+        from app.extensions import db
+
+        session = session or db.session()
+        session.info[PENDING_BUMP_KEY] = True
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                version = cache.get(self.VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Failed to read tenant registry version: {e}")
+                version = self._version
+            if self._loaded and version == self._version:
+                return
+            try:
+                self._tenants = self._load()
+                self._version = version
+                self._loaded = True
+            except Exception as e:
+                # Keep serving the previous map; retry at the next check
+                logger.error(f"Failed to load tenant registry: {e}")
+
+    def _load(self) -> Dict[str, Tenant]:
+        from app.extensions import db
+        from app.models.client import Client
+
+        def load():
+            rows = db.session.execute(
+                select(Client.id, Client.subdomain, Client.logo_url, Client.settings)
+                .where(Client.subdomain.isnot(None))
+            ).all()
+            db.session.remove()
+            return rows
+
+        if self.app is not None:
+            with self.app.app_context():
+                rows = load()
+        else:
+            rows = load()
+
+        tenants = {}
+        for client_id, subdomain, logo_url, settings in rows:
+            settings = settings or {}
+            tenants[subdomain.lower()] = Tenant(
+                client_id=client_id,
+                subdomain=subdomain,
+                branding={
+                    'logo_url': settings.get('logo_url') or logo_url,
+                    'primary_color': settings.get('primary_color') or DEFAULT_BRANDING['primary_color'],
+                    'secondary_color': settings.get('secondary_color') or DEFAULT_BRANDING['secondary_color'],
+                },
+            )
+        logger.info(f"Tenant registry loaded {len(tenants)} tenants")
+        return tenants
+
+
+def tenant_fields_changed(target) -> bool:
+    """Whether a flushed Client changed anything the registry serves"""
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in TENANT_ATTRIBUTES)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_tenant_registry_after_commit(session):
+    if session.info.pop(PENDING_BUMP_KEY, None):
+        tenant_registry.bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tenant_registry_bump(session):
+    session.info.pop(PENDING_BUMP_KEY, None)
+
+
+# Global tenant registry
+tenant_registry = TenantRegistry()
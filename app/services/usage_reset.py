@@ -0,0 +1,208 @@
+"""
+Usage Reset Engine
+Chunked, resumable monthly reset of flat-rate client usage counters
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from sqlalchemy import or_, select, update
+
+logger = logging.getLogger(__name__)
+
+# Clients whose closed period crossed either threshold get a reset notification
+NOTIFY_VOLUME_THRESHOLD = Decimal('1000')
+NOTIFY_TRANSACTIONS_THRESHOLD = 100
+
+
+@dataclass(frozen=True)
+class ResetRecord:
+    """One client's counters as they were just before the reset"""
+    client_id: int
+    volume: Decimal
+    transactions: int
+
+    @property
+    def notify(self) -> bool:
+        return self.volume > NOTIFY_VOLUME_THRESHOLD or self.transactions > NOTIFY_TRANSACTIONS_THRESHOLD
+
+
+@dataclass
+class ResetBatch:
+    """Result of one committed batch"""
+    run_key: str
+    records: List[ResetRecord] = field(default_factory=list)
+
+    @property
+    def to_notify(self) -> List[ResetRecord]:
+        return [record for record in self.records if record.notify]
+
+
+def current_month_start(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def default_run_key(client_id: Optional[int] = None, force: bool = False,
+                    now: Optional[datetime] = None) -> str:
+    """Run key for a reset: one scheduled run per month, distinct keys for forced/targeted runs"""
+    now = now or datetime.utcnow()
+    key = now.strftime('%Y-%m')
+    if client_id is not None:
+        key += f'-c{client_id}'
+    if force:
+        key += now.strftime('-f%Y%m%d%H%M%S')
+    return key
+
+
+class UsageResetEngine:
+    """
+    Resets current_month_volume/current_month_transactions in keyset batches.
+
+    Each batch locks up to batch_size eligible client rows in id order,
+    copies their counters into client_usage_history, zeroes them with one
+    UPDATE ... WHERE id IN (...) and advances the run's checkpoint, all in
+    a single transaction. Re-running the same run_key (for example from a
+    task retry) resumes after the last committed client; a completed run
+    returns its stored summary without touching any rows.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+
+    def run(self, run_key: Optional[str] = None, client_id: Optional[int] = None,
+            force: bool = False, on_batch: Optional[Callable[[ResetBatch], None]] = None) -> dict:
+        """
+        Reset every eligible client, batch by batch
+
+        Args:
+            run_key: Checkpoint key; defaults to default_run_key(client_id, force)
+            client_id: Restrict the run to one client
+            force: Reset clients already reset this month
+            on_batch: Called after each batch commits (e.g. to enqueue notifications)
+
+        Returns:
+            dict: Summary of the run
+        """
+        from app.extensions import db
+        from app.models.usage_reset import UsageResetRun
+
+        run_key = run_key or default_run_key(client_id, force)
+        run = db.session.get(UsageResetRun, run_key)
+        if run is None:
+            run = UsageResetRun(run_key=run_key, force=force, client_id=client_id,
+                                status=UsageResetRun.STATUS_RUNNING, last_client_id=0)
+            db.session.add(run)
+            db.session.commit()
+        elif run.status == UsageResetRun.STATUS_COMPLETED:
+            logger.info(f"Usage reset run {run_key} already completed")
+            return dict(run.to_dict(), already_completed=True)
+        else:
+            logger.info(f"Resuming usage reset run {run_key} after client {run.last_client_id}")
+
+        while True:
+            batch = self._reset_batch(run, client_id=run.client_id, force=run.force)
+            if batch is None:
+                break
+            if on_batch is not None and batch.records:
+                try:
+                    on_batch(batch)
+                except Exception as e:
+                    logger.error(f"Usage reset batch callback failed for run {run_key}: {e}")
+
+        run.status = UsageResetRun.STATUS_COMPLETED
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        return dict(run.to_dict(), already_completed=False)
+
+    def preview(self, client_id: Optional[int] = None, force: bool = False) -> List[ResetRecord]:
+        """Counters that a run would reset, without changing anything"""
+        from app.extensions import db
+        from app.models.client import Client
+
+        query = self._eligible(client_id, force).add_columns(
+            Client.current_month_volume, Client.current_month_transactions
+        )
+        return [ResetRecord(cid, Decimal(str(volume or 0)), transactions or 0)
+                for cid, volume, transactions in db.session.execute(query)]
+
+    def _reset_batch(self, run, client_id: Optional[int], force: bool) -> Optional[ResetBatch]:
+        from app.extensions import db
+        from app.models.client import Client
+        from app.models.usage_reset import ClientUsageHistory
+
+        now = datetime.utcnow()
+        try:
+            rows = db.session.execute(
+                self._eligible(client_id, force)
+                .add_columns(Client.current_month_volume, Client.current_month_transactions,
+                             Client.last_usage_reset)
+                .where(Client.id > run.last_client_id)
+                .limit(self.batch_size)
+                .with_for_update(of=Client)
+            ).all()
+            if not rows:
+                db.session.rollback()
+                return None
+
+            ids = [row[0] for row in rows]
+            records = [ResetRecord(row[0], Decimal(str(row[1] or 0)), row[2] or 0) for row in rows]
+
+            db.session.execute(
+                ClientUsageHistory.__table__.insert(),
+                [{
+                    'client_id': record.client_id,
+                    'period_start': row[3],
+                    'period_end': now,
+                    'month_volume': record.volume,
+                    'month_transactions': record.transactions,
+                    'run_key': run.run_key,
+                    'created_at': now,
+                } for record, row in zip(records, rows)]
+            )
+            db.session.execute(
+                update(Client)
+                .where(Client.id.in_(ids))
+                .values(current_month_volume=Decimal('0.00'),
+                        current_month_transactions=0,
+                        last_usage_reset=now)
+                .execution_options(synchronize_session=False)
+            )
+
+            run.last_client_id = ids[-1]
+            run.clients_reset = (run.clients_reset or 0) + len(records)
+            run.volume_reset = (run.volume_reset or Decimal('0.00')) + sum((r.volume for r in records), Decimal('0.00'))
+            run.transactions_reset = (run.transactions_reset or 0) + sum(r.transactions for r in records)
+            run.batches = (run.batches or 0) + 1
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logger.info(f"Usage reset run {run.run_key}: reset {len(records)} clients up to id {run.last_client_id}")
+        return ResetBatch(run_key=run.run_key, records=records)
+
+    @staticmethod
+    def _eligible(client_id: Optional[int], force: bool):
+        """Keyset-ordered ids of active flat-rate clients due for a reset"""
+        from app.models.client import Client
+        from app.models.client_package import ClientPackage, ClientType
+
+        query = (
+            select(Client.id)
+            .join(ClientPackage, Client.package_id == ClientPackage.id)
+            .where(ClientPackage.client_type == ClientType.FLAT_RATE, Client.is_active == True)
+            .order_by(Client.id)
+        )
+        if client_id is not None:
+            query = query.where(Client.id == client_id)
+        if not force:
+            query = query.where(or_(Client.last_usage_reset.is_(None),
+                                    Client.last_usage_reset < current_month_start()))
+        return query
+
+
+# Global usage reset engine
+usage_reset_engine = UsageResetEngine()
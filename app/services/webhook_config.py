@@ -0,0 +1,190 @@
+"""
+Webhook Config Cache
+Per-client webhook settings (status, secret, URL, events) served without DB round trips
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+# Session.info key collecting client ids to invalidate once the transaction commits
+PENDING_INVALIDATIONS_KEY = 'webhook_config_invalidations'
+
+# Client columns a WebhookConfig is built from
+WEBHOOK_CONFIG_ATTRIBUTES = ('is_active', 'settings')
+
+
+@dataclass(frozen=True)
+class WebhookConfig:
+    """What webhook handling needs to know about a client"""
+    client_id: int
+    exists: bool = True
+    is_active: bool = False
+    secret: Optional[str] = None
+    url: Optional[str] = None
+    events: Tuple[str, ...] = ()
+    enabled: bool = True
+
+    def allows(self, event_type: str) -> bool:
+        """Whether the client subscribed to event_type (no list means all events)"""
+        return not self.events or event_type in self.events
+
+    def to_dict(self) -> Dict:
+        return {
+            'client_id': self.client_id,
+            'exists': self.exists,
+            'is_active': self.is_active,
+            'secret': self.secret,
+            'url': self.url,
+            'events': list(self.events),
+            'enabled': self.enabled,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'WebhookConfig':
+        return cls(
+            client_id=data['client_id'],
+            exists=data.get('exists', True),
+            is_active=data.get('is_active', False),
+            secret=data.get('secret'),
+            url=data.get('url'),
+            events=tuple(data.get('events') or ()),
+            enabled=data.get('enabled', True),
+        )
+
+    @classmethod
+    def from_row(cls, client_id: int, is_active, settings) -> 'WebhookConfig':
+        settings = settings or {}
+        return cls(
+            client_id=client_id,
+            is_active=bool(is_active),
+            secret=settings.get('webhook_secret'),
+            url=settings.get('webhook_url'),
+            events=tuple(settings.get('webhook_events') or ()),
+            enabled=settings.get('webhook_enabled') is not False,
+        )
+
+
+class WebhookConfigCache:
+    """
+    Two-level cache of WebhookConfig keyed by client id.
+
+    Lookups hit an in-process map first (local_ttl seconds), then the
+    shared Flask-Caching store (shared_ttl seconds), and only then read the
+    client's id, is_active and settings columns. Unknown client ids are
+    cached too, so probing traffic does not reach the database. Inserting
+    or deleting a Client, updating its is_active or settings, and explicit
+    calls from the webhook settings endpoints invalidate both levels after
+    the transaction commits.
+    """
+
+    CACHE_PREFIX = 'webhook_config:'
+
+    def __init__(self, shared_ttl: int = 300, local_ttl: int = 30, max_local_entries: int = 50000):
+        self.shared_ttl = shared_ttl
+        self.local_ttl = local_ttl
+        self.max_local_entries = max_local_entries
+        self._local: Dict[int, Tuple[float, WebhookConfig]] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.shared_ttl = app.config.get('WEBHOOK_CONFIG_CACHE_TTL', self.shared_ttl)
+        self.local_ttl = app.config.get('WEBHOOK_CONFIG_LOCAL_CACHE_TTL', self.local_ttl)
+
+    def get(self, client_id: int) -> WebhookConfig:
+        """Webhook configuration for a client (exists=False if there is no such client)"""
+        now = time.monotonic()
+        entry = self._local.get(client_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        config = self._get_shared(client_id)
+        if config is None:
+            config = self._load(client_id)
+            try:
+                cache.set(self.CACHE_PREFIX + str(client_id), config.to_dict(), timeout=self.shared_ttl)
+            except Exception as e:
+                logger.warning(f"Failed to write shared webhook config cache: {e}")
+        self._store_local(client_id, config)
+        return config
+
+    def invalidate(self, *client_ids: int):
+        """Drop cached configuration for the given clients"""
+        client_ids = [cid for cid in client_ids if cid is not None]
+        if not client_ids:
+            return
+        with self._lock:
+            for client_id in client_ids:
+                self._local.pop(client_id, None)
+        try:
+            cache.delete_many(*[self.CACHE_PREFIX + str(cid) for cid in client_ids])
+        except Exception as e:
+            logger.warning(f"Failed to invalidate shared webhook config cache: {e}")
+
+    def invalidate_after_commit(self, client_id: int, session=None):
+        """Invalidate now and again after the surrounding transaction commits"""
+        from app.extensions import db
+
+        self.invalidate(client_id)
+        session = session or db.session()
+        session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).add(client_id)
+
+    def _load(self, client_id: int) -> WebhookConfig:
+        from app.extensions import db
+        from app.models.client import Client
+
+        row = db.session.execute(
+            select(Client.is_active, Client.settings).where(Client.id == client_id)
+        ).first()
+        if row is None:
+            return WebhookConfig(client_id=client_id, exists=False)
+        return WebhookConfig.from_row(client_id, row[0], row[1])
+
+    def _get_shared(self, client_id: int) -> Optional[WebhookConfig]:
+        try:
+            data = cache.get(self.CACHE_PREFIX + str(client_id))
+        except Exception as e:
+            logger.warning(f"Failed to read shared webhook config cache: {e}")
+            return None
+        return WebhookConfig.from_dict(data) if data else None
+
+    def _store_local(self, client_id: int, config: WebhookConfig):
+        expires = time.monotonic() + self.local_ttl
+        with self._lock:
+            if len(self._local) >= self.max_local_entries:
+                now = time.monotonic()
+                self._local = {k: v for k, v in self._local.items() if v[0] > now}
+                if len(self._local) >= self.max_local_entries:
+                    self._local.clear()
+            self._local[client_id] = (expires, config)
+
+
+def webhook_config_fields_changed(target) -> bool:
+    """Whether a flushed Client changed anything its WebhookConfig is built from"""
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in WEBHOOK_CONFIG_ATTRIBUTES)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_webhook_configs(session):
+    client_ids = session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+    if client_ids:
+        webhook_config_cache.invalidate(*client_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_webhook_config_invalidations(session):
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
+
+
+# Global webhook config cache
+webhook_config_cache = WebhookConfigCache()
@@ -0,0 +1,532 @@
+"""
+Webhook Dispatcher
+Transactional outbox for merchant webhooks, delivered by background workers
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import and_, event, func, or_, select, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Session.info flag set by enqueue(); the after_commit hook wakes the dispatcher
+PENDING_WAKE_KEY = 'webhook_dispatcher_wake'
+
+USER_AGENT = 'CPGateway-Webhook/1.0'
+
+
+def _percentile(samples: List[float], pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return round(ordered[index], 2)
+
+
+def payment_payload(payment) -> Dict:
+    """Webhook representation of a payment"""
+    status = payment.status
+    return {
+        'id': payment.id,
+        'client_id': payment.client_id,
+        'platform_id': payment.platform_id,
+        'amount': str(payment.amount) if payment.amount is not None else None,
+        'currency': payment.currency,
+        'fiat_amount': str(payment.fiat_amount) if payment.fiat_amount is not None else None,
+        'fiat_currency': payment.fiat_currency,
+        'status': status.value if hasattr(status, 'value') else status,
+        'transaction_id': payment.transaction_id,
+        'created_at': payment.created_at.isoformat() if payment.created_at else None,
+        'updated_at': payment.updated_at.isoformat() if payment.updated_at else None,
+    }
+
+
+class EndpointState:
+    """Concurrency slots, circuit breaker and latency samples for one merchant endpoint"""
+
+    def __init__(self, max_concurrency: int, sample_size: int):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # monotonic; 0 while the breaker is closed
+        self.probing = False
+        self.latencies: Deque[float] = deque(maxlen=sample_size)
+
+    def breaker_state(self, now: float) -> str:
+        if not self.open_until:
+            return 'closed'
+        return 'open' if now < self.open_until else 'half_open'
+
+    def free_slots(self, now: float) -> int:
+        """How many more deliveries may start now"""
+        state = self.breaker_state(now)
+        if state == 'open':
+            return 0
+        if state == 'half_open':
+            # One probe at a time decides whether the breaker closes again
+            return 0 if self.probing or self.in_flight else 1
+        return max(0, self.max_concurrency - self.in_flight)
+
+
+class WebhookDispatcher:
+    """
+    Outbox-based merchant webhook delivery.
+
+    enqueue() adds a WebhookDelivery row to the caller's session, so the
+    event commits or rolls back together with the change it describes.
+    A dispatcher thread per process claims due rows with SELECT ... FOR
+    UPDATE SKIP LOCKED under a short lease and hands them to a worker pool
+    that POSTs over per-thread keep-alive connection pools. A claim never
+    takes more rows than there are idle workers, so every leased row starts
+    at once and its lease only has to outlast one request. Bodies are
+    signed with the client's ClientApiKey.generate_webhook_signature.
+
+    Each endpoint URL has its own concurrency cap and circuit breaker;
+    endpoints without a free slot are excluded from the claim query, so a
+    slow merchant cannot fill the batch. After breaker_threshold consecutive
+    failures an endpoint is skipped for breaker_cooldown seconds, then one
+    probe decides whether the breaker closes again. Failures are retried
+    with exponential backoff and equal jitter until max_attempts. stats()
+    reports queue depth, per-endpoint breaker state and delivery latency
+    percentiles.
+    """
+
+    def __init__(self, workers: int = 8, max_per_endpoint: int = 2, poll_interval: float = 2.0,
+                 claim_batch: int = 100, lease_seconds: int = 60, request_timeout: float = 10.0,
+                 max_attempts: int = 8, backoff_base: float = 10.0, backoff_max: float = 3600.0,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 60.0, sample_size: int = 1000):
+        self.workers = workers
+        self.max_per_endpoint = max_per_endpoint
+        self.poll_interval = poll_interval
+        self.claim_batch = claim_batch
+        self.lease_seconds = lease_seconds
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.sample_size = sample_size
+        self.enabled = True
+
+        self.app = None
+        self._endpoints: Dict[str, EndpointState] = {}
+        self._latencies: Deque[float] = deque(maxlen=sample_size)
+        self._state_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._local = threading.local()
+        self._queue_depth: Dict[str, int] = {}
+        self._stats = {
+            'enqueued': 0,
+            'delivered': 0,
+            'retried': 0,
+            'failed': 0,
+            'breaker_opened': 0,
+        }
+
+    def init_app(self, app):
+        """Read configuration and start the dispatcher for this process"""
+        self.app = app
+        self.enabled = app.config.get('WEBHOOK_DISPATCH_ENABLED', self.enabled)
+        self.workers = app.config.get('WEBHOOK_WORKERS', self.workers)
+        self.max_per_endpoint = app.config.get('WEBHOOK_MAX_PER_ENDPOINT', self.max_per_endpoint)
+        self.poll_interval = app.config.get('WEBHOOK_POLL_INTERVAL', self.poll_interval)
+        self.request_timeout = app.config.get('WEBHOOK_REQUEST_TIMEOUT', self.request_timeout)
+        # The lease must cover signing plus a request that runs into its timeout
+        self.lease_seconds = max(app.config.get('WEBHOOK_LEASE_SECONDS', self.lease_seconds),
+                                 int(self.request_timeout * 2) + 5)
+        self.max_attempts = app.config.get('WEBHOOK_MAX_ATTEMPTS', self.max_attempts)
+        self.backoff_base = app.config.get('WEBHOOK_BACKOFF_BASE', self.backoff_base)
+        self.backoff_max = app.config.get('WEBHOOK_BACKOFF_MAX', self.backoff_max)
+        self.breaker_threshold = app.config.get('WEBHOOK_BREAKER_THRESHOLD', self.breaker_threshold)
+        self.breaker_cooldown = app.config.get('WEBHOOK_BREAKER_COOLDOWN', self.breaker_cooldown)
+
+        if not self.enabled:
+            app.logger.info("Webhook dispatcher disabled; deliveries stay queued")
+            return
+        self._ensure_started()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, client_id: int, event_type: str, data: Dict, url: Optional[str] = None):
+        """
+        Add a delivery to the current session (committed by the caller)
+
+        Args:
+            client_id: Merchant the event belongs to; its API key signs the body
+            event_type: e.g. 'payment_created', 'payment_status_changed'
+            data: Event data
+            url: Endpoint to call; defaults to the client's configured webhook URL
+
+        Returns:
+            The pending WebhookDelivery, or None if no endpoint is configured
+        """
+        from app.extensions import db
+        from app.models.webhook_delivery import WebhookDelivery
+
+        url = url or self._client_endpoint(client_id, event_type)
+        if not url:
+            return None
+
+        now = datetime.utcnow()
+        body = json.dumps({
+            'event_id': uuid.uuid4().hex,
+            'event_type': event_type,
+            'client_id': client_id,
+            'created_at': now.isoformat(),
+            'data': data,
+        }, default=str, separators=(',', ':'))
+
+        delivery = WebhookDelivery(
+            client_id=client_id,
+            event_type=event_type,
+            endpoint_url=url,
+            payload=body,
+            status=WebhookDelivery.STATUS_PENDING,
+            next_attempt_at=now,
+        )
+        db.session.add(delivery)
+        db.session.info[PENDING_WAKE_KEY] = True
+        self._incr('enqueued')
+        return delivery
+
+    def wake(self):
+        """Ask the dispatcher to poll now instead of at the next interval"""
+        if self.enabled and self.app is not None:
+            self._ensure_started()
+            self._wake.set()
+
+    def stats(self) -> Dict:
+        """Counters, queue depth, breaker states and latency percentiles (ms)"""
+        now = time.monotonic()
+        with self._state_lock:
+            stats = dict(self._stats)
+            latencies = list(self._latencies)
+            endpoints = {
+                endpoint: {
+                    'in_flight': state.in_flight,
+                    'breaker': state.breaker_state(now),
+                    'consecutive_failures': state.consecutive_failures,
+                    'p95_ms': _percentile(list(state.latencies), 95),
+                }
+                for endpoint, state in self._endpoints.items()
+            }
+            stats['queue_depth'] = dict(self._queue_depth)
+        stats['in_flight'] = sum(e['in_flight'] for e in endpoints.values())
+        stats['latency_ms'] = {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'samples': len(latencies),
+        }
+        stats['endpoints'] = endpoints
+        return stats
+
+    # ------------------------------------------------------------------
+    # Dispatcher side
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so (re)start per worker process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._endpoints = {}
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='webhook-worker')
+            self._thread = threading.Thread(target=self._run, name='webhook-dispatcher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.dispatch_due()
+            except Exception as e:
+                logger.error(f"Webhook dispatch cycle failed: {e}", exc_info=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def dispatch_due(self) -> int:
+        """Claim due deliveries that have a free endpoint slot and submit them to the workers"""
+        from app.models.webhook_delivery import WebhookDelivery as D
+
+        now = datetime.utcnow()
+        due = or_(
+            and_(D.status == D.STATUS_PENDING, D.next_attempt_at <= now),
+            and_(D.status == D.STATUS_DELIVERING, D.locked_until < now),  # Expired lease
+        )
+        claimed = []
+        try:
+            depth = self._claim(due, now, claimed)
+        except Exception:
+            for _, endpoint in claimed:
+                self._release(endpoint)
+            raise
+
+        with self._state_lock:
+            self._queue_depth = {status: count for status, count in depth}
+
+        for row, endpoint in claimed:
+            try:
+                self._executor.submit(self._deliver, row.id, row.client_id, row.endpoint_url,
+                                      row.payload, row.attempts, endpoint)
+            except RuntimeError:
+                # Executor shut down; the lease expires and another pass reclaims the row
+                self._release(endpoint)
+        return len(claimed)
+
+    def _claim(self, due, now: datetime, claimed: List) -> List:
+        """Lease due rows into `claimed`, defer rows of open breakers; returns queue depth"""
+        from app.extensions import db
+        from app.models.webhook_delivery import WebhookDelivery as D
+
+        mono = time.monotonic()
+        with self._state_lock:
+            # Saturated endpoints and open breakers are skipped in SQL so they cannot fill the batch
+            blocked = [url for url, state in self._endpoints.items() if state.free_slots(mono) <= 0]
+            # Only lease what the workers can start now; a row waiting in the executor
+            # queue could outlive its lease and be claimed again by another process
+            capacity = self.workers - sum(state.in_flight for state in self._endpoints.values())
+
+        query = (
+            select(D.id, D.client_id, D.endpoint_url, D.payload, D.attempts)
+            .where(due)
+            .order_by(D.next_attempt_at)
+            .limit(max(0, min(self.claim_batch, capacity)))
+            .with_for_update(skip_locked=True)
+        )
+        if blocked:
+            query = query.where(D.endpoint_url.notin_(blocked))
+
+        with db.engine.begin() as conn:
+            rows = conn.execute(query).all() if capacity > 0 else []
+
+            with self._state_lock:
+                for row in rows:
+                    if len(claimed) >= capacity:
+                        break
+                    state = self._state(row.endpoint_url)
+                    if state.free_slots(mono) <= 0:
+                        continue  # Stays due; picked up once a slot frees
+                    if state.breaker_state(mono) == 'half_open':
+                        state.probing = True
+                    state.in_flight += 1
+                    claimed.append((row, row.endpoint_url))
+
+            if claimed:
+                conn.execute(
+                    update(D.__table__)
+                    .where(D.__table__.c.id.in_([row.id for row, _ in claimed]))
+                    .values(status=D.STATUS_DELIVERING, locked_until=now + timedelta(seconds=self.lease_seconds))
+                )
+
+            return conn.execute(
+                select(D.status, func.count(D.id))
+                .where(D.status.in_([D.STATUS_PENDING, D.STATUS_DELIVERING]))
+                .group_by(D.status)
+            ).all()
+
+    def _deliver(self, delivery_id: int, client_id: int, url: str, payload: str,
+                 attempts: int, endpoint: str):
+        status_code = None
+        error = None
+        elapsed_ms = None
+        try:
+            with self.app.app_context():
+                signature = self._sign(client_id, payload)
+                if signature is None:
+                    self._finish(delivery_id, attempts + 1, endpoint, None,
+                                 'No active API key with a webhook secret', permanent=True)
+                    return
+
+                headers = {
+                    'Content-Type': 'application/json',
+                    'User-Agent': USER_AGENT,
+                    'X-Webhook-Id': str(delivery_id),
+                    'X-Webhook-Timestamp': str(int(time.time())),
+                    'X-Webhook-Signature': signature,
+                }
+                started = time.monotonic()
+                try:
+                    response = self._session().post(url, data=payload.encode('utf-8'),
+                                                    headers=headers, timeout=self.request_timeout,
+                                                    allow_redirects=False)
+                    status_code = response.status_code
+                    response.close()
+                except requests.RequestException as e:
+                    error = f"{type(e).__name__}: {e}"
+                elapsed_ms = (time.monotonic() - started) * 1000.0
+
+                if status_code is not None and 200 <= status_code < 300:
+                    self._finish(delivery_id, attempts + 1, endpoint, status_code, None,
+                                 elapsed_ms=elapsed_ms)
+                else:
+                    self._finish(delivery_id, attempts + 1, endpoint, status_code,
+                                 error or f"HTTP {status_code}", elapsed_ms=elapsed_ms)
+        except Exception as e:
+            logger.error(f"Webhook delivery {delivery_id} crashed: {e}", exc_info=True)
+            self._release(endpoint)
+
+    def _finish(self, delivery_id: int, attempts: int, endpoint: str, status_code: Optional[int],
+                error: Optional[str], elapsed_ms: Optional[float] = None, permanent: bool = False):
+        """Record the outcome, update the endpoint's breaker and schedule any retry"""
+        from app.extensions import db
+        from app.models.webhook_delivery import WebhookDelivery as D
+
+        now = datetime.utcnow()
+        values = {
+            'attempts': attempts,
+            'last_attempt_at': now,
+            'last_status_code': status_code,
+            'last_error': error[:1000] if error else None,
+            'locked_until': None,
+            'updated_at': now,
+        }
+        if error is None:
+            values.update(status=D.STATUS_DELIVERED, delivered_at=now)
+            outcome = 'delivered'
+        elif permanent or attempts >= self.max_attempts:
+            values.update(status=D.STATUS_FAILED)
+            outcome = 'failed'
+        else:
+            values.update(status=D.STATUS_PENDING,
+                          next_attempt_at=now + timedelta(seconds=self._backoff(attempts)))
+            outcome = 'retried'
+
+        # Endpoint health: 4xx means the endpoint answered, so only 5xx/timeouts trip the breaker
+        if permanent:
+            healthy = None  # Never reached the endpoint
+        else:
+            healthy = error is None or (status_code is not None and status_code < 500)
+        self._release(endpoint, success=healthy, elapsed_ms=elapsed_ms, outcome=outcome)
+
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(update(D.__table__).where(D.__table__.c.id == delivery_id).values(**values))
+        except Exception as e:
+            # The lease expires and the row is retried; the receiver dedupes on X-Webhook-Id
+            logger.error(f"Failed to record webhook delivery {delivery_id} outcome: {e}")
+
+        if outcome == 'failed':
+            logger.warning(f"Webhook delivery {delivery_id} to {endpoint} failed after {attempts} attempts: {error}")
+
+    def _release(self, endpoint: str, success: Optional[bool] = None,
+                 elapsed_ms: Optional[float] = None, outcome: Optional[str] = None):
+        now = time.monotonic()
+        with self._state_lock:
+            state = self._state(endpoint)
+            state.in_flight = max(0, state.in_flight - 1)
+            was_probe = state.probing
+            state.probing = False
+            if elapsed_ms is not None:
+                state.latencies.append(elapsed_ms)
+                self._latencies.append(elapsed_ms)
+            if outcome:
+                self._stats[outcome] += 1
+
+            if success is True:
+                state.consecutive_failures = 0
+                state.open_until = 0.0
+            elif success is False:
+                state.consecutive_failures += 1
+                if was_probe or state.consecutive_failures >= self.breaker_threshold:
+                    if state.breaker_state(now) != 'open':
+                        self._stats['breaker_opened'] += 1
+                        logger.warning(f"Webhook circuit opened for {endpoint} "
+                                       f"after {state.consecutive_failures} consecutive failures")
+                    state.open_until = now + self.breaker_cooldown
+        # A worker is free again; claim the next due row now rather than at the next poll
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential delay with equal jitter: half fixed, half random"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _session(self) -> requests.Session:
+        """Per-thread session whose adapter keeps connections alive across deliveries"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(1, self.max_per_endpoint), max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._local.session = session
+        return session
+
+    def _state(self, endpoint: str) -> EndpointState:
+        state = self._endpoints.get(endpoint)
+        if state is None:
+            state = self._endpoints[endpoint] = EndpointState(self.max_per_endpoint, self.sample_size)
+        return state
+
+    @staticmethod
+    def _sign(client_id: int, payload: str) -> Optional[str]:
+        """Sign with the client's newest active API key that has a webhook secret"""
+        from app.models.api_key import ClientApiKey
+
+        api_key = (
+            ClientApiKey.query
+            .filter(ClientApiKey.client_id == client_id,
+                    ClientApiKey.is_active == True,
+                    ClientApiKey.webhook_secret.isnot(None))
+            .order_by(ClientApiKey.created_at.desc())
+            .first()
+        )
+        return api_key.generate_webhook_signature(payload) if api_key else None
+
+    @staticmethod
+    def _client_endpoint(client_id: int, event_type: str) -> Optional[str]:
+        from app.services.webhook_config import webhook_config_cache
+
+        config = webhook_config_cache.get(client_id)
+        if not config.url or not config.enabled or not config.allows(event_type):
+            return None
+        return config.url
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._state_lock:
+            self._stats[name] += amount
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_dispatcher_after_commit(session):
+    if session.info.pop(PENDING_WAKE_KEY, None):
+        webhook_dispatcher.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dispatcher_wake(session):
+    session.info.pop(PENDING_WAKE_KEY, None)
+
+
+# Global webhook dispatcher
+webhook_dispatcher = WebhookDispatcher()
@@ -6,9 +6,11 @@ Automated tasks for resetting client monthly usage counters.
 from datetime import datetime, timedelta
 from decimal import Decimal
 from celery import Celery
+from celery.schedules import crontab
 from app.extensions import db
 from app.models.client import Client
 from app.models.client_package import ClientType
+from app.services.usage_reset import usage_reset_engine, default_run_key
 from app.utils.notifications import send_admin_notification, send_client_notification
 
 
@@ -38,90 +40,92 @@ def create_celery_app(app=None):
 celery = create_celery_app()
 
 
-@celery.task(bind=True)
-def reset_monthly_usage_task(self, client_id=None, force=False):
+@celery.task(bind=True, max_retries=3)
+def reset_monthly_usage_task(self, client_id=None, force=False, run_key=None):
     """
     Celery task to reset monthly usage for flat-rate clients.
     
+    Clients are reset in checkpointed batches; a retry passes the same
+    run_key and resumes after the last committed batch.
+    
     Args:
         client_id (int, optional): Reset specific client only
         force (bool): Force reset even if already reset this month
+        run_key (str, optional): Checkpoint key of the run to resume
     
     Returns:
         dict: Summary of reset operation
     """
+    run_key = run_key or default_run_key(client_id, force)
+    
+    def enqueue_notifications(batch):
+        # One task per batch instead of one per client
+        records = [(r.client_id, float(r.volume), r.transactions) for r in batch.to_notify]
+        if records:
+            send_client_usage_reset_notifications.delay(records)
     
     try:
-        # Build query for flat-rate clients
-        query = db.session.query(Client).join(Client.package).filter(
-            Client.package.has(client_type=ClientType.FLAT_RATE),
-            Client.is_active == True
+        result = usage_reset_engine.run(
+            run_key=run_key,
+            client_id=client_id,
+            force=force,
+            on_batch=enqueue_notifications
         )
+    except Exception as e:
+        raise self.retry(
+            countdown=300,
+            exc=e,
+            kwargs={'client_id': client_id, 'force': force, 'run_key': run_key}
+        )
+    
+    # Prepare summary
+    summary = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'run_key': run_key,
+        'clients_processed': result['clients_reset'],
+        'clients_reset': result['clients_reset'],
+        'total_volume_reset': result['total_volume_reset'],
+        'total_transactions_reset': result['total_transactions_reset'],
+        'batches': result['batches'],
+        'errors': [],
+        'task_id': self.request.id
+    }
+    
+    # Send admin notification with summary (once, from the run that completed it)
+    if summary['clients_reset'] > 0 and not result['already_completed']:
+        send_admin_reset_summary.delay(summary)
+    
+    return summary
+
+
+def _notify_usage_reset(client, volume_reset, transactions_reset):
+    """Send the usage reset email for one client"""
+    subject = "Monthly Usage Reset - CPGateway"
+    message = f"""
+        Dear {client.company_name},
         
-        # Filter by specific client if requested
-        if client_id:
-            query = query.filter(Client.id == client_id)
-        
-        # Filter by reset eligibility (unless forced)
-        if not force:
-            current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            query = query.filter(
-                db.or_(
-                    Client.last_usage_reset.is_(None),
-                    Client.last_usage_reset < current_month_start
-                )
-            )
-        
-        clients = query.all()
-        
-        reset_count = 0
-        total_volume_reset = Decimal('0.00')
-        total_transactions_reset = 0
-        errors = []
+        Your monthly usage counters have been reset for the new billing period.
         
-        for client in clients:
-            try:
-                # Record pre-reset values
-                old_volume = client.current_month_volume or Decimal('0.00')
-                old_transactions = client.current_month_transactions or 0
-                
-                # Perform reset
-                client.reset_monthly_usage()
-                
-                reset_count += 1
-                total_volume_reset += old_volume
-                total_transactions_reset += old_transactions
-                
-                # Send notification to client if they had significant usage
-                if old_volume > 1000 or old_transactions > 100:
-                    send_client_usage_reset_notification.delay(client.id, float(old_volume), old_transactions)
-                
-            except Exception as e:
-                error_msg = f"Failed to reset client {client.id} ({client.company_name}): {str(e)}"
-                errors.append(error_msg)
-                self.retry(countdown=60, max_retries=3)
-        
-        # Prepare summary
-        summary = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'clients_processed': len(clients),
-            'clients_reset': reset_count,
-            'total_volume_reset': float(total_volume_reset),
-            'total_transactions_reset': total_transactions_reset,
-            'errors': errors,
-            'task_id': self.request.id
-        }
+        Previous Month Summary:
+        - Volume Processed: ${volume_reset:,.2f}
+        - Transactions: {transactions_reset:,}
         
-        # Send admin notification with summary
-        if reset_count > 0 or errors:
-            send_admin_reset_summary.delay(summary)
+        Your new month limits are now available:
+        - Volume Limit: ${float(client.package.max_volume_per_month or 0):,.2f}
+        - Transaction Limit: {client.package.max_transactions_per_month or 'Unlimited'}
         
-        return summary
+        View your dashboard: {client.get_dashboard_url()}
         
-    except Exception as e:
-        # Log the error and retry
-        error_msg = f"Monthly usage reset task failed: {str(e)}"
-        self.retry(countdown=300, max_retries=3, exc=e)
+        Best regards,
+        CPGateway Team
+        """
+    
+    send_client_notification(
+        client_id=client.id,
+        subject=subject,
+        message=message,
+        notification_type='usage_reset'
+    )
 
 
 @celery.task
@@ -140,33 +144,7 @@ def send_client_usage_reset_notification(client_id, volume_reset, transactions_r
         if not client:
             return {'error': f'Client {client_id} not found'}
         
-        # Send email notification
-        subject = "Monthly Usage Reset - CPGateway"
-        message = f"""
-        Dear {client.company_name},
-        
-        Your monthly usage counters have been reset for the new billing period.
-        
-        Previous Month Summary:
-        - Volume Processed: ${volume_reset:,.2f}
-        - Transactions: {transactions_reset:,}
-        
-        Your new month limits are now available:
-        - Volume Limit: ${float(client.package.max_volume_per_month or 0):,.2f}
-        - Transaction Limit: {client.package.max_transactions_per_month or 'Unlimited'}
-        
-        View your dashboard: {client.get_dashboard_url()}
-        
-        Best regards,
-        CPGateway Team
-        """
-        
-        send_client_notification(
-            client_id=client_id,
-            subject=subject,
-            message=message,
-            notification_type='usage_reset'
-        )
+        _notify_usage_reset(client, volume_reset, transactions_reset)
         
         return {'success': True, 'client_id': client_id}
         
@@ -174,6 +152,35 @@ def send_client_usage_reset_notification(client_id, volume_reset, transactions_r
         return {'error': f'Failed to send notification to client {client_id}: {str(e)}'}
 
 
+@celery.task
+def send_client_usage_reset_notifications(records):
+    """
+    Send usage reset notifications for a batch of clients.
+    
+    Args:
+        records (list): (client_id, volume_reset, transactions_reset) tuples
+    """
+    
+    clients = {
+        client.id: client
+        for client in Client.query.filter(Client.id.in_([r[0] for r in records])).all()
+    }
+    sent = 0
+    errors = []
+    for client_id, volume_reset, transactions_reset in records:
+        client = clients.get(client_id)
+        if not client:
+            errors.append(f'Client {client_id} not found')
+            continue
+        try:
+            _notify_usage_reset(client, volume_reset, transactions_reset)
+            sent += 1
+        except Exception as e:
+            errors.append(f'Failed to send notification to client {client_id}: {str(e)}')
+    
+    return {'sent': sent, 'errors': errors}
+
+
 @celery.task
 def send_admin_reset_summary(summary):
     """
@@ -447,7 +454,7 @@ def send_weekly_usage_report(report_data):
         {volume_status} {client['company_name']} ({client['package_name']})
            Volume: ${client['volume_used']:,.2f} ({client['volume_percent']:.1f}%)
            Transactions: {client['transactions_used']:,} ({client['transaction_percent']:.1f}%)
-           Margin: {margin_ok} {client['margin_status']['current_margin']:.2f}% if client['margin_status'] else 'N/A'}
+           Margin: {margin_ok} {f"{client['margin_status']['current_margin']:.2f}%" if client['margin_status'] else 'N/A'}
         """
         
         send_admin_notification(
@@ -8,6 +8,7 @@ from app.models.audit import AuditTrail
 from app.extensions import db
 from app.models.user import User
 from app.models.admin import AdminUser
+from app.services.audit_pipeline import audit_pipeline
 import logging
 import json
 from datetime import datetime
@@ -95,19 +96,17 @@ def log_security_event(event_type: str, details: Dict[str, Any], user_id: Option
             **details
         }
         
-        # Log to AuditTrail with security event type
-        audit = AuditTrail.log_action(
+        # Queue for the background audit writer; never touches the caller's session
+        audit_pipeline.submit(
             user_id=user_id,
             action_type=f'security_{event_type}',
             entity_type='security_event',
             entity_id=0,  # No specific entity
-            old_value=None,
             new_value=enhanced_details,
-            request=request
+            ip_address=ip_address,
+            user_agent=enhanced_details['user_agent']
         )
         
-        db.session.commit()
-        
         # Also log to application logger based on severity
         log_level = {
             'low': logging.INFO,
@@ -120,7 +119,6 @@ def log_security_event(event_type: str, details: Dict[str, Any], user_id: Option
         
     except Exception as e:
         logger.error(f"Failed to log security event: {e}")
-        db.session.rollback()
 
 
 def log_admin_action(action: str, target_type: str, target_id: int, description: str, 
@@ -212,19 +210,17 @@ def log_api_usage(api_key: str, endpoint: str, method: str, response_code: int,
         if error_message:
             usage_details['error_message'] = error_message
         
-        # Log to audit trail
-        audit = AuditTrail.log_action(
+        # Queue for the background audit writer
+        audit_pipeline.submit(
             user_id=None,  # API usage is not tied to a specific user
             action_type='api_usage',
             entity_type='api_endpoint',
             entity_id=0,
-            old_value=None,
             new_value=usage_details,
-            request=request
+            ip_address=usage_details['ip_address'],
+            user_agent=usage_details['user_agent']
         )
         
-        db.session.commit()
-        
         # Log anomalies
         if response_code >= 400:
             logger.warning(f"API error: {response_code} for {endpoint} with key {api_key_hash}")
@@ -233,7 +229,6 @@ def log_api_usage(api_key: str, endpoint: str, method: str, response_code: int,
         
     except Exception as e:
         logger.error(f"Failed to log API usage: {e}")
-        db.session.rollback()
 
 
 def log_client_setting_change(client_id: int, setting: str, old_value: Any, new_value: Any, 
@@ -4,6 +4,7 @@ Handles coin validation, package limits, and display formatting.
 """
 from functools import lru_cache
 from flask import current_app, g, has_request_context
+from ..services.coin_catalog import coin_catalog
 
 @lru_cache(maxsize=128)
 def get_coin_display_name(coin_symbol):
@@ -25,12 +26,8 @@ def get_allowed_coins(package_slug):
     if not package_slug:
         return []
         
-    limits = current_app.config.get('PACKAGE_COIN_LIMITS', {})
-    coin_list = current_app.config.get('COIN_LIST', [])
-    
-    # Default to starter plan if package not found
-    limit = limits.get(package_slug, limits.get('starter_flat_rate', 15))
-    return coin_list[:min(limit, len(coin_list))]
+    # Precomputed per package (unknown packages get the starter plan)
+    return list(coin_catalog.allowed_symbols(package_slug))
 
 def is_coin_allowed(client, coin_symbol):
     """
@@ -46,8 +43,7 @@ def is_coin_allowed(client, coin_symbol):
     if not client or not client.package or not coin_symbol:
         return False
         
-    allowed = get_allowed_coins(client.package.slug)
-    return coin_symbol.upper() in [c.upper() for c in allowed]
+    return coin_catalog.is_allowed(client.package.slug, coin_symbol)
 
 def get_coin_icon(coin_symbol):
     """
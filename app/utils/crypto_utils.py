@@ -1,8 +1,5 @@
 import os
 import hashlib
-import pyqrcode
-import base64
-from io import BytesIO
 from datetime import datetime
 
 def generate_address(client_id, coin='BTC'):
@@ -36,6 +33,9 @@ def create_qr(data, scale=6):
     """
     Generate a QR code from the given data and return it as a base64 encoded string.
     
+    Rendered images come from the shared QR cache; pages should link to
+    qr_url(data) instead so browsers can cache the image.
+    
     Args:
         data (str): The data to encode in the QR code
         scale (int): The scale factor for the QR code
@@ -43,21 +43,10 @@ def create_qr(data, scale=6):
     Returns:
         str: Base64 encoded PNG image data
     """
+    from app.services.qr_renderer import qr_renderer
+
     try:
-        # Generate QR code
-        qr = pyqrcode.create(data)
-        
-        # Create a buffer to save the QR code
-        buffer = BytesIO()
-        qr.png(buffer, scale=scale, quiet_zone=2)
-        
-        # Reset buffer position to the beginning
-        buffer.seek(0)
-        
-        # Encode the image as base64
-        img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        return f"data:image/png;base64,{img_str}"
+        return qr_renderer.data_uri(data, scale)
     except Exception as e:
         print(f"Error generating QR code: {e}")
         return ""
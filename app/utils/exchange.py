@@ -1,9 +1,6 @@
 from decimal import Decimal, ROUND_DOWN
-from datetime import datetime, timedelta
-from functools import lru_cache
-import requests
 from flask import current_app
-from app.extensions import cache
+from app.services.rate_engine import rate_engine
 from .crypto_config import SUPPORTED_CRYPTOCURRENCIES, get_cryptocurrency_info
 
 # Enhanced default exchange rates with multiple cryptocurrencies
@@ -18,6 +15,13 @@ for symbol, info in SUPPORTED_CRYPTOCURRENCIES.items():
         'TRY': info['default_rate_usd'] * Decimal('28.5'),  # Approximate TRY rate
     }
 
+# Quantization exponent per coin, precomputed so conversions skip the config lookup
+QUANTIZERS = {
+    symbol: Decimal(1).scaleb(-info['decimal_places'])
+    for symbol, info in SUPPORTED_CRYPTOCURRENCIES.items()
+}
+DEFAULT_QUANTIZER = Decimal('0.00000001')
+
 def get_exchange_rate(crypto_currency, fiat_currency='USD'):
     """
     Get the current exchange rate from crypto to fiat.
@@ -37,15 +41,8 @@ def get_exchange_rate(crypto_currency, fiat_currency='USD'):
         current_app.logger.error(f"Unsupported cryptocurrency: {crypto_currency}")
         return None
     
-    # Try to fetch live rate first
-    rate = _fetch_cached_rate(crypto_currency, fiat_currency)
-    
-    # Fall back to default rates
-    if rate is None and crypto_currency in DEFAULT_RATES and fiat_currency in DEFAULT_RATES[crypto_currency]:
-        rate = DEFAULT_RATES[crypto_currency][fiat_currency]
-        current_app.logger.warning(
-            f"Using default rate for {crypto_currency} -> {fiat_currency}: {rate}"
-        )
+    # Served from the rate engine snapshot; never blocks on upstream I/O
+    rate = rate_engine.get_rate(crypto_currency, fiat_currency)
     
     if rate is None:
         current_app.logger.error(
@@ -74,18 +71,53 @@ def convert_fiat_to_crypto(fiat_amount, fiat_currency, crypto_currency):
     if not rate:
         return None, None
     
-    # Get cryptocurrency info for proper decimal formatting
-    crypto_info = get_cryptocurrency_info(crypto_currency)
-    decimal_places = crypto_info['decimal_places'] if crypto_info else 8
-    
     # Calculate crypto amount: fiat_amount / rate
     crypto_amount = (Decimal(str(fiat_amount)) / rate).quantize(
-        Decimal('0.' + '0' * decimal_places),
+        QUANTIZERS.get(crypto_currency.upper(), DEFAULT_QUANTIZER),
         rounding=ROUND_DOWN
     )
     
     return crypto_amount, rate
 
+def convert_many(items, snapshot=None):
+    """
+    Convert many fiat amounts to crypto against a single rate snapshot.
+    
+    Args:
+        items (iterable): (fiat_amount, fiat_currency, crypto_currency) tuples
+        snapshot (RateSnapshot, optional): Snapshot to price against; defaults
+            to the rate engine's current snapshot
+        
+    Returns:
+        list: (crypto_amount, exchange_rate) per item, in input order;
+              (None, None) for items that cannot be converted
+    """
+    if snapshot is None:
+        snapshot = rate_engine.get_snapshot()
+    
+    # Resolve each distinct pair once, however many items share it
+    pairs = {}
+    results = []
+    for fiat_amount, fiat_currency, crypto_currency in items:
+        pair = (crypto_currency.upper(), fiat_currency.upper())
+        if pair not in pairs:
+            rate = snapshot.get(*pair) if pair[0] in SUPPORTED_CRYPTOCURRENCIES else None
+            pairs[pair] = (rate, QUANTIZERS.get(pair[0], DEFAULT_QUANTIZER))
+        rate, quantizer = pairs[pair]
+        
+        if not rate or not fiat_amount:
+            results.append((None, None))
+            continue
+        
+        amount = fiat_amount if isinstance(fiat_amount, Decimal) else Decimal(str(fiat_amount))
+        if amount <= 0:
+            results.append((None, None))
+            continue
+        
+        results.append(((amount / rate).quantize(quantizer, rounding=ROUND_DOWN), rate))
+    
+    return results
+
 def get_supported_cryptocurrencies():
     """Get list of all supported cryptocurrencies"""
     return list(SUPPORTED_CRYPTOCURRENCIES.keys())
@@ -114,52 +146,12 @@ def format_fiat_amount(amount, currency):
         return f"0 {currency}"
     return f"{amount:,.2f} {currency}"
 
-@lru_cache(maxsize=128)
-def _fetch_cached_rate(crypto_currency, fiat_currency):
-    """
-    Fetch exchange rate with caching.
-    This is a placeholder that would be replaced with actual API calls.
-    """
-    # In a real implementation, you would call an exchange API here
-    # For example, using CoinGecko, CoinMarketCap, or a crypto exchange API
-    
-    # Example with CoinGecko (uncomment and implement as needed):
-    """
-    try:
-        crypto_info = get_cryptocurrency_info(crypto_currency)
-        if not crypto_info:
-            return None
-            
-        url = f"https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            'ids': crypto_info['api_id'],
-            'vs_currencies': fiat_currency.lower(),
-            'precision': 8
-        }
-        
-        response = requests.get(url, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        
-        rate = Decimal(str(data[crypto_info['api_id']][fiat_currency.lower()]))
-        return rate
-        
-    except Exception as e:
-        current_app.logger.error(f"Error fetching exchange rate: {str(e)}")
-        return None
-    """
-    
-    # For now, return None to use the default rates
-    return None
-
-# Cache exchange rates for 5 minutes
-@cache.memoize(timeout=300)
 def get_cached_rate(crypto_currency, fiat_currency):
     """
-    Get a cached exchange rate with a 5-minute expiry.
-    Uses Flask-Caching for distributed caching.
+    Get a cached exchange rate.
+    Kept for backward compatibility; the rate engine is the only cache layer.
     """
-    return _fetch_cached_rate(crypto_currency, fiat_currency)
+    return get_exchange_rate(crypto_currency, fiat_currency)
 
 # Alias for backward compatibility
 get_exchange_rate_cached = get_cached_rate
@@ -1,7 +1,6 @@
 from decimal import Decimal, ROUND_DOWN
 from flask import current_app
 from sqlalchemy import func
-from functools import lru_cache
 from datetime import datetime, timedelta
 
 # Import models
@@ -14,6 +13,7 @@ from app.models import (
     CommissionSnapshot
 )
 from app.extensions import db
+from app.services.balance_ledger import balance_ledger
 
 
 class FinanceCalculator:
@@ -25,41 +25,52 @@ class FinanceCalculator:
         pass
 
     @staticmethod
-    @lru_cache(maxsize=128)
+    def _commission_rates(client):
+        """Client commission rates as Decimal, with the platform defaults"""
+        deposit_rate = Decimal(str(client.deposit_commission_rate)) if client.deposit_commission_rate is not None else Decimal('0.035')
+        withdrawal_rate = Decimal(str(client.withdrawal_commission_rate)) if client.withdrawal_commission_rate is not None else Decimal('0.015')
+        return deposit_rate, withdrawal_rate
+
+    @staticmethod
+    def summarize_totals(client, totals):
+        """
+        Balance and commissions for a client from its balance ledger totals
+        
+        Args:
+            client (Client): The client, for its commission rates
+            totals (LedgerTotals): The client's settled ledger totals
+            
+        Returns:
+            tuple: (balance, deposit_commission, withdrawal_commission, total_commission)
+        """
+        deposit_comm, withdrawal_comm, total_comm = totals.commission(*FinanceCalculator._commission_rates(client))
+        balance = totals.deposit_total - deposit_comm - totals.withdrawal_total - withdrawal_comm
+        return (
+            balance.quantize(Decimal('0.00000001'), rounding=ROUND_DOWN),
+            deposit_comm.quantize(Decimal('0.00000001'), ROUND_DOWN),
+            withdrawal_comm.quantize(Decimal('0.00000001'), ROUND_DOWN),
+            total_comm.quantize(Decimal('0.00000001'), ROUND_DOWN)
+        )
+
+    @staticmethod
     def calculate_client_balance(client_id):
         """
         Calculate a client's available balance after commissions.
         
+        Totals come from the client's balance ledger row rather than a scan
+        of payments and withdrawal requests.
+        
         Args:
             client_id (int): The client's ID
             
         Returns:
             Decimal: The client's available balance
         """
-        client = Client.query.get(client_id)
+        client = db.session.get(Client, client_id)
         if not client:
             return Decimal('0.0')
 
-        # Get total deposits (completed payments)
-        deposits_result = db.session.query(func.sum(Payment.amount))\
-            .filter_by(client_id=client_id, status=PaymentStatus.APPROVED)\
-            .scalar() 
-        deposits = Decimal(str(deposits_result)) if deposits_result is not None else Decimal('0.0')
-
-        # Get total withdrawals (approved requests)
-        withdrawals_result = db.session.query(func.sum(WithdrawalRequest.amount))\
-            .filter_by(client_id=client_id, status=WithdrawalStatus.APPROVED)\
-            .scalar()
-        withdrawals = Decimal(str(withdrawals_result)) if withdrawals_result is not None else Decimal('0.0')
-
-        # Ensure commission rates are Decimal
-        deposit_rate = Decimal(str(client.deposit_commission_rate)) if client.deposit_commission_rate is not None else Decimal('0.035')
-        withdrawal_rate = Decimal(str(client.withdrawal_commission_rate)) if client.withdrawal_commission_rate is not None else Decimal('0.015')
-        deposit_comm = deposits * deposit_rate
-        withdrawal_comm = withdrawals * withdrawal_rate
-
-        balance = deposits - deposit_comm - withdrawals - withdrawal_comm
-        return balance.quantize(Decimal('0.00000001'), rounding=ROUND_DOWN)
+        return FinanceCalculator.summarize_totals(client, balance_ledger.get_totals(client_id))[0]
 
     @staticmethod
     def calculate_commission(client_id):
@@ -72,34 +83,12 @@ class FinanceCalculator:
         Returns:
             tuple: (deposit_commission, withdrawal_commission, total_commission)
         """
-        client = Client.query.get(client_id)
+        client = db.session.get(Client, client_id)
         if not client:
             return (Decimal('0.0'), Decimal('0.0'), Decimal('0.0'))
 
-        deposits_result = db.session.query(func.sum(Payment.amount))\
-            .filter_by(client_id=client_id, status=PaymentStatus.APPROVED)\
-            .scalar()
-        deposits = Decimal(str(deposits_result)) if deposits_result is not None else Decimal('0.0')
-
-        withdrawals_result = db.session.query(func.sum(WithdrawalRequest.amount))\
-            .filter_by(client_id=client_id, status=WithdrawalStatus.APPROVED)\
-            .scalar()
-        withdrawals = Decimal(str(withdrawals_result)) if withdrawals_result is not None else Decimal('0.0')
-
-        # Ensure commission rates are Decimal
-        deposit_rate = Decimal(str(client.deposit_commission_rate)) if client.deposit_commission_rate is not None else Decimal('0.035')
-        withdrawal_rate = Decimal(str(client.withdrawal_commission_rate)) if client.withdrawal_commission_rate is not None else Decimal('0.015')
-        deposit_comm = deposits * deposit_rate
-        withdrawal_comm = withdrawals * withdrawal_rate
-        total_comm = deposit_comm + withdrawal_comm
-
-        return (
-            deposit_comm.quantize(Decimal('0.00000001'), ROUND_DOWN),
-            withdrawal_comm.quantize(Decimal('0.00000001'), ROUND_DOWN),
-            total_comm.quantize(Decimal('0.00000001'), ROUND_DOWN)
-        )
+        return FinanceCalculator.summarize_totals(client, balance_ledger.get_totals(client_id))[1:]
 
-    
     @staticmethod
     def validate_withdrawal_amount(client_id, amount):
         """
@@ -120,30 +109,18 @@ class FinanceCalculator:
         """
         Returns the total gross deposits for a client (before commission deduction)
         """
-        from decimal import Decimal
-        client = Client.query.get(client_id)
-        if not client:
+        if not db.session.get(Client, client_id):
             return Decimal('0.0')
-        deposits_result = db.session.query(func.sum(Payment.amount))\
-            .filter_by(client_id=client_id, status=PaymentStatus.APPROVED)\
-            .scalar()
-        deposits = Decimal(str(deposits_result)) if deposits_result is not None else Decimal('0.0')
-        return deposits
+        return balance_ledger.get_totals(client_id).deposit_total
 
     @staticmethod
     def get_gross_withdrawals(client_id):
         """
         Returns the total gross withdrawals for a client (before commission deduction)
         """
-        from decimal import Decimal
-        client = Client.query.get(client_id)
-        if not client:
+        if not db.session.get(Client, client_id):
             return Decimal('0.0')
-        withdrawals_result = db.session.query(func.sum(WithdrawalRequest.amount))\
-            .filter_by(client_id=client_id, status=WithdrawalStatus.APPROVED)\
-            .scalar()
-        withdrawals = Decimal(str(withdrawals_result)) if withdrawals_result is not None else Decimal('0.0')
-        return withdrawals
+        return balance_ledger.get_totals(client_id).withdrawal_total
 
     @staticmethod
     def get_commission_stats():
@@ -1,6 +1,7 @@
 from sqlalchemy import func
 from decimal import Decimal
 from app.models import db, Payment, WithdrawalRequest, PaymentStatus, Client, Client
+from app.services.balance_ledger import balance_ledger
 
 class FinanceCalculator:
     @staticmethod
@@ -78,24 +79,16 @@ class FinanceCalculator:
             if not client:
                 return Decimal('0.0')
 
-            # Get total deposits (completed payments)
-            deposits_result = db.session.query(func.sum(Payment.amount))\
-                .filter_by(client_id=client_id, status=PaymentStatus.COMPLETED)\
-                .scalar() 
-            deposits = Decimal(str(deposits_result)) if deposits_result is not None else Decimal('0.0')
-
-            # Get total withdrawals (approved requests)
-            withdrawals_result = db.session.query(func.sum(WithdrawalRequest.amount))\
-                .filter_by(client_id=client_id, status=PaymentStatus.COMPLETED)\
-                .scalar()
-            withdrawals = Decimal(str(withdrawals_result)) if withdrawals_result is not None else Decimal('0.0')
+            # Settled totals from the client's balance ledger row
+            totals = balance_ledger.get_totals(client_id)
+            deposits = totals.deposit_total
+            withdrawals = totals.withdrawal_total
 
             # Calculate commissions
             deposit_rate = client.deposit_commission_rate if hasattr(client, 'deposit_commission_rate') and client.deposit_commission_rate else Decimal('0.035')
             withdrawal_rate = client.withdrawal_commission_rate if hasattr(client, 'withdrawal_commission_rate') and client.withdrawal_commission_rate else Decimal('0.015')
             
-            deposit_comm = deposits * Decimal(str(deposit_rate))
-            withdrawal_comm = withdrawals * Decimal(str(withdrawal_rate))
+            deposit_comm, withdrawal_comm, _ = totals.commission(deposit_rate, withdrawal_rate)
 
             # Balance = deposits - withdrawal_requests - commissions
             balance = deposits - withdrawals - deposit_comm - withdrawal_comm
@@ -121,25 +114,12 @@ class FinanceCalculator:
             if not client:
                 return (Decimal('0.0'), Decimal('0.0'), Decimal('0.0'))
 
-            # Get totals
-            deposits_result = db.session.query(func.sum(Payment.amount))\
-                .filter_by(client_id=client_id, status=PaymentStatus.COMPLETED)\
-                .scalar()
-            deposits = Decimal(str(deposits_result)) if deposits_result is not None else Decimal('0.0')
-
-            withdrawals_result = db.session.query(func.sum(WithdrawalRequest.amount))\
-                .filter_by(client_id=client_id, status=PaymentStatus.COMPLETED)\
-                .scalar()
-            withdrawals = Decimal(str(withdrawals_result)) if withdrawals_result is not None else Decimal('0.0')
-
             # Get commission rates
             deposit_rate = client.deposit_commission_rate if hasattr(client, 'deposit_commission_rate') and client.deposit_commission_rate else Decimal('0.035')
             withdrawal_rate = client.withdrawal_commission_rate if hasattr(client, 'withdrawal_commission_rate') and client.withdrawal_commission_rate else Decimal('0.015')
             
-            # Calculate commissions
-            deposit_comm = deposits * Decimal(str(deposit_rate))
-            withdrawal_comm = withdrawals * Decimal(str(withdrawal_rate))
-            total_comm = deposit_comm + withdrawal_comm
+            # Calculate commissions on the ledger totals
+            deposit_comm, withdrawal_comm, total_comm = balance_ledger.get_totals(client_id).commission(deposit_rate, withdrawal_rate)
 
             return (deposit_comm, withdrawal_comm, total_comm)
             
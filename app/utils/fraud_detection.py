@@ -8,13 +8,13 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
-import statistics
 from sqlalchemy import func, and_, or_
 
 from app.models.withdrawal import WithdrawalRequest, WithdrawalStatus
 from app.models.client import Client
 from app.models.user import User
 from app.models.payment import Payment
+from app.services.fraud_features import fraud_features, WithdrawalFeatures
 from app.utils.audit import log_security_event
 from app.extensions import db
 
@@ -63,20 +63,23 @@ class FraudDetectionService:
         risk_factors = []
         metadata = {}
         
+        # Windowed counts and amount statistics, shared by the analyzers below
+        features = fraud_features.get(withdrawal)
+        
         # 1. Amount-based analysis
-        amount_risk, amount_factors, amount_meta = self._analyze_withdrawal_amount(withdrawal)
+        amount_risk, amount_factors, amount_meta = self._analyze_withdrawal_amount(withdrawal, features)
         risk_score += amount_risk
         risk_factors.extend(amount_factors)
         metadata.update(amount_meta)
         
         # 2. Frequency analysis
-        freq_risk, freq_factors, freq_meta = self._analyze_withdrawal_frequency(withdrawal)
+        freq_risk, freq_factors, freq_meta = self._analyze_withdrawal_frequency(withdrawal, features)
         risk_score += freq_risk
         risk_factors.extend(freq_factors)
         metadata.update(freq_meta)
         
         # 3. Pattern analysis
-        pattern_risk, pattern_factors, pattern_meta = self._analyze_withdrawal_patterns(withdrawal)
+        pattern_risk, pattern_factors, pattern_meta = self._analyze_withdrawal_patterns(withdrawal, features)
         risk_score += pattern_risk
         risk_factors.extend(pattern_factors)
         metadata.update(pattern_meta)
@@ -88,7 +91,7 @@ class FraudDetectionService:
         metadata.update(client_meta)
         
         # 5. Time-based analysis
-        time_risk, time_factors, time_meta = self._analyze_timing_patterns(withdrawal)
+        time_risk, time_factors, time_meta = self._analyze_timing_patterns(withdrawal, features)
         risk_score += time_risk
         risk_factors.extend(time_factors)
         metadata.update(time_meta)
@@ -128,30 +131,26 @@ class FraudDetectionService:
         
         return alert
     
-    def _analyze_withdrawal_amount(self, withdrawal: WithdrawalRequest) -> Tuple[int, List[str], Dict]:
+    def _analyze_withdrawal_amount(self, withdrawal: WithdrawalRequest,
+                                   features: Optional[WithdrawalFeatures] = None) -> Tuple[int, List[str], Dict]:
         """Analyze withdrawal amount for suspicious patterns"""
         risk_score = 0
         factors = []
         metadata = {}
         
         amount = withdrawal.amount
-        client_id = withdrawal.client_id
-        
-        # Get historical withdrawals for comparison
-        historical = WithdrawalRequest.query.filter(
-            WithdrawalRequest.client_id == client_id,
-            WithdrawalRequest.id != withdrawal.id,
-            WithdrawalRequest.status != WithdrawalStatus.REJECTED
-        ).all()
-        
-        if historical:
-            amounts = [w.amount for w in historical]
-            avg_amount = statistics.mean(amounts)
-            max_amount = max(amounts)
+        features = features or fraud_features.get(withdrawal)
+        
+        # Compare against the client's other non-rejected withdrawals
+        if features.history_count:
+            avg_amount = features.history_mean
+            max_amount = features.history_max
             
             metadata['historical_avg'] = avg_amount
             metadata['historical_max'] = max_amount
-            metadata['historical_count'] = len(amounts)
+            metadata['historical_count'] = features.history_count
+            if features.history_stddev is not None:
+                metadata['historical_stddev'] = features.history_stddev
             
             # Unusually high amount
             if amount > avg_amount * 5:
@@ -184,32 +183,17 @@ class FraudDetectionService:
         
         return risk_score, factors, metadata
     
-    def _analyze_withdrawal_frequency(self, withdrawal: WithdrawalRequest) -> Tuple[int, List[str], Dict]:
+    def _analyze_withdrawal_frequency(self, withdrawal: WithdrawalRequest,
+                                      features: Optional[WithdrawalFeatures] = None) -> Tuple[int, List[str], Dict]:
         """Analyze withdrawal frequency patterns"""
         risk_score = 0
         factors = []
         metadata = {}
         
-        client_id = withdrawal.client_id
-        now = datetime.utcnow()
+        features = features or fraud_features.get(withdrawal)
         
         # Check different time windows
-        windows = {
-            'last_hour': timedelta(hours=1),
-            'last_24h': timedelta(hours=24),
-            'last_week': timedelta(days=7),
-            'last_month': timedelta(days=30)
-        }
-        
-        for window_name, window_duration in windows.items():
-            since = now - window_duration
-            
-            count = WithdrawalRequest.query.filter(
-                WithdrawalRequest.client_id == client_id,
-                WithdrawalRequest.created_at >= since,
-                WithdrawalRequest.status != WithdrawalStatus.REJECTED
-            ).count()
-            
+        for window_name, count in features.window_counts.items():
             metadata[f'count_{window_name}'] = count
             
             # Define thresholds for each window
@@ -231,25 +215,22 @@ class FraudDetectionService:
         
         return risk_score, factors, metadata
     
-    def _analyze_withdrawal_patterns(self, withdrawal: WithdrawalRequest) -> Tuple[int, List[str], Dict]:
+    def _analyze_withdrawal_patterns(self, withdrawal: WithdrawalRequest,
+                                     features: Optional[WithdrawalFeatures] = None) -> Tuple[int, List[str], Dict]:
         """Analyze patterns in withdrawal behavior"""
         risk_score = 0
         factors = []
         metadata = {}
         
-        client_id = withdrawal.client_id
+        features = features or fraud_features.get(withdrawal)
         
-        # Get recent withdrawals (last 30 days)
-        recent = WithdrawalRequest.query.filter(
-            WithdrawalRequest.client_id == client_id,
-            WithdrawalRequest.created_at >= datetime.utcnow() - timedelta(days=30),
-            WithdrawalRequest.id != withdrawal.id
-        ).order_by(WithdrawalRequest.created_at.desc()).all()
+        # Most recent withdrawals of the last 30 days (capped sample)
+        recent = features.recent
         
         if len(recent) >= 3:
             # Analyze patterns
-            amounts = [w.amount for w in recent]
-            times = [w.created_at.hour for w in recent]
+            amounts = [amount for amount, _ in recent]
+            times = [created_at.hour for _, created_at in recent]
             
             # Same amounts pattern
             if len(set(amounts)) == 1:  # All same amount
@@ -333,7 +314,8 @@ class FraudDetectionService:
         
         return risk_score, factors, metadata
     
-    def _analyze_timing_patterns(self, withdrawal: WithdrawalRequest) -> Tuple[int, List[str], Dict]:
+    def _analyze_timing_patterns(self, withdrawal: WithdrawalRequest,
+                                 features: Optional[WithdrawalFeatures] = None) -> Tuple[int, List[str], Dict]:
         """Analyze timing-based fraud indicators"""
         risk_score = 0
         factors = []
@@ -347,14 +329,11 @@ class FraudDetectionService:
         #     factors.append("withdrawal_without_recent_deposits")
         
         # Rapid succession withdrawals
-        last_withdrawal = WithdrawalRequest.query.filter(
-            WithdrawalRequest.client_id == withdrawal.client_id,
-            WithdrawalRequest.id != withdrawal.id,
-            WithdrawalRequest.created_at >= datetime.utcnow() - timedelta(minutes=30)
-        ).first()
-        
-        if last_withdrawal:
-            time_diff = (withdrawal.created_at - last_withdrawal.created_at).total_seconds() / 60
+        features = features or fraud_features.get(withdrawal)
+        last_withdrawal_at = features.last_recent_at
+        
+        if last_withdrawal_at:
+            time_diff = (withdrawal.created_at - last_withdrawal_at).total_seconds() / 60
             metadata['minutes_since_last_withdrawal'] = time_diff
             
             if time_diff < 5:
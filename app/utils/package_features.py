@@ -298,35 +298,20 @@ def get_features_for_client(client):
     Get features for a client based on their package/status
     Respects both package-based features and manual overrides
     """
-    features = set()
+    from app.services.entitlements import entitlements
     
     # Get base features from package
     if client.package and client.package.slug:
-        package_features = PACKAGE_FEATURES.get(client.package.slug, [])
-        features.update(package_features)
+        package_slug = client.package.slug
     elif hasattr(client, 'status') and client.status:
         # Fallback to status-based features
-        package_features = PACKAGE_FEATURES.get(client.status, [])
-        features.update(package_features)
+        package_slug = client.status
+    else:
+        package_slug = None
     
-    # Apply manual feature overrides from admin
-    if client.features_override:
-        try:
-            if isinstance(client.features_override, str):
-                import json
-                override = json.loads(client.features_override)
-            else:
-                override = client.features_override
-                
-            if isinstance(override, dict):
-                if override.get("add"):
-                    features.update(override["add"])
-                if override.get("remove"):
-                    features.difference_update(override["remove"])
-        except (json.JSONDecodeError, TypeError, AttributeError):
-            pass  # Ignore invalid override data
-    
-    return list(features)
+    # Apply manual feature overrides from admin (compiled and memoized)
+    features = entitlements.resolve(package_slug, client.features_override, table=PACKAGE_FEATURES)
+    return list(features.keys)
 
 def get_client_pricing_info(client):
     """Get pricing and limit information for a client"""
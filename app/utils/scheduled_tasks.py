@@ -1,14 +1,18 @@
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from app.models import CommissionSnapshot
-from app.models.client import Client
-from app.utils.finance import FinanceCalculator
+from app.services.commission_service import commission_service
 from app.extensions import db
 
 # Initialize scheduler
 scheduler = BackgroundScheduler()
 
+def _previous_month_bounds():
+    """[start, end) of the calendar month before the current one"""
+    first_day = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_of_month = (first_day - timedelta(days=1)).replace(day=1)
+    return start_of_month, first_day
+
 @scheduler.scheduled_job('cron', day='1', hour='0')
 def create_monthly_commission_snapshots():
     """
@@ -17,36 +21,12 @@ def create_monthly_commission_snapshots():
     print("Creating monthly commission snapshots...")
     
     try:
-        # Get all active clients
-        clients = Client.query.all()
-        
-        for client in clients:
-            try:
-                # Calculate commissions
-                deposit_commission, withdrawal_commission, total_commission = FinanceCalculator().calculate_commission(client.id)
-                
-                # Create snapshot for this client
-                now = datetime.utcnow()
-                first_day = now.replace(day=1)
-                last_month = first_day - timedelta(days=1)
-                start_of_month = last_month.replace(day=1)
-                
-                snapshot = CommissionSnapshot(
-                    client_id=client.id,
-                    period_start=start_of_month,
-                    period_end=last_month,
-                    deposit_commission=float(deposit_commission),
-                    withdrawal_commission=float(withdrawal_commission),
-                    total_commission=float(total_commission)
-                )
-                db.session.add(snapshot)
-                db.session.commit()
-                print(f"Created snapshot for client {client.id}: {total_commission} USDT")
-            except Exception as e:
-                print(f"Error creating snapshot for client {client.id}: {str(e)}")
-
-        print("Commission snapshot creation completed.")
+        # One grouped aggregate over last month's transactions for every client
+        start_of_month, end_of_month = _previous_month_bounds()
+        written = commission_service.write_snapshots(start_of_month, end_of_month)
+        print(f"Commission snapshot creation completed: {written} snapshots written.")
     except Exception as e:
+        db.session.rollback()
         print(f"Error in create_monthly_commission_snapshots: {str(e)}")
 
 # Start the scheduler
@@ -68,34 +48,9 @@ def create_initial_snapshots():
     print("Creating initial commission snapshots...")
     
     try:
-        # Get all active clients
-        clients = Client.query.all()
-        
-        for client in clients:
-            try:
-                # Calculate commissions
-                deposit_commission, withdrawal_commission, total_commission = FinanceCalculator().calculate_commission(client.id)
-                
-                # Create snapshot for this client
-                now = datetime.utcnow()
-                first_day = now.replace(day=1)
-                last_month = first_day - timedelta(days=1)
-                start_of_month = last_month.replace(day=1)
-                
-                snapshot = CommissionSnapshot(
-                    client_id=client.id,
-                    period_start=start_of_month,
-                    period_end=last_month,
-                    deposit_commission=float(deposit_commission),
-                    withdrawal_commission=float(withdrawal_commission),
-                    total_commission=float(total_commission)
-                )
-                db.session.add(snapshot)
-                db.session.commit()
-                print(f"Created initial snapshot for client {client.id}: {total_commission} USDT")
-            except Exception as e:
-                print(f"Error creating initial snapshot for client {client.id}: {str(e)}")
-        
-        print("Initial snapshot creation completed.")
+        start_of_month, end_of_month = _previous_month_bounds()
+        written = commission_service.write_snapshots(start_of_month, end_of_month)
+        print(f"Initial snapshot creation completed: {written} snapshots written.")
     except Exception as e:
+        db.session.rollback()
         print(f"Error in create_initial_snapshots: {str(e)}")
@@ -7,6 +7,8 @@ import redis
 import hmac
 import hashlib
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from flask import request, current_app, g, jsonify
 from functools import wraps
@@ -25,11 +27,160 @@ except:
     # Fallback to in-memory storage
     _memory_store = {}
 
+# Max keys the in-process limiter tracks before evicting least recently used ones
+LOCAL_LIMITER_MAX_KEYS = 100000
+
+# Sliding-window counter: one hash per key holding the current window index,
+# its hit count and the previous window's count. Counts the hit and returns
+# the weighted count plus milliseconds until the current window closes.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local idx = math.floor(now / window)
+local data = redis.call('HMGET', key, 'w', 'c', 'p')
+local w = tonumber(data[1])
+local c = tonumber(data[2]) or 0
+local p = tonumber(data[3]) or 0
+if w ~= idx then
+    if w == idx - 1 then p = c else p = 0 end
+    c = 0
+end
+c = c + 1
+redis.call('HSET', key, 'w', idx, 'c', c, 'p', p)
+redis.call('EXPIRE', key, window * 2)
+local elapsed = (now - idx * window) / window
+local count = math.floor(p * (1 - elapsed)) + c
+local reset_ms = math.ceil(((idx + 1) * window - now) * 1000)
+return {count, reset_ms}
+"""
+
+
+class LocalLimiterStore:
+    """
+    Constant-memory sliding-window counters for when Redis is unavailable.
+    
+    Keeps three numbers per key (window index, current and previous counts)
+    in an LRU-bounded, lock-protected map so IP churn cannot grow memory
+    without bound. Block entries live in a second bounded map.
+    """
+    
+    def __init__(self, max_keys: int = LOCAL_LIMITER_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def hit(self, key: str, window: int, now: float) -> Tuple[int, float]:
+        """Count a hit and return (weighted count, seconds until window reset)"""
+        idx = int(now // window)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = [idx, 0, 0]
+                self._counters[key] = entry
+                if len(self._counters) > self.max_keys:
+                    self._counters.popitem(last=False)
+            else:
+                self._counters.move_to_end(key)
+            
+            if entry[0] != idx:
+                entry[2] = entry[1] if entry[0] == idx - 1 else 0
+                entry[1] = 0
+                entry[0] = idx
+            entry[1] += 1
+            current, previous = entry[1], entry[2]
+        
+        elapsed = (now - idx * window) / window
+        count = int(previous * (1 - elapsed)) + current
+        return count, (idx + 1) * window - now
+    
+    def block(self, key: str, until: float):
+        with self._lock:
+            self._blocks[key] = until
+            self._blocks.move_to_end(key)
+            if len(self._blocks) > self.max_keys:
+                self._blocks.popitem(last=False)
+    
+    def blocked_for(self, key: str, now: float) -> float:
+        """Seconds the key remains blocked (0 if not blocked)"""
+        with self._lock:
+            until = self._blocks.get(key)
+            if until is None:
+                return 0
+            if until <= now:
+                del self._blocks[key]
+                return 0
+            return until - now
+    
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._blocks.clear()
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter limiter backend.
+    
+    Uses a fixed number of counters per key and one atomic Redis script round
+    trip per hit; falls back to LocalLimiterStore when Redis is unavailable
+    or errors.
+    """
+    
+    # Distinct from the legacy sorted-set keys so old entries cannot collide
+    KEY_PREFIX = 'sw:'
+    
+    def __init__(self, redis_conn=None, max_local_keys: int = LOCAL_LIMITER_MAX_KEYS):
+        self.redis = redis_conn
+        self.local = LocalLimiterStore(max_local_keys)
+        self._script = redis_conn.register_script(SLIDING_WINDOW_SCRIPT) if redis_conn else None
+    
+    def hit(self, key: str, window: int, now: Optional[float] = None) -> Tuple[int, float]:
+        """
+        Record a hit for key in the sliding window
+        
+        Returns:
+            (weighted request count including this one, seconds until window reset)
+        """
+        now = time.time() if now is None else now
+        if self._script is not None:
+            try:
+                count, reset_ms = self._script(keys=[self.KEY_PREFIX + key], args=[window, now])
+                return int(count), int(reset_ms) / 1000.0
+            except redis.RedisError as e:
+                logger.warning(f"Redis limiter unavailable, using local fallback: {e}")
+        return self.local.hit(key, window, now)
+    
+    def block(self, key: str, seconds: int):
+        if self.redis is not None:
+            try:
+                self.redis.setex(key, seconds, 1)
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Redis block failed, using local fallback: {e}")
+        self.local.block(key, time.time() + seconds)
+    
+    def blocked_for(self, key: str) -> int:
+        """Seconds the key remains blocked (0 if not blocked)"""
+        if self.redis is not None:
+            try:
+                return max(0, self.redis.ttl(key))
+            except redis.RedisError as e:
+                logger.warning(f"Redis block check failed, using local fallback: {e}")
+        return int(self.local.blocked_for(key, time.time()))
+
+
+# Shared limiter backend for rate_limit and abuse_protection
+sliding_window_limiter = SlidingWindowLimiter(redis_client if REDIS_AVAILABLE else None)
+
+
 class RateLimiter:
     """Rate limiting implementation with Redis backend and memory fallback"""
     
-    def __init__(self):
-        self.redis = redis_client if REDIS_AVAILABLE else None
+    def __init__(self, backend: Optional[SlidingWindowLimiter] = None):
+        self.backend = backend or sliding_window_limiter
+        self.redis = self.backend.redis
     
     def _get_key(self, identifier: str, endpoint: str) -> str:
         """Generate rate limiting key"""
@@ -58,28 +209,8 @@ class RateLimiter:
         """
         identifier = self._get_client_identifier()
         key = self._get_key(identifier, endpoint)
+        current_count, reset_after = self.backend.hit(key, window)
         current_time = int(time.time())
-        window_start = current_time - window
-        
-        if self.redis:
-            # Redis implementation
-            pipe = self.redis.pipeline()
-            pipe.zremrangebyscore(key, 0, window_start)  # Remove old entries
-            pipe.zcard(key)  # Count current requests
-            pipe.zadd(key, {current_time: current_time})  # Add current request
-            pipe.expire(key, window)  # Set expiry
-            results = pipe.execute()
-            
-            current_count = results[1] + 1  # +1 for current request
-        else:
-            # Memory fallback
-            if key not in _memory_store:
-                _memory_store[key] = []
-            
-            # Clean old entries
-            _memory_store[key] = [t for t in _memory_store[key] if t > window_start]
-            _memory_store[key].append(current_time)
-            current_count = len(_memory_store[key])
         
         allowed = current_count <= limit
         
@@ -88,7 +219,7 @@ class RateLimiter:
             'current_count': current_count,
             'limit': limit,
             'window': window,
-            'reset_time': current_time + window if not allowed else None,
+            'reset_time': current_time + int(reset_after) + 1 if not allowed else None,
             'identifier': identifier
         }
         
@@ -169,24 +300,9 @@ def abuse_protection(endpoint: str, threshold: int, window: int = 3600):
             identifier = f"ip:{request.remote_addr}"
             key = f"abuse:{identifier}:{endpoint}"
             current_time = int(time.time())
-            window_start = current_time - window
             
             # Check current abuse count
-            if REDIS_AVAILABLE:
-                pipe = redis_client.pipeline()
-                pipe.zremrangebyscore(key, 0, window_start)
-                pipe.zcard(key)
-                pipe.zadd(key, {current_time: current_time})
-                pipe.expire(key, window)
-                results = pipe.execute()
-                count = results[1] + 1
-            else:
-                # Memory fallback
-                if key not in _memory_store:
-                    _memory_store[key] = []
-                _memory_store[key] = [t for t in _memory_store[key] if t > window_start]
-                _memory_store[key].append(current_time)
-                count = len(_memory_store[key])
+            count, _ = sliding_window_limiter.hit(key, window)
             
             # Check if threshold exceeded
             if count > threshold:
@@ -210,10 +326,7 @@ def abuse_protection(endpoint: str, threshold: int, window: int = 3600):
                 block_key = f"blocklist:ip:{request.remote_addr}"
                 block_expiry = window * 2  # Block for twice the window period
                 
-                if REDIS_AVAILABLE:
-                    redis_client.setex(block_key, block_expiry, 1)
-                else:
-                    _memory_store[block_key] = current_time + block_expiry
+                sliding_window_limiter.block(block_key, block_expiry)
                 
                 response = jsonify({
                     'error': 'Too many requests',
@@ -225,21 +338,10 @@ def abuse_protection(endpoint: str, threshold: int, window: int = 3600):
             
             # Check if IP is in blocklist
             block_key = f"blocklist:ip:{request.remote_addr}"
-            is_blocked = False
+            block_expiry = sliding_window_limiter.blocked_for(block_key)
             
-            if REDIS_AVAILABLE:
-                is_blocked = redis_client.exists(block_key)
-            else:
-                is_blocked = block_key in _memory_store and _memory_store[block_key] > current_time
-            
-            if is_blocked:
+            if block_expiry:
                 # Return blocked response
-                block_expiry = 0
-                if REDIS_AVAILABLE:
-                    block_expiry = redis_client.ttl(block_key)
-                else:
-                    block_expiry = _memory_store[block_key] - current_time
-                
                 response = jsonify({
                     'error': 'Access denied',
                     'message': 'Your IP address is temporarily blocked due to suspicious activity',
@@ -17,6 +17,8 @@ from app.utils.security import WebhookSecurity, rate_limit
 from app.utils.audit import log_security_event, log_api_usage
 from app.models.client import Client
 from app.extensions import db
+from app.services.replay_cache import webhook_replay_cache
+from app.services.webhook_config import webhook_config_cache
 
 logger = logging.getLogger(__name__)
 
@@ -53,23 +55,30 @@ class WebhookHandler:
             if not WebhookSecurity.verify_timestamp(timestamp, self.replay_window):
                 return False, "Invalid or expired timestamp"
             
-            # 3. Get client and webhook secret
-            client = Client.query.get(client_id)
-            if not client:
+            # 3. Reject replays of a recently accepted signature before touching the DB
+            if webhook_replay_cache.seen(client_id, signature):
+                return False, "Duplicate webhook"
+            
+            # 4. Client status and webhook secret (cached; no DB round trip on a hit)
+            config = webhook_config_cache.get(client_id)
+            if not config.exists:
                 return False, "Client not found"
             
-            if not client.is_active:
+            if not config.is_active:
                 return False, "Client account disabled"
             
-            # Get webhook secret from client settings or configuration
-            webhook_secret = self._get_webhook_secret(client)
+            webhook_secret = config.secret
             if not webhook_secret:
                 return False, "Webhook not configured"
             
-            # 4. Verify signature
+            # 5. Verify signature
             if not WebhookSecurity.verify_signature(payload, signature, webhook_secret):
                 return False, "Invalid signature"
             
+            # 6. Record it; loses if a concurrent duplicate got there first
+            if not webhook_replay_cache.add(client_id, signature):
+                return False, "Duplicate webhook"
+            
             return True, "Valid"
             
         except Exception as e:
@@ -78,10 +87,8 @@ class WebhookHandler:
     
     def _get_webhook_secret(self, client: Client) -> Optional[str]:
         """Get webhook secret for client"""
-        # This could be stored in client settings or a separate webhook config table
-        # For now, we'll use a simple approach
-        settings = client.settings or {}
-        return settings.get('webhook_secret')
+        # Stored in client.settings; served from the webhook config cache
+        return webhook_config_cache.get(client.id).secret
     
     def process_webhook_payload(self, client: Client, payload_data: Dict) -> Dict:
         """
@@ -339,8 +346,8 @@ def setup_webhook_security(client: Client, webhook_url: str, events: list) -> Di
         # Generate webhook secret
         webhook_secret = secrets.token_urlsafe(32)
         
-        # Update client settings
-        settings = client.settings or {}
+        # Update client settings (a new dict, so the JSON column is flagged as changed)
+        settings = dict(client.settings or {})
         settings.update({
             'webhook_url': webhook_url,
             'webhook_secret': webhook_secret,
@@ -350,6 +357,7 @@ def setup_webhook_security(client: Client, webhook_url: str, events: list) -> Di
         })
         
         client.settings = settings
+        webhook_config_cache.invalidate_after_commit(client.id)
         db.session.commit()
         
         log_security_event(
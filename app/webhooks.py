@@ -4,6 +4,7 @@ from app.models import Payment
 from app.utils.security import rate_limit, abuse_protection
 from app.utils.audit import log_api_usage, log_security_event
 from app.utils.webhook_security import WebhookHandler
+from app.services.webhook_dispatcher import webhook_dispatcher, payment_payload
 
 webhooks = Blueprint('webhooks', __name__)
 
@@ -60,6 +61,16 @@ def update_payment_status():
 
         old_status = payment.status
         payment.status = new_status
+        if payment.status != old_status:
+            webhook_dispatcher.enqueue(
+                payment.client_id,
+                'payment_status_changed',
+                {
+                    'payment': payment_payload(payment),
+                    'previous_status': old_status.value if hasattr(old_status, 'value') else old_status
+                },
+                url=payment.platform.webhook_url if payment.platform else None
+            )
         db.session.commit()
 
         # Log successful webhook processing
@@ -22,6 +22,7 @@ def clear_rate_limits():
             if hasattr(rate_limiter, 'redis') and rate_limiter.redis:
                 try:
                     keys = list(rate_limiter.redis.keys('rate_limit:*'))
+                    keys += list(rate_limiter.redis.keys(f"{rate_limiter.backend.KEY_PREFIX}rate_limit:*"))
                     if keys:
                         rate_limiter.redis.delete(*keys)
                         print(f"✅ Cleared {len(keys)} rate limit entries from Redis")
@@ -30,17 +31,12 @@ def clear_rate_limits():
                 except Exception as e:
                     print(f"⚠️  Redis error: {e}")
                     # Fall back to memory store clearing
-                    from app.utils.security import _memory_store
-                    _memory_store.clear()
+                    rate_limiter.backend.local.clear()
                     print("✅ Cleared in-memory rate limit data as fallback")
             else:
                 # If using memory store
-                from app.utils.security import _memory_store
-                if _memory_store:
-                    _memory_store.clear()
-                    print("✅ Cleared in-memory rate limit data")
-                else:
-                    print("✅ No in-memory rate limit data found")
+                rate_limiter.backend.local.clear()
+                print("✅ Cleared in-memory rate limit data")
                     
             print("✅ Rate limits cleared successfully")
             
@@ -0,0 +1,30 @@
+"""Add key_digest and key_prefix index to client_api_keys
+
+Revision ID: 20251018_add_api_key_digest
+Revises: 20250707_add_first_last_name
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_api_key_digest'
+down_revision = '20250707_add_first_last_name'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyed HMAC of the key; NULL for existing rows until first successful use
+    with op.batch_alter_table('client_api_keys', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('key_digest', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_client_api_keys_key_digest', ['key_digest'])
+        batch_op.create_index('ix_client_api_keys_key_prefix', ['key_prefix'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('client_api_keys', schema=None) as batch_op:
+        batch_op.drop_index('ix_client_api_keys_key_prefix')
+        batch_op.drop_constraint('uq_client_api_keys_key_digest', type_='unique')
+        batch_op.drop_column('key_digest')
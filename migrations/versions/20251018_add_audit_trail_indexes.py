@@ -0,0 +1,32 @@
+"""Add composite keyset indexes on audit_trail for the admin audit browser
+
+Revision ID: 20251018_add_audit_indexes
+Revises: 20251018_add_client_subdomain
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_audit_indexes'
+down_revision = '20251018_add_client_subdomain'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_audit_trail_created_id', 'audit_trail',
+                    ['created_at', 'id'], unique=False)
+    op.create_index('ix_audit_trail_user_created', 'audit_trail',
+                    ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_trail_action_created', 'audit_trail',
+                    ['action_type', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_trail_entity_created', 'audit_trail',
+                    ['entity_type', 'entity_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_audit_trail_entity_created', table_name='audit_trail')
+    op.drop_index('ix_audit_trail_action_created', table_name='audit_trail')
+    op.drop_index('ix_audit_trail_user_created', table_name='audit_trail')
+    op.drop_index('ix_audit_trail_created_id', table_name='audit_trail')
@@ -0,0 +1,89 @@
+"""Add client_daily_rollups and time-range indexes for dashboard activity
+
+Revision ID: 20251018_add_client_rollups
+Revises: 20251018_add_client_ledger
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_client_rollups'
+down_revision = '20251018_add_client_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'client_daily_rollups',
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('payment_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('deposit_volume', sa.Numeric(precision=28, scale=8), nullable=False, server_default='0'),
+        sa.Column('withdrawal_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('withdrawal_volume', sa.Numeric(precision=28, scale=8), nullable=False, server_default='0'),
+        sa.Column('api_call_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_api_call_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('client_id', 'day')
+    )
+
+    # Range scans used by the rollup job and the dashboard's recent lists
+    op.create_index('ix_payments_created_at', 'payments', ['created_at'], unique=False)
+    op.create_index('ix_payments_client_created', 'payments', ['client_id', 'created_at'], unique=False)
+    op.create_index('ix_withdrawal_requests_created_at', 'withdrawal_requests', ['created_at'], unique=False)
+    op.create_index('ix_api_usage_timestamp', 'api_usage', ['timestamp'], unique=False)
+    op.create_index('ix_api_usage_client_timestamp', 'api_usage', ['client_id', 'timestamp'], unique=False)
+
+    # Seed every day from history, so dashboards are complete before the first refresh;
+    # status case has varied over time, so compare upper-cased
+    op.execute("""
+    INSERT INTO client_daily_rollups
+        (client_id, day, payment_count, deposit_volume, withdrawal_count, withdrawal_volume,
+         api_call_count, last_api_call_at, updated_at)
+    SELECT a.client_id, a.day,
+           SUM(a.payment_count), SUM(a.deposit_volume),
+           SUM(a.withdrawal_count), SUM(a.withdrawal_volume),
+           SUM(a.api_call_count), MAX(a.last_api_call_at),
+           CURRENT_TIMESTAMP
+    FROM (
+        SELECT client_id, DATE(created_at) AS day,
+               COUNT(id) AS payment_count,
+               SUM(CASE WHEN UPPER(status) IN ('APPROVED', 'COMPLETED') THEN amount ELSE 0 END) AS deposit_volume,
+               0 AS withdrawal_count, 0 AS withdrawal_volume,
+               0 AS api_call_count, NULL AS last_api_call_at
+        FROM payments
+        WHERE created_at IS NOT NULL
+        GROUP BY client_id, DATE(created_at)
+        UNION ALL
+        SELECT client_id, DATE(created_at),
+               0, 0,
+               COUNT(id),
+               SUM(CASE WHEN UPPER(status) IN ('APPROVED', 'PROCESSING', 'COMPLETED') THEN amount ELSE 0 END),
+               0, NULL
+        FROM withdrawal_requests
+        WHERE created_at IS NOT NULL
+        GROUP BY client_id, DATE(created_at)
+        UNION ALL
+        SELECT client_id, DATE(timestamp),
+               0, 0, 0, 0,
+               COUNT(id), MAX(timestamp)
+        FROM api_usage
+        WHERE timestamp IS NOT NULL
+        GROUP BY client_id, DATE(timestamp)
+    ) a
+    JOIN clients c ON c.id = a.client_id
+    GROUP BY a.client_id, a.day
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_api_usage_client_timestamp', table_name='api_usage')
+    op.drop_index('ix_api_usage_timestamp', table_name='api_usage')
+    op.drop_index('ix_withdrawal_requests_created_at', table_name='withdrawal_requests')
+    op.drop_index('ix_payments_client_created', table_name='payments')
+    op.drop_index('ix_payments_created_at', table_name='payments')
+    op.drop_table('client_daily_rollups')
@@ -0,0 +1,57 @@
+"""Add client_ledger_balances running-balance table
+
+Revision ID: 20251018_add_client_ledger
+Revises: 20251018_add_api_key_digest
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_client_ledger'
+down_revision = '20251018_add_api_key_digest'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'client_ledger_balances',
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('deposit_total', sa.Numeric(precision=28, scale=8), nullable=False, server_default='0'),
+        sa.Column('withdrawal_total', sa.Numeric(precision=28, scale=8), nullable=False, server_default='0'),
+        sa.Column('deposit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('withdrawal_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('client_id')
+    )
+
+    # Seed from history; status case has varied over time, so compare upper-cased
+    op.execute("""
+    INSERT INTO client_ledger_balances
+        (client_id, deposit_total, withdrawal_total, deposit_count, withdrawal_count, updated_at, reconciled_at)
+    SELECT c.id,
+           COALESCE(d.total, 0), COALESCE(w.total, 0),
+           COALESCE(d.cnt, 0), COALESCE(w.cnt, 0),
+           CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM clients c
+    LEFT JOIN (
+        SELECT client_id, SUM(amount) AS total, COUNT(id) AS cnt
+        FROM payments
+        WHERE UPPER(status) IN ('APPROVED', 'COMPLETED')
+        GROUP BY client_id
+    ) d ON d.client_id = c.id
+    LEFT JOIN (
+        SELECT client_id, SUM(amount) AS total, COUNT(id) AS cnt
+        FROM withdrawal_requests
+        WHERE UPPER(status) IN ('APPROVED', 'PROCESSING', 'COMPLETED')
+        GROUP BY client_id
+    ) w ON w.client_id = c.id
+    """)
+
+
+def downgrade():
+    op.drop_table('client_ledger_balances')
@@ -0,0 +1,25 @@
+"""Add subdomain column to clients for multi-tenant routing
+
+Revision ID: 20251018_add_client_subdomain
+Revises: 20251018_add_webhook_outbox
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_client_subdomain'
+down_revision = '20251018_add_webhook_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('clients', sa.Column('subdomain', sa.String(length=63), nullable=True))
+    op.create_index('ix_clients_subdomain', 'clients', ['subdomain'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_clients_subdomain', table_name='clients')
+    op.drop_column('clients', 'subdomain')
@@ -0,0 +1,45 @@
+"""Add payment_addresses for the pre-derived deposit address pool
+
+Revision ID: 20251018_add_payment_addresses
+Revises: 20251018_add_transaction_rollups
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_payment_addresses'
+down_revision = '20251018_add_transaction_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'payment_addresses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('coin', sa.String(length=10), nullable=False),
+        sa.Column('address', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='available'),
+        sa.Column('owner_type', sa.String(length=30), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('leased_at', sa.DateTime(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('released_at', sa.DateTime(), nullable=True),
+        sa.Column('lease_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('address')
+    )
+    op.create_index('ix_payment_addresses_coin_status', 'payment_addresses',
+                    ['coin', 'status', 'id'], unique=False)
+    op.create_index('ix_payment_addresses_status_lease', 'payment_addresses',
+                    ['status', 'lease_expires_at'], unique=False)
+    # Fill the pool before taking checkout traffic with: flask address-pool refill
+
+
+def downgrade():
+    op.drop_index('ix_payment_addresses_status_lease', table_name='payment_addresses')
+    op.drop_index('ix_payment_addresses_coin_status', table_name='payment_addresses')
+    op.drop_table('payment_addresses')
@@ -0,0 +1,38 @@
+"""Add background generation status and stored results to reports
+
+Revision ID: 20251018_add_report_results
+Revises: 20251018_add_audit_indexes
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_report_results'
+down_revision = '20251018_add_audit_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('report', sa.Column('status', sa.String(length=20), nullable=False,
+                                      server_default='pending'))
+    op.add_column('report', sa.Column('result', sa.JSON(), nullable=True))
+    op.add_column('report', sa.Column('result_key', sa.String(length=64), nullable=True))
+    op.add_column('report', sa.Column('error', sa.Text(), nullable=True))
+    op.add_column('report', sa.Column('started_at', sa.DateTime(), nullable=True))
+    op.add_column('report', sa.Column('generated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_report_status', 'report', ['status'], unique=False)
+    op.create_index('ix_report_result_key', 'report', ['result_key'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_report_result_key', table_name='report')
+    op.drop_index('ix_report_status', table_name='report')
+    op.drop_column('report', 'generated_at')
+    op.drop_column('report', 'started_at')
+    op.drop_column('report', 'error')
+    op.drop_column('report', 'result_key')
+    op.drop_column('report', 'result')
+    op.drop_column('report', 'status')
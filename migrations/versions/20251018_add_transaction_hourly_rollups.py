@@ -0,0 +1,41 @@
+"""Add transaction_hourly_rollups for admin analytics
+
+Revision ID: 20251018_add_transaction_rollups
+Revises: 20251018_add_report_results
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_transaction_rollups'
+down_revision = '20251018_add_report_results'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'transaction_hourly_rollups',
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=10), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('tx_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('amount_total', sa.Numeric(precision=28, scale=8), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('bucket', 'client_id', 'currency', 'status')
+    )
+    op.create_index('ix_transaction_rollups_client_bucket', 'transaction_hourly_rollups',
+                    ['client_id', 'bucket'], unique=False)
+    # Day-by-day range scans of the backfill
+    op.create_index('ix_transactions_created_at', 'transactions', ['created_at'], unique=False)
+    # Populate history afterwards with: flask rollup transactions --since <YYYY-MM-DD>
+
+
+def downgrade():
+    op.drop_index('ix_transactions_created_at', table_name='transactions')
+    op.drop_index('ix_transaction_rollups_client_bucket', table_name='transaction_hourly_rollups')
+    op.drop_table('transaction_hourly_rollups')
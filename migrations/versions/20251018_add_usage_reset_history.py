@@ -0,0 +1,56 @@
+"""Add client_usage_history and usage_reset_runs for chunked monthly resets
+
+Revision ID: 20251018_add_usage_reset
+Revises: 20251018_add_client_rollups
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_usage_reset'
+down_revision = '20251018_add_client_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'client_usage_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=True),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('month_volume', sa.Numeric(precision=20, scale=2), nullable=False, server_default='0'),
+        sa.Column('month_transactions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('run_key', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id', 'run_key', name='uq_client_usage_history_client_run')
+    )
+    op.create_index('ix_client_usage_history_client_id', 'client_usage_history', ['client_id'], unique=False)
+
+    op.create_table(
+        'usage_reset_runs',
+        sa.Column('run_key', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('force', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('client_id', sa.Integer(), nullable=True),
+        sa.Column('last_client_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('clients_reset', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('volume_reset', sa.Numeric(precision=20, scale=2), nullable=False, server_default='0'),
+        sa.Column('transactions_reset', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('batches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('run_key')
+    )
+
+
+def downgrade():
+    op.drop_table('usage_reset_runs')
+    op.drop_index('ix_client_usage_history_client_id', table_name='client_usage_history')
+    op.drop_table('client_usage_history')
@@ -0,0 +1,23 @@
+"""Add (client_id, created_at) index on withdrawal_requests for fraud features
+
+Revision ID: 20251018_add_withdrawal_index
+Revises: 20251018_add_usage_reset
+Create Date: 2025-10-18
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20251018_add_withdrawal_index'
+down_revision = '20251018_add_usage_reset'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_withdrawal_requests_client_created', 'withdrawal_requests',
+                    ['client_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_withdrawal_requests_client_created', table_name='withdrawal_requests')
@@ -176,3 +176,15 @@ def register_commands(app):
             db.session.rollback()
             click.echo(f"Error syncing coins: {str(e)}", err=True)
             return 1
+    
+    @coin.command('reload')
+    def reload_catalog():
+        """Rebuild the in-memory coin catalog in every running worker."""
+        from app.services.coin_catalog import coin_catalog
+        
+        # add/update/sync reload automatically on commit; this covers
+        # changes made outside the ORM (e.g. manual SQL)
+        coin_catalog.reload()
+        snapshot = coin_catalog.snapshot
+        click.echo(f"Coin catalog reloaded: {len(snapshot.coins)} coins, version {snapshot.version}")
+        return 0
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from itertools import count
+
+import pytest
+from flask import Flask
+
+from app import models  # noqa: F401  (registers every table for create_all)
+from app.extensions import db
+from app.models.enums import PaymentStatus
+from app.models.package_payment import PackageActivationPayment
+from app.models.payment_address import PaymentAddress
+from app.services.address_pool import AddressPool
+
+OWNER = PaymentAddress.OWNER_PACKAGE_ACTIVATION
+
+
+@pytest.fixture
+def pool_app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def derived():
+    return []
+
+
+@pytest.fixture
+def pool(pool_app, derived):
+    pool = AddressPool(target_size=3, low_watermark=2, refill_batch=2, cooldown_seconds=3600)
+    pool.coins = ('BTC',)
+    numbers = count(1)
+
+    def deriver(coin):
+        address = f"bc1qpool{next(numbers):06d}"
+        derived.append(address)
+        return address
+
+    pool.deriver = deriver
+    return pool
+
+
+def addresses(status=None):
+    query = PaymentAddress.query
+    if status:
+        query = query.filter_by(status=status)
+    return {row.address: row for row in query.all()}
+
+
+def add_payment(status=PaymentStatus.PENDING, expires_in=timedelta(minutes=30)):
+    payment = PackageActivationPayment(client_id=1, package_id=1, status=status,
+                                       expires_at=datetime.utcnow() + expires_in)
+    db.session.add(payment)
+    db.session.commit()
+    return payment
+
+
+def test_refill_tops_up_to_target(pool):
+    assert pool.refill() == 3
+    assert pool.stats() == {'BTC': {PaymentAddress.STATUS_AVAILABLE: 3}}
+
+    # At or above the low watermark nothing is derived
+    assert pool.refill() == 0
+
+
+def test_leases_never_share_an_address(pool, derived):
+    pool.refill()
+    pooled = set(derived)
+
+    leased = []
+    for _ in range(3):
+        payment = add_payment()
+        leased.append(pool.assign(payment, OWNER))
+        db.session.commit()
+
+    assert len(set(leased)) == 3
+    assert set(leased) == pooled
+    assert not addresses(PaymentAddress.STATUS_AVAILABLE)
+
+    # Empty pool: checkout derives inline rather than reusing a leased address
+    payment = add_payment()
+    address = pool.assign(payment, OWNER)
+    db.session.commit()
+    assert address not in pooled
+    assert address == derived[-1]
+    rows = addresses(PaymentAddress.STATUS_LEASED)
+    assert len(rows) == 4
+    assert rows[address].owner_id == payment.id
+
+
+def test_rolled_back_checkout_returns_its_address(pool):
+    pool.refill()
+    payment = add_payment()
+
+    address = pool.assign(payment, OWNER)
+    db.session.rollback()
+
+    assert addresses()[address].status == PaymentAddress.STATUS_AVAILABLE
+
+
+def test_recycle_cools_unpaid_and_retires_paid_addresses(pool):
+    pool.refill()
+    unpaid = add_payment(expires_in=timedelta(minutes=-5))
+    paid = add_payment(PaymentStatus.COMPLETED, expires_in=timedelta(minutes=-5))
+    unpaid_address = pool.assign(unpaid, OWNER)
+    paid_address = pool.assign(paid, OWNER)
+    db.session.commit()
+
+    assert pool.recycle() == {'retired': 1, 'released': 1, 'reopened': 0}
+    rows = addresses()
+    assert rows[paid_address].status == PaymentAddress.STATUS_USED
+    assert rows[unpaid_address].status == PaymentAddress.STATUS_COOLING
+
+    # Still cooling: a late deposit must not reach the next payer
+    assert pool.recycle()['reopened'] == 0
+
+    rows[unpaid_address].released_at = datetime.utcnow() - timedelta(seconds=pool.cooldown_seconds + 1)
+    db.session.commit()
+    assert pool.recycle()['reopened'] == 1
+
+    reopened = addresses()[unpaid_address]
+    assert reopened.status == PaymentAddress.STATUS_AVAILABLE
+    assert reopened.owner_id is None
+    assert reopened.lease_count == 1
+    assert paid_address not in addresses(PaymentAddress.STATUS_AVAILABLE)
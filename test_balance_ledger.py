@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+from app import models  # noqa: F401  (registers every table for create_all)
+from app.extensions import db
+from app.models.enums import PaymentStatus
+from app.models.payment import Payment
+from app.models.withdrawal import WithdrawalRequest, WithdrawalStatus
+from app.services.balance_ledger import balance_ledger
+
+
+@pytest.fixture
+def ledger_app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    balance_ledger.instrument()
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def add_payment(client_id, amount, status=PaymentStatus.PENDING):
+    payment = Payment(client_id=client_id, amount=Decimal(amount), currency='BTC', payment_method='crypto')
+    payment.status = status
+    db.session.add(payment)
+    db.session.commit()
+    return payment
+
+
+def add_withdrawal(client_id, amount, status=WithdrawalStatus.PENDING):
+    withdrawal = WithdrawalRequest(client_id=client_id, amount=amount, currency='BTC',
+                                   crypto_address='bc1qtestaddress', status=status)
+    db.session.add(withdrawal)
+    db.session.commit()
+    return withdrawal
+
+
+def assert_ledger(client_id, deposits, withdrawals, deposit_count, withdrawal_count):
+    totals = balance_ledger.get_totals(client_id)
+    assert totals.deposit_total == Decimal(deposits)
+    assert totals.withdrawal_total == Decimal(withdrawals)
+    assert (totals.deposit_count, totals.withdrawal_count) == (deposit_count, withdrawal_count)
+    # Whatever the flush hook did must agree with `flask ledger reconcile`
+    assert balance_ledger.reconcile(dry_run=True) == []
+
+
+def test_payment_settles_then_reverses(ledger_app):
+    payment = add_payment(1, '10.5')
+    assert_ledger(1, '0', '0', 0, 0)
+
+    payment.status = PaymentStatus.COMPLETED
+    db.session.commit()
+    assert_ledger(1, '10.5', '0', 1, 0)
+
+    # Refunded after settlement: the deposit leaves the ledger again
+    payment.status = PaymentStatus.REJECTED
+    db.session.commit()
+    assert_ledger(1, '0', '0', 0, 0)
+
+
+def test_withdrawal_approved_then_rejected(ledger_app):
+    add_payment(1, '20', PaymentStatus.APPROVED)
+    withdrawal = add_withdrawal(1, 5.0)
+    assert_ledger(1, '20', '0', 1, 0)
+
+    withdrawal.status = WithdrawalStatus.APPROVED
+    db.session.commit()
+    assert_ledger(1, '20', '5', 1, 1)
+
+    withdrawal.status = WithdrawalStatus.REJECTED
+    db.session.commit()
+    assert_ledger(1, '20', '0', 1, 0)
+
+
+def test_client_reassignment_moves_totals(ledger_app):
+    payment = add_payment(1, '7', PaymentStatus.COMPLETED)
+    add_payment(2, '3', PaymentStatus.COMPLETED)
+
+    payment.client_id = 2
+    db.session.commit()
+    assert_ledger(1, '0', '0', 0, 0)
+    assert_ledger(2, '10', '0', 2, 0)
+
+
+def test_rolled_back_transition_leaves_ledger_alone(ledger_app):
+    payment = add_payment(1, '4', PaymentStatus.COMPLETED)
+
+    payment.status = PaymentStatus.FAILED
+    db.session.flush()
+    db.session.rollback()
+    assert_ledger(1, '4', '0', 1, 0)
@@ -0,0 +1,89 @@
+from functools import wraps
+
+import pytest
+from flask import Flask, jsonify
+
+from app.services.idempotency import LocalIdempotencyStore, idempotency_store, idempotent
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # Keep the test off any local Redis and isolated from other tests
+    monkeypatch.setattr(idempotency_store, 'redis', None)
+    monkeypatch.setattr(idempotency_store, 'local', LocalIdempotencyStore())
+    return idempotency_store
+
+
+@pytest.fixture
+def limiter():
+    return {'limited': False}
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(store, limiter, calls):
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+
+    def fake_rate_limit(f):
+        """Rejects like app.utils.security.rate_limit: a normal 429 response, not an exception"""
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if limiter['limited']:
+                response = jsonify({'error': 'Rate limit exceeded'})
+                response.status_code = 429
+                return response
+            return f(*args, **kwargs)
+        return decorated_function
+
+    # Worst case: the limiter runs inside the idempotency wrapper
+    @app.route('/pay', methods=['POST'])
+    @idempotent('test_pay')
+    @fake_rate_limit
+    def pay():
+        calls.append(1)
+        return jsonify({'payment_id': len(calls)}), 201
+
+    return app.test_client()
+
+
+def test_rate_limited_request_does_not_consume_key(client, limiter, calls):
+    """A 429 is released, so a retry with the same key reaches the handler"""
+    headers = {'Idempotency-Key': 'retry-after-limit'}
+
+    limiter['limited'] = True
+    response = client.post('/pay', json={'amount': 10}, headers=headers)
+    assert response.status_code == 429
+    assert calls == []
+
+    limiter['limited'] = False
+    response = client.post('/pay', json={'amount': 10}, headers=headers)
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert calls == [1]
+
+
+def test_completed_request_is_replayed(client, calls):
+    headers = {'Idempotency-Key': 'replay'}
+
+    first = client.post('/pay', json={'amount': 10}, headers=headers)
+    second = client.post('/pay', json={'amount': 10}, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert second.headers.get('Idempotent-Replayed') == 'true'
+    assert calls == [1]
+
+
+def test_key_reused_with_different_body_is_rejected(client, calls):
+    headers = {'Idempotency-Key': 'mismatch'}
+
+    client.post('/pay', json={'amount': 10}, headers=headers)
+    response = client.post('/pay', json={'amount': 99}, headers=headers)
+
+    assert response.status_code == 422
+    assert calls == [1]